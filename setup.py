@@ -43,5 +43,8 @@ setup(
     entry_points={
         "console_scripts": ["traces_analyzer = traces_analyzer.__main__:main"]
     },
-    extras_require={"test": read_requirements("requirements-test.txt")},
+    extras_require={
+        "test": read_requirements("requirements-test.txt"),
+        "fast-json": ["orjson"],
+    },
 )
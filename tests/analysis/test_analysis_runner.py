@@ -1,7 +1,11 @@
 from unittest.mock import Mock
 
 from tests.test_utils.test_utils import _test_flow, _test_root
-from traces_analyzer.features.feature_extractor import DoubleInstructionFeatureExtractor
+from traces_analyzer.features.feature_extractor import (
+    DoubleInstructionFeatureExtractor,
+    SingleInstructionFeatureExtractor,
+    SingleToDoubleInstructionFeatureExtractor,
+)
 from traces_analyzer.features.feature_extraction_runner import (
     RunInfo,
     FeatureExtractionRunner,
@@ -58,3 +62,64 @@ def test_analysis_runner_calls_analyzer() -> None:
 
     assert instructions_second_call[0] is None
     assert instructions_second_call[1].opcode == POP.opcode
+
+
+def test_analysis_runner_instrumented_costs() -> None:
+    double_mock = Mock(spec_set=DoubleInstructionFeatureExtractor)
+    single_normal = Mock(spec_set=SingleInstructionFeatureExtractor)
+    single_reverse = Mock(spec_set=SingleInstructionFeatureExtractor)
+    single_to_double = SingleToDoubleInstructionFeatureExtractor(
+        single_normal, single_reverse
+    )
+    empty_call_tree = CallTree(_test_root())
+    instructions_one = [POP(POP.opcode, "POP", 1, 1, _test_root(), _test_flow())]
+    instructions_two = instructions_one + [
+        POP(POP.opcode, "POP", 2, 2, _test_root(), _test_flow())
+    ]
+
+    runner = FeatureExtractionRunner(
+        RunInfo(
+            feature_extractors=[double_mock, single_to_double],
+            transactions=(
+                ParsedTransaction(instructions_one, empty_call_tree),
+                ParsedTransaction(instructions_two, empty_call_tree),
+            ),
+        ),
+        instrumented=True,
+    )
+    runner.run()
+
+    assert double_mock.on_instructions.call_count == 2
+    assert single_normal.on_instruction.call_count == 1
+    assert single_reverse.on_instruction.call_count == 2
+
+    double_cost, single_to_double_cost = runner.get_extractor_costs()
+    assert double_cost.calls == 2
+    assert double_cost.opcodes["POP"].calls == 2
+    assert double_cost.inner == []
+    assert (
+        single_to_double_cost.extractor == "SingleToDoubleInstructionFeatureExtractor"
+    )
+    assert [(c.extractor, c.calls) for c in single_to_double_cost.inner] == [
+        ("Mock (normal)", 1),
+        ("Mock (reverse)", 2),
+    ]
+    report = single_to_double_cost.report()
+    assert report["calls"] == 2
+    assert report["opcodes"]["POP"]["calls"] == 2
+    assert len(report["inner"]) == 2
+
+
+def test_analysis_runner_not_instrumented_has_no_costs() -> None:
+    empty_call_tree = CallTree(_test_root())
+    empty_transaction = ParsedTransaction([], empty_call_tree)
+
+    runner = FeatureExtractionRunner(
+        RunInfo(
+            feature_extractors=[Mock(spec_set=DoubleInstructionFeatureExtractor)],
+            transactions=(empty_transaction, empty_transaction),
+        )
+    )
+    runner.run()
+
+    assert runner.get_extractor_costs() == []
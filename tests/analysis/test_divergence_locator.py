@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from traces_analyzer.features.divergence_locator import locate_divergence
+
+
+def _events(*steps: tuple[int, int, int, list[str]]):
+    return [
+        SimpleNamespace(pc=pc, op=op, depth=depth, stack=stack, memory=None)
+        for pc, op, depth, stack in steps
+    ]
+
+
+def test_locate_divergence_identical():
+    steps = [(0, 0x60, 1, []), (2, 0x60, 1, ["0x1"]), (4, 0x00, 1, ["0x1", "0x2"])]
+
+    divergence = locate_divergence(_events(*steps), _events(*steps))
+
+    assert divergence.first_divergence is None
+    assert divergence.regions == []
+    assert (divergence.steps_normal, divergence.steps_reverse) == (3, 3)
+
+
+def test_locate_divergence_regions():
+    normal = _events(
+        (0, 0x60, 1, []),
+        (2, 0x54, 1, ["0x1"]),
+        (3, 0x60, 2, ["0xa"]),
+        (5, 0x01, 2, []),
+        (6, 0x00, 1, []),
+    )
+    reverse = _events(
+        (0, 0x60, 1, []),
+        (2, 0x54, 1, ["0x1"]),
+        # only the stack top differs
+        (3, 0x60, 2, ["0xb"]),
+        (5, 0x01, 2, []),
+        (7, 0x00, 1, []),
+        (8, 0x00, 1, []),
+    )
+
+    divergence = locate_divergence(normal, reverse)
+
+    assert divergence.first_divergence == 2
+    assert divergence.first_divergence_depth == 2
+    assert divergence.regions == [(2, 3), (4, 6)]
+    assert divergence.divergent_steps == 3
+    assert (divergence.steps_normal, divergence.steps_reverse) == (5, 6)
+
+
+def test_locate_divergence_truncates_regions():
+    normal = _events(*[(i, 0x60, 1, []) for i in range(10)])
+    reverse = _events(*[(i if i % 2 else -1, 0x60, 1, []) for i in range(10)])
+
+    divergence = locate_divergence(normal, reverse, max_regions=2)
+
+    assert divergence.regions == [(0, 1), (2, 3)]
+    assert divergence.regions_truncated
+    assert divergence.divergent_steps == 5
@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+
+from traces_analyzer.features.triage import (
+    TransactionTriage,
+    screen_events,
+    triage_transaction,
+)
+from traces_parser.datatypes import HexString
+from traces_parser.parser.instructions.instructions import (
+    CALL,
+    DELEGATECALL,
+    LOG2,
+    PUSH32,
+    RETURN,
+    REVERT,
+    STOP,
+)
+
+TO = HexString("0x" + "aa" * 20)
+OTHER = HexString("0x" + "bb" * 20)
+LIB = HexString("0x" + "cc" * 20)
+TRANSFER_TOPIC = HexString(
+    "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+)
+
+
+def _step(op: int, pc: int, depth: int, stack: list, memory: str | None = "0x"):
+    return SimpleNamespace(
+        op=op,
+        pc=pc,
+        depth=depth,
+        stack=[HexString(x) for x in stack],
+        memory=None if memory is None else HexString(memory),
+    )
+
+
+def _trace(
+    call_value: str, log_data: str, memory: bool = True, end_op: int = STOP.opcode
+):
+    # CALL pops gas, address, value, ... with the gas on top of the stack
+    return [
+        _step(PUSH32.opcode, 0, 1, []),
+        _step(
+            CALL.opcode, 10, 1, ["0x0", "0x0", "0x0", "0x0", call_value, OTHER, "0x5"]
+        ),
+        _step(DELEGATECALL.opcode, 0, 2, ["0x0", "0x0", "0x0", "0x0", LIB, "0x5"]),
+        # LOG2 pops offset, size and two topics
+        _step(
+            LOG2.opcode,
+            7,
+            3,
+            ["0x1", TRANSFER_TOPIC, "0x20", "0x0"],
+            "0x" + log_data if memory else None,
+        ),
+        _step(STOP.opcode, 8, 3, []),
+        _step(RETURN.opcode, 1, 2, ["0x0", "0x0"]),
+        _step(end_op, 11, 1, ["0x0", "0x0"]),
+    ]
+
+
+def test_screen_events_groups_by_storage_address():
+    signals = screen_events(_trace("0x10", "00" * 31 + "05"), TO)
+
+    assert list(signals.calls) == [(TO.with_prefix(), 10)]
+    # the LOG inside the DELEGATECALL runs on the storage of its caller
+    ((address, pc),) = signals.logs
+    assert (address, pc) == (OTHER.as_address().with_prefix(), 7)
+    assert signals.logs[(address, pc)] == [
+        ((TRANSFER_TOPIC, HexString("0x1")), "00" * 31 + "05")
+    ]
+
+
+def test_triage_transaction_without_differences():
+    result = triage_transaction(
+        _trace("0x10", "00" * 32), _trace("0x10", "00" * 32), TO
+    )
+
+    assert not result.escalate
+    assert result.reasons == []
+
+
+def test_triage_transaction_escalates_differences():
+    call_difference = triage_transaction(
+        _trace("0x10", "00" * 32), _trace("0x20", "00" * 32), TO
+    )
+    log_difference = triage_transaction(
+        _trace("0x10", "00" * 32), _trace("0x10", "00" * 31 + "01"), TO
+    )
+    no_memory = triage_transaction(
+        _trace("0x10", "", memory=False), _trace("0x10", "", memory=False), TO
+    )
+
+    assert call_difference.reasons == ["call_differences"]
+    assert log_difference.reasons == ["log_differences"]
+    assert no_memory.escalate
+    assert no_memory.reasons == ["log_data_unavailable"]
+
+
+def test_screen_events_marks_reverted_calls():
+    # an exceptional halt of the DELEGATECALL reverts the LOG inside of it
+    halted = _trace("0x10", "00" * 32)
+    del halted[5]
+
+    completed = screen_events(_trace("0x10", "00" * 32), TO)
+    reverted = screen_events(_trace("0x10", "00" * 32, end_op=REVERT.opcode), TO)
+    log_reverted = screen_events(halted, TO)
+
+    assert list(completed.reverted.values()) == [[False], [False]]
+    assert list(reverted.reverted.values()) == [[True], [True]]
+    assert completed.reverted[(TO.with_prefix(), 10)] == [False]
+    assert log_reverted.reverted[(TO.with_prefix(), 10)] == [False]
+    assert log_reverted.reverted[(OTHER.as_address().with_prefix(), 7)] == [True]
+
+
+def test_triage_transaction_escalates_revert_differences():
+    result = triage_transaction(
+        _trace("0x10", "00" * 32),
+        _trace("0x10", "00" * 32, end_op=REVERT.opcode),
+        TO,
+    )
+
+    assert result.escalate
+    assert result.reasons == ["revert_differences"]
+
+
+def test_transaction_triage_stops_at_the_first_difference():
+    normal = _trace("0x10", "00" * 32)
+    reverse = _trace("0x20", "00" * 32)
+    unread = iter(reverse)
+    triage = TransactionTriage(iter(normal), unread, TO)
+
+    result = triage.run()
+
+    assert result.reasons == ["call_differences"]
+    # the events after the CALL are not screened
+    assert len(list(unread)) == len(reverse) - 2
+    triage = TransactionTriage(iter(normal), iter(reverse), TO)
+    triage.run()
+    assert list(triage.events_normal) == normal
+    assert list(triage.events_reverse) == reverse
@@ -0,0 +1,60 @@
+import sys
+
+import pytest
+
+from traces_analyzer.benchmark.bench import (
+    BenchRun,
+    BenchTimer,
+    bench_report,
+    format_bench_report,
+)
+from traces_analyzer.benchmark.stats import percentile
+
+
+def test_percentile():
+    values = [4.0, 1.0, 3.0, 2.0, 5.0]
+
+    assert percentile(values, 0) == 1.0
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 100) == 5.0
+    assert percentile(values, 95) == pytest.approx(4.8)
+    assert percentile([7.0], 99) == 7.0
+
+
+def test_percentile_empty():
+    with pytest.raises(ValueError):
+        percentile([], 50)
+
+
+def test_bench_timer_records_a_latency_per_bundle():
+    timer = BenchTimer()
+
+    run = timer.time_run(iter(["a", "b", "c"]))
+
+    assert timer.runs == [run]
+    assert len(run.latencies) == 3
+    assert run.seconds >= sum(run.latencies)
+
+
+def test_bench_report():
+    runs = [BenchRun(2.0, [0.5, 1.5]), BenchRun(1.0, [0.5, 0.5])]
+
+    report = bench_report(runs, bundles=2, steps=100, peak_rss=3 * 2**20, setup_rss=0)
+
+    assert report["bundles_per_second"] == pytest.approx(4 / 3)
+    assert report["steps_per_second"] == pytest.approx(200 / 3)
+    assert [run["bundles_per_second"] for run in report["runs"]] == [1.0, 2.0]
+    assert report["latency_seconds"]["p50"] == 0.5
+    assert report["latency_seconds"]["p99"] == pytest.approx(1.47)
+    assert report["peak_rss_bytes"] == 3 * 2**20
+    # unknown on Windows, where the resource module is missing
+    assert (report["children_peak_rss_bytes"] is None) == (sys.platform == "win32")
+    assert "bundles/s" in format_bench_report(report)
+    assert "Peak RSS: 3.0 MiB" in format_bench_report(report)
+
+
+def test_bench_report_without_peak_rss():
+    report = bench_report([BenchRun(1.0, [1.0])], 1, 10, peak_rss=None, setup_rss=0)
+
+    assert report["peak_rss_bytes"] is None
+    assert "Peak RSS: unknown" in format_bench_report(report)
@@ -0,0 +1,278 @@
+"""Micro-benchmarks of the analysis stages on synthetic traces
+
+Run with `make benchmark`, or `pytest tests/benchmark --benchmark-only`.
+"""
+
+import json
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from traces_analyzer.benchmark.synthetic import (
+    SyntheticTraceConfig,
+    write_synthetic_bundle,
+)
+from traces_analyzer.cli import compare_traces, save_evaluations
+from traces_analyzer.evaluation.divergence_evaluation import DivergenceEvaluation
+from traces_analyzer.evaluation.evaluation import Evaluation
+from traces_analyzer.evaluation.financial_gain_loss_evaluation import (
+    FinancialGainLossEvaluation,
+)
+from traces_analyzer.evaluation.instruction_differences_evaluation import (
+    InstructionDifferencesEvaluation,
+)
+from traces_analyzer.evaluation.instruction_usage_evaluation import (
+    InstructionUsageEvaluation,
+)
+from traces_analyzer.evaluation.securify_properties_evaluation import (
+    SecurifyPropertiesEvaluation,
+)
+from traces_analyzer.evaluation.tod_source_evaluation import TODSourceEvaluation
+from traces_analyzer.evaluation.triage_evaluation import TriageEvaluation
+from traces_analyzer.features.divergence_locator import locate_divergence
+from traces_analyzer.features.extractors.currency_changes import (
+    CurrencyChangesFeatureExtractor,
+)
+from traces_analyzer.features.extractors.instruction_differences import (
+    InstructionDifferencesFeatureExtractor,
+)
+from traces_analyzer.features.extractors.instruction_location_grouper import (
+    InstructionLocationsGrouperFeatureExtractor,
+)
+from traces_analyzer.features.extractors.instruction_usages import (
+    InstructionUsagesFeatureExtractor,
+)
+from traces_analyzer.features.extractors.tod_source import TODSourceFeatureExtractor
+from traces_analyzer.features.feature_extraction_runner import (
+    FeatureExtractionRunner,
+    RunInfo,
+)
+from traces_analyzer.features.feature_extractor import (
+    DoubleInstructionFeatureExtractor,
+    SingleToDoubleInstructionFeatureExtractor,
+)
+from traces_analyzer.features.triage import triage_transaction
+from traces_analyzer.loader.directory_loader import DirectoryLoader
+from traces_analyzer.loader.event_parser import VmTraceEventsParser
+from traces_analyzer.loader.json_backend import (
+    JsonBackend,
+    get_available_json_backends,
+)
+from traces_analyzer.loader.loader import TraceBundle
+from traces_parser.parser.instructions.instructions import CALL
+from traces_parser.parser.instructions_parser import (
+    ParsedTransaction,
+    TransactionParsingInfo,
+    parse_transaction,
+)
+
+CONFIG = SyntheticTraceConfig(
+    steps=20_000, call_density=0.1, log_density=0.1, divergence_step=5_000
+)
+
+pytestmark = pytest.mark.slow
+
+
+@pytest.fixture(scope="module")
+def bundle_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    return write_synthetic_bundle(
+        tmp_path_factory.mktemp("synthetic"), "bundle", CONFIG
+    )
+
+
+@pytest.fixture(scope="module")
+def tx(bundle_dir: Path) -> TraceBundle:
+    with DirectoryLoader(bundle_dir, VmTraceEventsParser()) as bundle:
+        bundle.tx_a.events_normal = list(bundle.tx_a.events_normal)
+        bundle.tx_a.events_reverse = list(bundle.tx_a.events_reverse)
+        return bundle.tx_a
+
+
+@pytest.fixture(scope="module")
+def transactions(tx: TraceBundle) -> tuple[ParsedTransaction, ParsedTransaction]:
+    return _parse(tx, tx.events_normal), _parse(tx, tx.events_reverse)
+
+
+def _parse(tx: TraceBundle, events) -> ParsedTransaction:
+    return parse_transaction(
+        TransactionParsingInfo(tx.caller, tx.to, tx.calldata, tx.value), events
+    )
+
+
+def _run_extractor(
+    extractor: DoubleInstructionFeatureExtractor,
+    transactions: tuple[ParsedTransaction, ParsedTransaction],
+) -> DoubleInstructionFeatureExtractor:
+    FeatureExtractionRunner(RunInfo([extractor], transactions)).run()
+    return extractor
+
+
+def test_benchmark_load(benchmark, bundle_dir: Path):
+    def load():
+        with DirectoryLoader(bundle_dir, VmTraceEventsParser()) as bundle:
+            for tx in (bundle.tx_a, bundle.tx_b):
+                for _ in tx.events_normal:
+                    pass
+                for _ in tx.events_reverse:
+                    pass
+
+    benchmark(load)
+
+
+@pytest.mark.parametrize(
+    "backend", get_available_json_backends(), ids=lambda backend: backend.name
+)
+def test_benchmark_json_backend(benchmark, backend: JsonBackend, bundle_dir: Path):
+    trace = next((bundle_dir / "actual").glob("*.json")).read_bytes()
+
+    vm_trace = benchmark(backend.loads, trace)
+
+    assert vm_trace == json.loads(trace)
+
+
+def test_benchmark_parse_transaction(benchmark, tx: TraceBundle):
+    benchmark(_parse, tx, tx.events_normal)
+
+
+EXTRACTORS: dict[str, Callable[[], DoubleInstructionFeatureExtractor]] = {
+    "tod_source": TODSourceFeatureExtractor,
+    "instruction_differences": InstructionDifferencesFeatureExtractor,
+    "instruction_usages": lambda: SingleToDoubleInstructionFeatureExtractor(
+        InstructionUsagesFeatureExtractor(), InstructionUsagesFeatureExtractor()
+    ),
+    "currency_changes": lambda: SingleToDoubleInstructionFeatureExtractor(
+        CurrencyChangesFeatureExtractor(), CurrencyChangesFeatureExtractor()
+    ),
+    "calls_grouper": lambda: SingleToDoubleInstructionFeatureExtractor(
+        InstructionLocationsGrouperFeatureExtractor([CALL.opcode]),
+        InstructionLocationsGrouperFeatureExtractor([CALL.opcode]),
+    ),
+}
+
+
+@pytest.mark.parametrize("name", EXTRACTORS)
+def test_benchmark_feature_extractor(benchmark, name: str, transactions):
+    benchmark.pedantic(
+        _run_extractor,
+        setup=lambda: ((EXTRACTORS[name](), transactions), {}),
+        rounds=5,
+    )
+
+
+def test_benchmark_locate_divergence(benchmark, tx: TraceBundle):
+    benchmark(locate_divergence, tx.events_normal, tx.events_reverse)
+
+
+def test_benchmark_triage(benchmark, tx: TraceBundle):
+    benchmark(triage_transaction, tx.events_normal, tx.events_reverse, tx.to)
+
+
+def _evaluations(tx: TraceBundle, transactions) -> dict[str, Evaluation]:
+    tod_source: TODSourceFeatureExtractor = _run_extractor(
+        EXTRACTORS["tod_source"](), transactions
+    )  # type: ignore
+    differences: InstructionDifferencesFeatureExtractor = _run_extractor(
+        EXTRACTORS["instruction_differences"](), transactions
+    )  # type: ignore
+    usages: SingleToDoubleInstructionFeatureExtractor = _run_extractor(
+        EXTRACTORS["instruction_usages"](), transactions
+    )  # type: ignore
+    currency_changes: SingleToDoubleInstructionFeatureExtractor = _run_extractor(
+        EXTRACTORS["currency_changes"](), transactions
+    )  # type: ignore
+    calls: SingleToDoubleInstructionFeatureExtractor = _run_extractor(
+        EXTRACTORS["calls_grouper"](), transactions
+    )  # type: ignore
+
+    return {
+        "securify_properties": SecurifyPropertiesEvaluation(
+            calls.normal.instruction_groups,  # type: ignore
+            calls.reverse.instruction_groups,  # type: ignore
+        ),
+        "financial_gain_loss": FinancialGainLossEvaluation(
+            currency_changes.normal.currency_changes,  # type: ignore
+            currency_changes.reverse.currency_changes,  # type: ignore
+        ),
+        "tod_source": TODSourceEvaluation(tod_source.get_tod_source()),
+        "instruction_differences": InstructionDifferencesEvaluation(
+            occurrence_changes=differences.get_instructions_only_executed_by_one_trace(),
+            input_changes=differences.get_instructions_with_different_inputs(),
+        ),
+        "instruction_usage": InstructionUsageEvaluation(
+            usages.normal.get_used_opcodes_per_contract(),  # type: ignore
+            usages.reverse.get_used_opcodes_per_contract(),  # type: ignore
+        ),
+        "divergence": DivergenceEvaluation(
+            locate_divergence(tx.events_normal, tx.events_reverse)
+        ),
+        "triage": TriageEvaluation(
+            {tx.hash: triage_transaction(tx.events_normal, tx.events_reverse, tx.to)}
+        ),
+    }
+
+
+EVALUATIONS = [
+    "securify_properties",
+    "financial_gain_loss",
+    "tod_source",
+    "instruction_differences",
+    "instruction_usage",
+    "divergence",
+    "triage",
+]
+
+
+@pytest.fixture(scope="module")
+def evaluations(tx: TraceBundle, transactions) -> dict[str, Evaluation]:
+    return _evaluations(tx, transactions)
+
+
+@pytest.mark.parametrize("name", EVALUATIONS)
+def test_benchmark_evaluation(benchmark, name: str, evaluations):
+    evaluation = evaluations[name]
+
+    benchmark(lambda: (evaluation.dict_report(), evaluation.cli_report()))
+
+
+def test_benchmark_save_evaluations(benchmark, evaluations, tmp_path: Path):
+    benchmark(save_evaluations, list(evaluations.values()), tmp_path / "report.json")
+
+
+def test_benchmark_lazy_memory_compare_traces(benchmark, bundle_dir: Path):
+    """Record the share of steps whose memory is decoded by the full analysis with --lazy-memory"""
+    events: list = []
+
+    def load_and_compare():
+        with DirectoryLoader(
+            bundle_dir, VmTraceEventsParser(lazy_memory=True)
+        ) as bundle:
+            tx = bundle.tx_a
+            events[:] = [list(tx.events_normal), list(tx.events_reverse)]
+            compare_traces(
+                tx.hash,
+                tx.caller,
+                tx.to,
+                tx.calldata,
+                tx.value,
+                (events[0], events[1]),
+                False,
+            )
+
+    benchmark.pedantic(load_and_compare, rounds=3)
+    steps = [event for trace in events for event in trace]
+    decoded = sum(1 for event in steps if getattr(event, "memory_decoded", True))
+    benchmark.extra_info["memory_decoded_share"] = decoded / len(steps)
+
+
+def test_benchmark_compare_traces(benchmark, tx: TraceBundle):
+    benchmark(
+        compare_traces,
+        tx.hash,
+        tx.caller,
+        tx.to,
+        tx.calldata,
+        tx.value,
+        (tx.events_normal, tx.events_reverse),
+        False,
+    )
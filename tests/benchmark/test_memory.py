@@ -0,0 +1,95 @@
+import sys
+
+from traces_analyzer.benchmark import memory as memory_module
+from traces_analyzer.benchmark.memory import MemoryProfiler, peak_rss_bytes
+from traces_analyzer.benchmark.timings import StageTimer, TimingsSummary
+
+
+def test_memory_profiler_samples_the_largest_state():
+    memory = MemoryProfiler(top_sites=3)
+    timer = StageTimer(memory)
+    memory.start()
+
+    with timer.stage("parse"):
+        data = [bytes(1000) for _ in range(1000)]
+    del data
+    with timer.stage("save"):
+        pass
+    memory.stop()
+
+    report = timer.report()["memory"]
+    assert report["traced_peak"] >= 1000 * 1000
+    assert report["sampled_traced"] >= 1000 * 1000
+    assert sum(report["by_module"].values()) >= 1000 * 1000
+    assert set(report["by_module"]) == {
+        "loader",
+        "extractors",
+        "evaluations",
+        "traces_parser",
+        "other",
+    }
+    assert len(report["top_sites"]) == 3
+    assert "test_memory.py" in report["top_sites"][0]["site"]
+    assert set(report["objects"]) == {"Instruction", "HexString"}
+    if sys.platform != "win32":
+        assert report["peak_rss"] > 0
+
+
+def test_peak_rss_bytes_is_unknown_without_the_resource_module(monkeypatch):
+    # as on Windows
+    monkeypatch.setitem(sys.modules, "resource", None)
+
+    assert peak_rss_bytes() is None
+    assert peak_rss_bytes(children=True) is None
+
+
+def test_memory_profiler_counts_objects_when_the_memory_grew(monkeypatch):
+    counts = []
+    monkeypatch.setattr(
+        memory_module, "count_objects", lambda: counts.append(1) or {"Instruction": 0}
+    )
+    memory = MemoryProfiler()
+    memory.start()
+
+    data = [bytes(100_000)]
+    memory.sample()
+    # grows the traced memory a little, not by OBJECT_COUNT_GROWTH
+    data.append(bytes(1000))
+    memory.sample()
+    data.append(bytes(10 * len(data[0])))
+    memory.sample()
+    memory.stop()
+
+    assert len(counts) == 2
+    assert memory.report()["objects_traced"] >= 1_000_000
+
+
+def _report(bundle_id: int, peak_rss_delta: int) -> dict:
+    return {
+        "steps": bundle_id,
+        "wall": 1.0,
+        "cpu": 1.0,
+        "stages": {},
+        "memory": {"peak_rss_delta": peak_rss_delta},
+    }
+
+
+def test_timings_summary_memory():
+    summary = TimingsSummary(slowest=1)
+    for i, delta in enumerate([300, 100, 200]):
+        summary.add(f"bundle_{i}", _report(i, delta))
+
+    report = summary.report()["memory"]
+
+    assert report["peak_rss_delta"]["max"] == 300
+    assert report["peak_rss_delta"]["p50"] == 200
+    assert report["largest_bundles"] == [
+        {"bundle": "bundle_0", "peak_rss_delta": 300, "steps": 0}
+    ]
+
+
+def test_timings_summary_without_memory():
+    summary = TimingsSummary()
+    summary.add("bundle", {"steps": 1, "wall": 1.0, "cpu": 1.0, "stages": {}})
+
+    assert "memory" not in summary.report()
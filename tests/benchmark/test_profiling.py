@@ -0,0 +1,59 @@
+from pathlib import Path
+import pstats
+import time
+
+from traces_analyzer.benchmark.profiling import BundleProfiler, StackSampler
+
+
+def busy_loop(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stack_sampler_collapses_the_stacks():
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    busy_loop(0.05)
+    sampler.stop()
+
+    sampler.write_collapsed(Path("stacks.collapsed"))
+
+    lines = Path("stacks.collapsed").read_text().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.split(";")[-1].startswith("busy_loop (test_profiling.py:")
+    assert "test_stack_sampler_collapses_the_stacks" in stack
+
+
+def test_bundle_profiler_writes_pstats():
+    profiler = BundleProfiler(Path("profiles"), ["bundle_1"])
+
+    with profiler.profile("bundle_1"):
+        busy_loop(0.05)
+
+    stats = pstats.Stats("profiles/bundle_1.pstats")
+    assert any(function == "busy_loop" for _, _, function in stats.stats)  # type: ignore
+    assert not Path("profiles/bundle_1.collapsed").exists()
+
+
+def test_bundle_profiler_writes_collapsed_stacks():
+    profiler = BundleProfiler(
+        Path("profiles"), ["bundle_1"], sample_interval=0.001, profiler="stacks"
+    )
+
+    with profiler.profile("bundle_1"):
+        busy_loop(0.05)
+
+    assert "busy_loop" in Path("profiles/bundle_1.collapsed").read_text()
+    assert not Path("profiles/bundle_1.pstats").exists()
+
+
+def test_bundle_profiler_selection():
+    profiler = BundleProfiler(Path("profiles"), ["bundle_1"], slower_than=2)
+
+    assert profiler.selected("bundle_1")
+    assert not profiler.selected("bundle_2")
+    assert profiler.too_slow(3)
+    assert not profiler.too_slow(1)
+    assert not BundleProfiler(Path("profiles")).too_slow(3)
@@ -0,0 +1,75 @@
+import json
+from pathlib import Path
+
+from traces_analyzer.benchmark.synthetic import (
+    SyntheticTraceConfig,
+    generate_vm_trace,
+    write_synthetic_bundle,
+)
+
+
+def test_generate_vm_trace_is_deterministic():
+    config = SyntheticTraceConfig(steps=500, seed=3)
+
+    assert generate_vm_trace(config) == generate_vm_trace(config)
+    assert generate_vm_trace(config) != generate_vm_trace(
+        SyntheticTraceConfig(steps=500, seed=4)
+    )
+
+
+def test_generate_vm_trace_shape():
+    config = SyntheticTraceConfig(
+        steps=2000, call_depth=2, call_density=0.3, log_density=0.3
+    )
+
+    steps = generate_vm_trace(config)["structLogs"]
+    ops = {step["op"] for step in steps}
+
+    assert 2000 <= len(steps) < 2500
+    assert {"CALL", "LOG3", "SLOAD", "MSTORE", "JUMPI"} <= ops
+    assert max(step["depth"] for step in steps) == 3
+    assert steps[-1]["op"] == "STOP" and steps[-1]["depth"] == 1
+
+
+def test_generate_vm_trace_call_enters_child_frame():
+    steps = generate_vm_trace(SyntheticTraceConfig(steps=1000, call_density=0.5))[
+        "structLogs"
+    ]
+
+    call = next(i for i, step in enumerate(steps) if step["op"] == "CALL")
+
+    assert steps[call + 1]["depth"] == steps[call]["depth"] + 1
+    assert steps[call + 1]["pc"] == 0
+    assert steps[call + 1]["stack"] == []
+
+
+def test_generate_vm_trace_divergence_step():
+    config = SyntheticTraceConfig(steps=1000, divergence_step=400)
+
+    normal = generate_vm_trace(config)["structLogs"]
+    reverse = generate_vm_trace(config, reverse=True)["structLogs"]
+    first_difference = next(
+        i for i, (a, b) in enumerate(zip(normal, reverse)) if a != b
+    )
+
+    assert len(normal) == len(reverse)
+    assert first_difference > 400
+    # the step after the first SLOAD since the divergence step
+    assert normal[first_difference - 1]["op"] == "SLOAD"
+    assert generate_vm_trace(SyntheticTraceConfig(steps=1000), reverse=True) == (
+        generate_vm_trace(SyntheticTraceConfig(steps=1000))
+    )
+
+
+def test_write_synthetic_bundle(tmp_path: Path):
+    dir = write_synthetic_bundle(tmp_path, "bundle", SyntheticTraceConfig(steps=100))
+
+    metadata = json.loads((dir / "metadata.json").read_text())
+    tx_a, tx_b = metadata["transactions_order"]
+
+    assert metadata["id"] == "bundle"
+    assert metadata["transactions"][tx_a]["hash"] == tx_a
+    for scenario in ("actual", "reverse"):
+        for hash in (tx_a, tx_b):
+            trace = json.loads((dir / scenario / f"{hash}.json").read_text())
+            assert len(trace["structLogs"]) >= 100
@@ -0,0 +1,68 @@
+from itertools import count
+
+import pytest
+
+from traces_analyzer.benchmark import timings
+from traces_analyzer.benchmark.timings import (
+    StageTimer,
+    TimingsSummary,
+    format_timings_summary,
+    timed,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch):
+    """Each reading of the clock advances it by one second"""
+    ticks = count()
+    monkeypatch.setattr(timings.time, "perf_counter", lambda: next(ticks))
+    monkeypatch.setattr(timings.time, "process_time", lambda: 0.0)
+
+
+def test_stage_timer_charges_the_innermost_stage(clock):
+    timer = StageTimer()
+
+    with timer.stage("parse"):
+        events = list(timer.timed_events(["a", "b"]))
+    with timed(timer, "save"):
+        pass
+
+    report = timer.report()
+    assert events == ["a", "b"]
+    assert report["steps"] == 2
+    assert report["stages"]["load"]["wall"] == 3
+    assert report["stages"]["parse"]["wall"] == 4
+    assert report["stages"]["save"]["wall"] == 1
+    assert report["wall"] == 8
+
+
+def test_timed_without_timer():
+    with timed(None, "parse"):
+        pass
+
+
+def _report(wall: float, steps: int) -> dict:
+    return {
+        "steps": steps,
+        "wall": wall,
+        "cpu": wall / 2,
+        "stages": {"parse": {"wall": wall, "cpu": wall / 2}},
+    }
+
+
+def test_timings_summary():
+    summary = TimingsSummary(slowest=2)
+    for i, wall in enumerate([1.0, 4.0, 2.0, 3.0]):
+        summary.add(f"bundle_{i}", _report(wall, 10 * i))
+
+    report = summary.report()
+
+    assert report["bundles"] == 4
+    assert report["stages"]["parse"]["wall"] == 10.0
+    assert report["stages"]["parse"]["cpu"] == 5.0
+    assert report["stages"]["parse"]["p50"] == 2.5
+    assert report["slowest_bundles"] == [
+        {"bundle": "bundle_1", "wall": 4.0, "steps": 10},
+        {"bundle": "bundle_3", "wall": 3.0, "steps": 30},
+    ]
+    assert "bundle_1: 4.000 s, 10 steps" in format_timings_summary(report)
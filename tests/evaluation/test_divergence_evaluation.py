@@ -0,0 +1,40 @@
+import json
+
+from traces_analyzer.evaluation.divergence_evaluation import DivergenceEvaluation
+from traces_analyzer.features.divergence_locator import Divergence
+
+
+def test_divergence_evaluation_report():
+    divergence = Divergence(
+        steps_normal=10,
+        steps_reverse=12,
+        first_divergence=4,
+        first_divergence_depth=2,
+        divergent_steps=8,
+        regions=[(4, 12)],
+    )
+
+    evaluation = DivergenceEvaluation(divergence)
+
+    assert evaluation.dict_report() == {
+        "evaluation_type": "divergence",
+        "report": {
+            "steps_normal": 10,
+            "steps_reverse": 12,
+            "first_divergence": 4,
+            "first_divergence_depth": 2,
+            "divergent_steps": 8,
+            "regions": [[4, 12]],
+            "regions_truncated": False,
+            "identical": False,
+        },
+    }
+    json.dumps(evaluation.dict_report())
+    assert "First divergence at step 4" in evaluation.cli_report()
+
+
+def test_divergence_evaluation_report_of_identical_traces():
+    evaluation = DivergenceEvaluation(Divergence(identical=True))
+
+    assert evaluation.dict_report()["report"]["identical"]
+    assert "identical" in evaluation.cli_report()
@@ -0,0 +1,33 @@
+from traces_analyzer.evaluation.extractor_costs_evaluation import (
+    ExtractorCostsEvaluation,
+)
+from traces_analyzer.features.feature_extraction_runner import (
+    ExtractorCost,
+    OpcodeCost,
+)
+
+
+def test_extractor_costs_evaluation():
+    cost = ExtractorCost(
+        "SingleToDoubleInstructionFeatureExtractor",
+        calls=4,
+        seconds=2.0,
+        opcodes={"POP": OpcodeCost(1, 0.5), "CALL": OpcodeCost(3, 1.5)},
+        inner=[ExtractorCost("CurrencyChangesFeatureExtractor (normal)", 4, 1.0)],
+    )
+
+    evaluation = ExtractorCostsEvaluation([cost])
+    report = evaluation.dict_report()
+
+    assert report["evaluation_type"] == "extractor_costs"
+    (extractor,) = report["report"]["extractors"]
+    assert extractor["seconds_per_call"] == 0.5
+    assert list(extractor["opcodes"]) == ["CALL", "POP"]
+    assert (
+        extractor["inner"][0]["extractor"] == "CurrencyChangesFeatureExtractor (normal)"
+    )
+    assert "inner" not in extractor["inner"][0]
+    assert (
+        "  CurrencyChangesFeatureExtractor (normal): 1.0000 s"
+        in evaluation.cli_report()
+    )
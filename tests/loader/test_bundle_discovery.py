@@ -0,0 +1,62 @@
+import io
+from pathlib import Path
+
+from tests.test_utils.bundles import _test_bundle_dir
+from traces_analyzer.loader.bundle_discovery import (
+    CHECK_BATCH_SIZE,
+    discover_bundle_dirs,
+    read_bundle_paths,
+)
+
+
+def test_discover_bundle_dirs_finds_nested_bundles(tmp_path: Path):
+    expected = {
+        _test_bundle_dir(tmp_path / "a", "bundle_1"),
+        _test_bundle_dir(tmp_path / "a" / "b" / "c", "bundle_2"),
+        _test_bundle_dir(tmp_path / "d", "bundle_3"),
+    }
+    (tmp_path / "empty").mkdir()
+    (tmp_path / "a" / "notes.txt").write_text("not a bundle")
+
+    assert set(discover_bundle_dirs([tmp_path], workers=3)) == expected
+
+
+def test_discover_bundle_dirs_does_not_descend_into_bundles(tmp_path: Path):
+    bundle = _test_bundle_dir(tmp_path, "bundle")
+    _test_bundle_dir(bundle / "actual", "nested")
+
+    assert list(discover_bundle_dirs([bundle])) == [bundle]
+
+
+def test_discover_bundle_dirs_checks_more_directories_than_a_batch(tmp_path: Path):
+    expected = {
+        _test_bundle_dir(tmp_path / "a", f"bundle_{i}")
+        for i in range(3 * CHECK_BATCH_SIZE)
+    }
+    for i in range(CHECK_BATCH_SIZE):
+        (tmp_path / "a" / f"empty_{i}").mkdir()
+    expected.add(_test_bundle_dir(tmp_path / "a" / "empty_0", "nested"))
+
+    bundles = list(discover_bundle_dirs([tmp_path], workers=1))
+
+    assert len(bundles) == len(expected)
+    assert set(bundles) == expected
+
+
+def test_discover_bundle_dirs_can_be_closed_early(tmp_path: Path):
+    for i in range(10):
+        _test_bundle_dir(tmp_path / str(i), "bundle")
+
+    bundles = discover_bundle_dirs([tmp_path], workers=2)
+    next(bundles)
+    bundles.close()
+
+
+def test_read_bundle_paths_skips_empty_lines():
+    lines = io.StringIO("traces/a\n\n  traces/b  \ntraces/c")
+
+    assert list(read_bundle_paths(lines)) == [
+        Path("traces/a"),
+        Path("traces/b"),
+        Path("traces/c"),
+    ]
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from tests.test_utils.bundles import _test_bundle_dir
+from traces_analyzer.loader.directory_loader import DirectoryLoader
+from traces_analyzer.loader.event_parser import VmTraceEventsParser
+from traces_analyzer.loader.fingerprint import trace_fingerprint, traces_identical
+
+
+def test_trace_fingerprint_streams_in_chunks(tmp_path: Path):
+    path = tmp_path / "trace.json"
+    path.write_bytes(b"x" * 100)
+
+    assert trace_fingerprint(path, chunk_size=7) == trace_fingerprint(path)
+    assert trace_fingerprint(path)[0] == 100
+
+
+def test_traces_identical(tmp_path: Path):
+    a, b, c, d = (tmp_path / name for name in "abcd")
+    a.write_bytes(b'{"structLogs": [1]}')
+    b.write_bytes(b'{"structLogs": [1]}')
+    c.write_bytes(b'{"structLogs": [2]}')
+    d.write_bytes(b'{"structLogs": [1, 2]}')
+
+    assert traces_identical(a, b)
+    assert not traces_identical(a, c)
+    assert not traces_identical(a, d)
+
+
+def test_directory_loader_detects_identical_traces(tmp_path: Path):
+    identical = _test_bundle_dir(tmp_path, "identical", steps=3)
+    different = _test_bundle_dir(tmp_path, "different", steps=3, reverse_steps=4)
+    parser = VmTraceEventsParser()
+
+    with DirectoryLoader(identical, parser, detect_identical=True) as bundle:
+        assert bundle.tx_a.identical_traces
+        assert bundle.tx_a.events_reverse is bundle.tx_a.events_normal
+
+    with DirectoryLoader(different, parser, detect_identical=True) as bundle:
+        assert not bundle.tx_a.identical_traces
+        assert len(list(bundle.tx_a.events_reverse)) == 4
+
+    with DirectoryLoader(identical, parser) as bundle:
+        assert not bundle.tx_a.identical_traces
+
+
+def test_reopened_directory_loader_keeps_detecting_identical_traces(tmp_path: Path):
+    identical = _test_bundle_dir(tmp_path, "identical", steps=3)
+    loader = DirectoryLoader(identical, VmTraceEventsParser(), detect_identical=True)
+
+    with loader.reopen() as bundle:
+        assert bundle.tx_a.identical_traces
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from traces_analyzer.loader.json_backend import (
+    JSON_BACKENDS,
+    AutoJsonBackend,
+    StdlibJsonBackend,
+    get_available_json_backends,
+    get_json_backend,
+)
+from traces_analyzer.loader.struct_logs import StructLogDeduplicator
+
+vm_trace = json.dumps(
+    {
+        "failed": False,
+        "gas": 798496,
+        "structLogs": [
+            {
+                "pc": i,
+                "op": "PUSH1",
+                "gas": 1000 - i,
+                "depth": 1,
+                "stack": [hex(i)],
+                "memory": ["00" * 32],
+                "storage": {"00" * 32: "11" * 32},
+            }
+            for i in range(3)
+        ],
+    }
+)
+
+
+def test_get_json_backend_auto_falls_back_to_an_installed_backend():
+    backend = get_json_backend()
+
+    assert isinstance(backend, AutoJsonBackend)
+    assert backend.fastest.name in [b.name for b in get_available_json_backends()]
+    assert backend.loads(vm_trace) == json.loads(vm_trace)
+
+
+def test_auto_json_backend_drops_struct_log_fields_while_decoding():
+    decoded_objects = []
+
+    def object_hook(obj: dict) -> dict:
+        decoded_objects.append(obj)
+        return obj
+
+    get_json_backend().loads_vm_trace(vm_trace, object_hook)
+
+    # the hook also sees the storage maps and the trace, thus it runs while decoding
+    assert {"00" * 32: "11" * 32} in decoded_objects
+    assert "structLogs" in decoded_objects[-1]
+
+
+def test_get_json_backend_by_name():
+    assert isinstance(get_json_backend("json"), StdlibJsonBackend)
+
+    with pytest.raises(ValueError):
+        get_json_backend("yaml")
+
+
+def test_get_json_backend_names_the_missing_package(monkeypatch):
+    class MissingBackend(StdlibJsonBackend):
+        name = "missing"
+        package = "missing-json"
+
+        def __init__(self) -> None:
+            raise ImportError("No module named 'missing_json'")
+
+    monkeypatch.setitem(JSON_BACKENDS, "missing", MissingBackend)
+
+    with pytest.raises(ImportError, match="requires the missing-json package"):
+        get_json_backend("missing")
+
+
+@pytest.mark.parametrize(
+    "backend", get_available_json_backends(), ids=lambda backend: backend.name
+)
+def test_json_backends_decode_like_stdlib(backend):
+    assert backend.loads(vm_trace) == json.loads(vm_trace)
+    assert backend.loads(vm_trace.encode()) == json.loads(vm_trace)
+
+
+@pytest.mark.parametrize(
+    "backend", get_available_json_backends(), ids=lambda backend: backend.name
+)
+def test_json_backends_apply_object_hook_to_struct_logs(backend):
+    decoded = backend.loads_vm_trace(vm_trace, StructLogDeduplicator())
+
+    assert decoded["gas"] == 798496
+    steps = decoded["structLogs"]
+    assert [step["pc"] for step in steps] == [0, 1, 2]
+    assert "storage" not in steps[0]
+    assert steps[1]["memory"] is steps[0]["memory"]
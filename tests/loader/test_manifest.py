@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import pytest
+
+from tests.test_utils.bundles import _test_bundle_dir, _test_tx_hash
+from traces_analyzer.loader.directory_loader import DirectoryLoader
+from traces_analyzer.loader.event_parser import VmTraceEventsParser
+from traces_analyzer.loader.manifest import (
+    ManifestLoader,
+    build_manifest,
+    read_manifest,
+    scan_bundle,
+    scan_bundles,
+    trace_format,
+)
+from traces_analyzer.loader.step_index import StepIndex
+
+
+def test_scan_bundle_records_metadata_and_traces(tmp_path: Path):
+    dir = _test_bundle_dir(tmp_path, "bundle", extension="json.gz")
+    hash = _test_tx_hash("bundle_a")
+
+    entry = scan_bundle(dir)
+
+    assert entry["metadata"]["id"] == "bundle"
+    trace = entry["traces"][hash]["reverse"]
+    assert trace["path"] == f"reverse/{hash}.json.gz"
+    assert trace["size"] == (dir / trace["path"]).stat().st_size
+    assert trace["format"] == "structlogs"
+
+
+def test_scan_bundles_uses_metadata_that_was_read_already(tmp_path: Path):
+    dirs = [_test_bundle_dir(tmp_path, f"bundle_{i}") for i in range(3)]
+    metadata = scan_bundle(dirs[1])["metadata"]
+    (dirs[1] / DirectoryLoader.METADATA_FILENAME).unlink()
+
+    entries = list(scan_bundles([dirs[0], (dirs[1], metadata), dirs[2]], workers=2))
+
+    assert [e["metadata"]["id"] for e in entries] == [
+        "bundle_0",
+        "bundle_1",
+        "bundle_2",
+    ]
+
+
+def test_scan_bundle_fails_for_missing_traces(tmp_path: Path):
+    dir = _test_bundle_dir(tmp_path, "bundle")
+    (dir / "reverse" / f"{_test_tx_hash('bundle_b')}.json").unlink()
+
+    with pytest.raises(FileNotFoundError):
+        scan_bundle(dir)
+
+
+def test_trace_format():
+    assert trace_format("0x12.json") == "structlogs"
+    assert trace_format("0x12.json.gz") == "structlogs"
+    assert trace_format("0x12.jsonl") == "eip3155"
+    assert trace_format("0x12.jsonl.gz") == "eip3155"
+
+
+def test_manifest_loader_loads_like_directory_loader(tmp_path: Path):
+    dirs = [
+        _test_bundle_dir(tmp_path / "traces" / str(i), f"bundle_{i}", steps=i + 2)
+        for i in range(5)
+    ]
+    manifest_path = tmp_path / "manifest.jsonl"
+    parser = VmTraceEventsParser()
+
+    assert build_manifest([tmp_path / "traces"], manifest_path, workers=2) == 5
+    entries = sorted(read_manifest(manifest_path), key=lambda e: e["metadata"]["id"])
+
+    assert [Path(entry["dir"]).resolve() for entry in entries] == dirs
+    for entry, dir in zip(entries, dirs):
+        with ManifestLoader(entry, parser) as from_manifest:
+            with DirectoryLoader(dir, parser) as from_dir:
+                assert from_manifest.id == from_dir.id
+                assert from_manifest.tx_b.hash == from_dir.tx_b.hash
+                assert len(list(from_manifest.tx_a.events_reverse)) == len(
+                    list(from_dir.tx_a.events_reverse)
+                )
+
+
+def test_reopened_manifest_loader_keeps_the_entry_and_options(tmp_path: Path):
+    dir = _test_bundle_dir(tmp_path, "bundle", steps=3)
+    loader = ManifestLoader(scan_bundle(dir), VmTraceEventsParser(), step_index=True)
+
+    reopened = loader.reopen()
+
+    assert isinstance(reopened, ManifestLoader)
+    with reopened as bundle:
+        assert len(list(bundle.tx_a.events_normal)) == 3
+    path_normal, _ = reopened.find_trace_paths(bundle.tx_a.hash)
+    assert StepIndex.load(path_normal) is not None
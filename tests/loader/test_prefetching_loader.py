@@ -0,0 +1,219 @@
+from concurrent.futures import CancelledError
+import gzip
+from pathlib import Path
+from threading import Thread
+import time
+
+import pytest
+
+from tests.test_utils.bundles import _test_bundle_dir
+from traces_analyzer.loader.directory_loader import DirectoryLoader
+from traces_analyzer.loader.event_parser import (
+    DECODED_BYTES_PER_TEXT_BYTE,
+    EIP3155EventsParser,
+    EventsParser,
+    VmTraceEventsParser,
+)
+from traces_analyzer.loader.json_backend import get_json_backend
+from traces_analyzer.loader.prefetching_loader import (
+    OrderedMemoryBudget,
+    PrefetchedDirectoryLoader,
+    PrefetchingBundleSource,
+    trace_text_size,
+)
+
+
+def _load_all(loaders) -> list[tuple[str, int, int]]:
+    results = []
+    for loader in loaders:
+        with loader as bundle:
+            results.append(
+                (
+                    bundle.id,
+                    len(list(bundle.tx_a.events_normal)),
+                    len(list(bundle.tx_b.events_reverse)),
+                )
+            )
+    return results
+
+
+@pytest.mark.parametrize("prefetch", [0, 1, 3])
+@pytest.mark.parametrize("decode", [False, True])
+def test_prefetching_bundle_source_loads_like_directory_loader(
+    tmp_path: Path, prefetch: int, decode: bool
+):
+    dirs = [
+        _test_bundle_dir(tmp_path, f"bundle_{i}", steps=i + 2, extension=ext)
+        for i, ext in enumerate(["json", "json.gz", "json", "json"])
+    ]
+    parser = VmTraceEventsParser()
+
+    expected = _load_all(DirectoryLoader(dir, parser) for dir in dirs)
+    prefetched = _load_all(
+        PrefetchingBundleSource(dirs, parser, prefetch=prefetch, decode=decode)
+    )
+
+    assert prefetched == expected
+    assert [id for id, _, _ in prefetched] == [f"bundle_{i}" for i in range(4)]
+
+
+@pytest.mark.parametrize("decode", [False, True])
+def test_prefetching_bundle_source_detects_identical_traces(
+    tmp_path: Path, decode: bool
+):
+    identical = _test_bundle_dir(tmp_path, "identical", steps=3)
+    different = _test_bundle_dir(tmp_path, "different", steps=3, reverse_steps=4)
+
+    source = PrefetchingBundleSource(
+        [identical, different],
+        VmTraceEventsParser(),
+        prefetch=2,
+        decode=decode,
+        detect_identical=True,
+    )
+    loaders = iter(source)
+
+    with next(loaders) as bundle:
+        assert bundle.tx_a.identical_traces
+        assert bundle.tx_a.events_reverse is bundle.tx_a.events_normal
+        assert len(list(bundle.tx_a.events_normal)) == 3
+    with next(loaders) as bundle:
+        assert not bundle.tx_a.identical_traces
+        assert len(list(bundle.tx_a.events_reverse)) == 4
+
+
+@pytest.mark.parametrize("prefetch", [0, 2])
+def test_prefetching_bundle_source_uses_metadata_that_was_read_already(
+    tmp_path: Path, prefetch: int
+):
+    parser = VmTraceEventsParser()
+    dirs = [_test_bundle_dir(tmp_path, f"bundle_{i}") for i in range(2)]
+    bundles = [(dir, DirectoryLoader(dir, parser).read_metadata()) for dir in dirs]
+    for dir in dirs:
+        (dir / DirectoryLoader.METADATA_FILENAME).unlink()
+
+    source = PrefetchingBundleSource(bundles, parser, prefetch=prefetch)
+
+    assert [id for id, _, _ in _load_all(source)] == ["bundle_0", "bundle_1"]
+
+
+class RecordingBudget(OrderedMemoryBudget):
+    def __init__(self, limit: int) -> None:
+        super().__init__(limit)
+        self.released: list[int] = []
+
+    def release(self, size: int):
+        self.released.append(size)
+        super().release(size)
+
+
+def test_prefetched_bundle_releases_its_memory_if_entering_fails(tmp_path: Path):
+    dir = _test_bundle_dir(tmp_path, "broken")
+    parser = VmTraceEventsParser()
+    metadata = DirectoryLoader(dir, parser).read_metadata()
+    paths = list(dir.glob("*/*.json"))
+    budget = RecordingBudget(100)
+    budget.acquire(0, 10)
+    loader = PrefetchedDirectoryLoader(
+        dir,
+        parser,
+        get_json_backend(),
+        metadata,
+        {path: "{" for path in paths},
+        {},
+        budget,
+        10,
+    )
+
+    with pytest.raises(ValueError):
+        with loader:
+            pass
+
+    assert budget.released == [10]
+
+
+@pytest.mark.parametrize(
+    "parser,factor",
+    [
+        (EIP3155EventsParser(), 1),
+        (VmTraceEventsParser(lazy_memory=True), 1),
+        (VmTraceEventsParser(), DECODED_BYTES_PER_TEXT_BYTE),
+    ],
+)
+def test_parsed_size_depends_on_eager_decoding(parser: EventsParser, factor: int):
+    assert parser.parsed_size(1000) == 1000 * factor
+
+
+def test_trace_text_size_of_compressed_traces(tmp_path: Path):
+    path = tmp_path / "trace.json.gz"
+    path.write_bytes(gzip.compress(b"x" * 10_000))
+
+    assert path.stat().st_size < 10_000
+    assert trace_text_size(path) == 10_000
+
+
+def test_prefetching_bundle_source_with_tiny_memory_budget(tmp_path: Path):
+    dirs = [_test_bundle_dir(tmp_path, f"bundle_{i}") for i in range(3)]
+
+    source = PrefetchingBundleSource(
+        dirs, VmTraceEventsParser(), prefetch=2, memory_budget=1
+    )
+
+    assert [id for id, _, _ in _load_all(source)] == [
+        "bundle_0",
+        "bundle_1",
+        "bundle_2",
+    ]
+
+
+def test_prefetching_bundle_source_can_be_closed_early(tmp_path: Path):
+    dirs = [_test_bundle_dir(tmp_path, f"bundle_{i}") for i in range(5)]
+    source = iter(
+        PrefetchingBundleSource(
+            dirs, VmTraceEventsParser(), prefetch=3, memory_budget=1
+        )
+    )
+
+    next(source)
+    source.close()
+
+
+def test_ordered_memory_budget_grants_in_ticket_order():
+    budget = OrderedMemoryBudget(10)
+    granted: list[int] = []
+
+    def acquire(ticket: int):
+        budget.acquire(ticket, 6)
+        granted.append(ticket)
+
+    second = Thread(target=acquire, args=(1,))
+    second.start()
+    time.sleep(0.05)
+    assert granted == []
+
+    acquire(0)
+    time.sleep(0.05)
+    # ticket 1 does not fit into the budget until ticket 0 is released
+    assert granted == [0]
+
+    budget.release(6)
+    second.join(timeout=1)
+    assert granted == [0, 1]
+
+
+def test_ordered_memory_budget_close_cancels_waiting_acquisitions():
+    budget = OrderedMemoryBudget(10)
+    errors: list[BaseException] = []
+
+    def acquire():
+        try:
+            budget.acquire(1, 1)
+        except CancelledError as e:
+            errors.append(e)
+
+    waiting = Thread(target=acquire)
+    waiting.start()
+    budget.close()
+    waiting.join(timeout=1)
+
+    assert len(errors) == 1
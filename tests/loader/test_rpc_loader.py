@@ -0,0 +1,186 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+from threading import Thread
+from typing import Iterator
+
+import pytest
+
+from tests.test_utils.bundles import _test_bundle_dir
+from traces_analyzer.loader.directory_loader import DirectoryLoader
+from traces_analyzer.loader.event_parser import VmTraceEventsParser
+from traces_analyzer.loader.rpc_loader import (
+    JsonRpcError,
+    RpcLoader,
+    TraceRpcClient,
+    _decode_utf8,
+    rpc_result,
+)
+
+from traces_parser.datatypes import HexString
+
+
+class _TraceRpcHandler(BaseHTTPRequestHandler):
+    """Serve debug_traceTransaction and debug_traceCall from the traces of a bundle directory"""
+
+    bundle_dir: Path
+    requests: list[dict]
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(request)
+        method, params = request["method"], request["params"]
+        if method == "debug_traceTransaction":
+            scenario, hash = "actual", params[0]
+        elif method == "debug_traceCall":
+            # the stand-in node identifies the reverse call by its state override
+            scenario, hash = "reverse", params[2]["stateOverrides"]["tx"]
+        else:
+            scenario, hash = None, None
+
+        trace_path = self.bundle_dir / str(scenario) / f"{hash}.json"
+        if trace_path.exists():
+            body = '{"jsonrpc":"2.0","id":%d,"result":%s}' % (
+                request["id"],
+                trace_path.read_text(),
+            )
+        else:
+            body = json.dumps(
+                {
+                    "jsonrpc": "2.0",
+                    "id": request["id"],
+                    "error": {"code": -32000, "message": "not found"},
+                }
+            )
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body.encode())))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def bundle_dir(tmp_path: Path) -> Path:
+    return _test_bundle_dir(tmp_path / "bundles", "bundle", steps=4, reverse_steps=6)
+
+
+@contextmanager
+def _serve_traces(bundle_dir: Path) -> Iterator[str]:
+    handler = type(
+        "Handler", (_TraceRpcHandler,), {"bundle_dir": bundle_dir, "requests": []}
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def rpc_url(bundle_dir: Path) -> Iterator[str]:
+    with _serve_traces(bundle_dir) as url:
+        yield url
+
+
+def _with_reverse_calls(metadata: dict) -> dict:
+    return {
+        **metadata,
+        "reverse_calls": {
+            hash: {"block": "0x10", "stateOverrides": {"tx": hash}}
+            for hash in metadata["transactions_order"]
+        },
+    }
+
+
+def test_rpc_loader_loads_like_directory_loader(
+    tmp_path: Path, bundle_dir: Path, rpc_url: str
+):
+    parser = VmTraceEventsParser()
+    metadata = _with_reverse_calls(DirectoryLoader(bundle_dir, parser).read_metadata())
+    cache_dir = tmp_path / "cache"
+
+    with TraceRpcClient(rpc_url) as client:
+        with RpcLoader(metadata, client, parser, cache_dir) as from_rpc:
+            with DirectoryLoader(bundle_dir, parser) as from_dir:
+                assert from_rpc.id == from_dir.id
+                for rpc_tx, dir_tx in [
+                    (from_rpc.tx_a, from_dir.tx_a),
+                    (from_rpc.tx_b, from_dir.tx_b),
+                ]:
+                    assert rpc_tx.hash == dir_tx.hash
+                    assert len(list(rpc_tx.events_normal)) == 4
+                    assert len(list(rpc_tx.events_reverse)) == 6
+
+    with DirectoryLoader(cache_dir / "bundle", parser) as cached:
+        assert len(list(cached.tx_b.events_reverse)) == 6
+
+
+def test_rpc_loader_detects_identical_traces(tmp_path: Path):
+    parser = VmTraceEventsParser()
+    identical_dir = _test_bundle_dir(tmp_path / "bundles", "identical", steps=4)
+    metadata = _with_reverse_calls(
+        DirectoryLoader(identical_dir, parser).read_metadata()
+    )
+
+    with _serve_traces(identical_dir) as url, TraceRpcClient(url) as client:
+        with RpcLoader(metadata, client, parser, detect_identical=True) as bundle:
+            assert bundle.tx_a.identical_traces
+            assert bundle.tx_a.events_reverse is bundle.tx_a.events_normal
+        with RpcLoader(metadata, client, parser) as bundle:
+            assert not bundle.tx_a.identical_traces
+
+
+def test_trace_rpc_client_raises_rpc_errors(rpc_url: str):
+    with TraceRpcClient(rpc_url) as client:
+        with pytest.raises(JsonRpcError, match="not found"):
+            client.trace_transaction(HexString("0x1234"))
+
+
+def test_rpc_result_extracts_result_without_decoding():
+    result = '{"structLogs": [{"pc": 0, "stack": ["0x1", "0x]"]}], "gas": 5}'
+
+    assert rpc_result('{"jsonrpc":"2.0","id":1,"result":%s}' % result) == result
+    assert rpc_result('{"id": "x", "result": %s}\n' % result) == result
+    assert rpc_result('{"result":%s,"id":1,"jsonrpc":"2.0"}' % result) == result
+    assert rpc_result('{"result" : [1, {"a": "}"}] , "id":1}') == '[1, {"a": "}"}]'
+
+
+def test_rpc_result_raises_errors_and_missing_results():
+    with pytest.raises(JsonRpcError, match="x \\(code -1\\)"):
+        rpc_result('{"jsonrpc":"2.0","id":1,"error":{"code":-1,"message":"x"}}')
+    with pytest.raises(JsonRpcError, match="no result"):
+        rpc_result('{"jsonrpc":"2.0","id":1,"result":null}')
+    with pytest.raises(JsonRpcError, match="no result"):
+        rpc_result('{"jsonrpc":"2.0","id":1}')
+    with pytest.raises(JsonRpcError, match="incomplete"):
+        rpc_result('{"jsonrpc":"2.0","id":1,"result":{"structLogs":[')
+    with pytest.raises(JsonRpcError, match="incomplete"):
+        rpc_result('{"jsonrpc":"2.0","id":1,"result":{"structLogs":[]}')
+
+
+def test_rpc_result_skips_nested_and_escaped_values():
+    result = '{"structLogs": [{"op": "PUSH1", "stack": ["0x\\"1"], "memory": [], "storage": {"0x1": "0x[{"}}, {}], "x": [[], {"a": [1, {}]}]}'
+    response = '{ "jsonrpc": "2.0", "result" : %s , "id": 7 }' % result
+
+    assert rpc_result(response) == result
+    assert json.loads(rpc_result(response)) == json.loads(result)
+
+
+def test_decode_utf8_joins_characters_split_between_chunks():
+    data = '{"result": "ä"}'.encode()
+
+    assert _decode_utf8([data[:12], data[12:13], data[13:]]) == '{"result": "ä"}'
+
+
+def test_rpc_loader_requires_the_reverse_calls(bundle_dir: Path, rpc_url: str):
+    metadata = DirectoryLoader(bundle_dir, VmTraceEventsParser()).read_metadata()
+
+    with TraceRpcClient(rpc_url) as client:
+        with pytest.raises(ValueError, match="reverse_calls"):
+            with RpcLoader(metadata, client, VmTraceEventsParser()):
+                pass
@@ -0,0 +1,131 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from tests.test_utils.bundles import _test_bundle_dir, _test_tx_hash, _test_vm_trace
+from traces_analyzer.loader.directory_loader import DirectoryLoader
+from traces_analyzer.loader.event_parser import VmTraceEventsParser
+from traces_analyzer.loader.step_index import StepIndex
+
+from traces_parser.datatypes import HexString
+
+
+def _write_vm_trace(path: Path, steps: int, indent: int | None = None) -> dict:
+    vm_trace = _test_vm_trace(steps)
+    vm_trace["structLogs"][0]["error"] = "ünicode"
+    path.write_text(json.dumps(vm_trace, indent=indent), encoding="utf-8")
+    return vm_trace
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_step_index_reads_windows_of_vm_trace(tmp_path: Path, indent: int | None):
+    path = tmp_path / "trace.json"
+    vm_trace = _write_vm_trace(path, 10, indent)
+
+    index = StepIndex.build(path)
+
+    assert len(index) == 10
+    assert index.read_steps(0, 10) == vm_trace["structLogs"]
+    assert index.read_steps(3, 5) == vm_trace["structLogs"][3:5]
+    assert index.read_steps(8, 100) == vm_trace["structLogs"][8:]
+    assert index.read_steps(5, 5) == []
+
+
+def test_step_index_reads_windows_of_jsonl_trace(tmp_path: Path):
+    lines = [
+        json.dumps({"pc": 2 * i, "op": 96, "stack": [], "depth": 1}) for i in range(5)
+    ]
+    path = tmp_path / "trace.jsonl"
+    path.write_text("\n".join([*lines, '{"output":"","gasUsed":"0x5"}']) + "\n")
+
+    index = StepIndex.build(path)
+
+    assert len(index) == 5
+    assert index.read_records(1, 3) == lines[1:3]
+    assert [step["pc"] for step in index.read_steps(2, 5)] == [4, 6, 8]
+
+
+def test_step_index_sidecar_roundtrip_and_staleness(tmp_path: Path):
+    path = tmp_path / "trace.json"
+    vm_trace = _write_vm_trace(path, 4)
+
+    assert StepIndex.load(path) is None
+    StepIndex.ensure(path)
+    assert StepIndex.sidecar_path(path).exists()
+
+    loaded = StepIndex.load(path)
+    assert loaded is not None
+    assert loaded.read_steps(1, 2) == vm_trace["structLogs"][1:2]
+
+    _write_vm_trace(path, 6)
+    assert StepIndex.load(path) is None
+    assert len(StepIndex.ensure(path)) == 6
+
+
+def test_step_index_is_stale_after_a_rewrite_of_the_same_size(tmp_path: Path):
+    path = tmp_path / "trace.json"
+    _write_vm_trace(path, 4)
+    StepIndex.ensure(path)
+
+    _write_vm_trace(path, 4)
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+
+    assert StepIndex.load(path) is None
+
+
+def test_step_index_built_while_reading_matches_build(tmp_path: Path):
+    path = tmp_path / "trace.json"
+    vm_trace = _write_vm_trace(path, 6, indent=2)
+
+    with open(path, newline="") as trace_file:
+        lines = list(StepIndex.indexing(path, trace_file))
+
+    assert "".join(lines) == path.read_text(encoding="utf-8")
+    loaded = StepIndex.load(path)
+    assert loaded is not None
+    assert len(loaded) == 6
+    assert loaded.read_steps(2, 4) == vm_trace["structLogs"][2:4]
+    assert loaded.read_records(0, 6) == StepIndex.build(path).read_records(0, 6)
+
+
+def test_step_index_of_jsonl_trace_with_crlf_line_endings(tmp_path: Path):
+    lines = [
+        json.dumps({"pc": 2 * i, "op": 96, "stack": [], "depth": 1}) for i in range(3)
+    ]
+    path = tmp_path / "trace.jsonl"
+    path.write_bytes(("\r\n".join(lines) + "\r\n").encode())
+
+    with open(path, newline="") as trace_file:
+        for _ in StepIndex.indexing(path, trace_file):
+            pass
+    loaded = StepIndex.load(path)
+
+    assert loaded is not None
+    assert loaded.read_records(0, 3) == lines
+
+
+def test_step_index_empty_struct_logs(tmp_path: Path):
+    path = tmp_path / "trace.json"
+    path.write_text('{"failed": false, "structLogs": []}')
+
+    index = StepIndex.build(path)
+
+    assert len(index) == 0
+    assert index.read_steps(0, 10) == []
+
+
+def test_directory_loader_writes_step_index(tmp_path: Path):
+    dir = _test_bundle_dir(tmp_path, "bundle", steps=5)
+    loader = DirectoryLoader(dir, VmTraceEventsParser(), step_index=True)
+
+    hash = HexString(_test_tx_hash("bundle_a"))
+    path_normal, _ = loader.find_trace_paths(hash)
+    with loader as bundle:
+        events = list(bundle.tx_a.events_normal)
+
+    assert StepIndex.sidecar_path(path_normal).exists()
+
+    window = list(loader.load_step_index(hash).read_events(1, 3))
+    assert [e.pc for e in window] == [e.pc for e in events[1:3]]
@@ -0,0 +1,163 @@
+import io
+import os
+from pathlib import Path
+import socket
+from threading import Thread
+
+import pytest
+
+from tests.test_utils.bundles import _test_bundle_dir
+from traces_analyzer.loader.directory_loader import DirectoryLoader
+from traces_analyzer.loader.event_parser import (
+    EIP3155EventsParser,
+    VmTraceEventsParser,
+)
+from traces_analyzer.loader.stream_loader import (
+    FramedStreamReader,
+    StreamBundleSource,
+    _iter_lines,
+    open_bundle_stream,
+    write_bundle_frames,
+)
+
+from traces_parser.datatypes import HexString
+
+
+def _chunks(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def _write_bundle(stream, dir: Path, chunk_size: int, reverse_first: bool = False):
+    loader = DirectoryLoader(dir, EIP3155EventsParser())
+    metadata = loader.read_metadata()
+    traces = []
+    for hash in metadata["transactions_order"]:
+        path_normal, path_reverse = loader.find_trace_paths(HexString(hash))
+        traces.append((hash, "actual", _chunks(path_normal.read_bytes(), chunk_size)))
+        traces.append((hash, "reverse", _chunks(path_reverse.read_bytes(), chunk_size)))
+    if reverse_first:
+        traces.reverse()
+    write_bundle_frames(stream, metadata, traces)
+
+
+def _load_all(loaders) -> list[tuple[str, int, int]]:
+    results = []
+    for loader in loaders:
+        with loader as bundle:
+            results.append(
+                (
+                    bundle.id,
+                    len(list(bundle.tx_a.events_normal)),
+                    len(list(bundle.tx_b.events_reverse)),
+                )
+            )
+    return results
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1024 * 1024])
+@pytest.mark.parametrize("reverse_first", [False, True])
+def test_stream_bundle_source_loads_like_directory_loader(
+    tmp_path: Path, chunk_size: int, reverse_first: bool
+):
+    dirs = [
+        _test_bundle_dir(tmp_path, f"bundle_{i}", steps=i + 2, trace_format="eip3155")
+        for i in range(3)
+    ]
+    stream = io.BytesIO()
+    for dir in dirs:
+        _write_bundle(stream, dir, chunk_size, reverse_first)
+    stream.seek(0)
+    parser = EIP3155EventsParser()
+
+    expected = _load_all(DirectoryLoader(dir, parser) for dir in dirs)
+
+    assert _load_all(StreamBundleSource(stream, parser)) == expected
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="requires Unix sockets")
+def test_stream_bundle_source_reads_from_unix_socket(tmp_path: Path):
+    dirs = [
+        _test_bundle_dir(tmp_path, f"bundle_{i}", trace_format="eip3155")
+        for i in range(2)
+    ]
+    # keep the socket path short, as it is limited to ~100 characters
+    socket_path = Path(os.path.relpath(tmp_path / "tracer.sock"))
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    server.listen(1)
+
+    def produce():
+        connection, _ = server.accept()
+        with connection, connection.makefile("wb") as stream:
+            for dir in dirs:
+                _write_bundle(stream, dir, 16)
+
+    producer = Thread(target=produce)
+    producer.start()
+    try:
+        with open_bundle_stream(f"unix:{socket_path}") as stream:
+            ids = [
+                id
+                for id, _, _ in _load_all(
+                    StreamBundleSource(stream, EIP3155EventsParser())
+                )
+            ]
+    finally:
+        producer.join(timeout=5)
+        server.close()
+
+    assert ids == ["bundle_0", "bundle_1"]
+
+
+def test_stream_bundle_source_requires_eip3155_traces():
+    with pytest.raises(ValueError):
+        StreamBundleSource(io.BytesIO(), VmTraceEventsParser())
+
+
+def test_framed_stream_reader_drops_the_frames_of_a_skipped_bundle(tmp_path: Path):
+    dirs = [
+        _test_bundle_dir(tmp_path, f"bundle_{i}", trace_format="eip3155")
+        for i in range(2)
+    ]
+    stream = io.BytesIO()
+    for dir in dirs:
+        _write_bundle(stream, dir, 16)
+    stream.seek(0)
+    reader = FramedStreamReader(stream)
+
+    first = reader.next_bundle()
+    assert first is not None
+    first_hash = HexString(first["transactions_order"][0])
+    next(reader.iter_trace(first_hash, "actual"))
+    second = reader.next_bundle()
+
+    assert second is not None and second["id"] == "bundle_1"
+    assert all(not parts for parts in reader._buffered.values())
+    hash = HexString(second["transactions_order"][1])
+    assert (
+        b"".join(reader.iter_trace(hash, "reverse"))
+        == (dirs[1] / "reverse" / f"{hash.with_prefix()}.json").read_bytes()
+    )
+    assert reader.next_bundle() is None
+
+
+def test_framed_stream_reader_fails_on_incomplete_trace(tmp_path: Path):
+    dir = _test_bundle_dir(tmp_path, "bundle", trace_format="eip3155")
+    stream = io.BytesIO()
+    _write_bundle(stream, dir, 64)
+    truncated = io.BytesIO(stream.getvalue()[:-30])
+
+    reader = FramedStreamReader(truncated)
+    metadata = reader.next_bundle()
+    assert metadata is not None
+
+    with pytest.raises(ValueError):
+        for hash in metadata["transactions_order"]:
+            for scenario in ("actual", "reverse"):
+                list(reader.iter_trace(HexString(hash), scenario))
+
+
+def test_iter_lines_joins_and_splits_parts():
+    parts = ["ä\nb".encode()[:1], "ä\nb".encode()[1:], b"c", b"", b"d\n\ne"]
+
+    assert list(_iter_lines(parts)) == ["ä\n", "bcd\n", "\n", "e"]
@@ -0,0 +1,248 @@
+import json
+import tracemalloc
+
+import pytest
+
+from traces_analyzer.benchmark.synthetic import SyntheticTraceConfig, generate_vm_trace
+from traces_analyzer.features.triage import triage_transaction
+from traces_analyzer.loader.event_parser import VmTraceEventsParser
+from traces_analyzer.loader.struct_logs import (
+    STRUCT_LOG_FIELDS,
+    StructLogDeduplicator,
+    iter_lazy_struct_logs,
+    project_struct_log_fields,
+)
+from traces_parser.datatypes import HexString
+from traces_parser.parser.instructions.instructions import LOG3
+
+
+def _struct_log(step: int) -> dict:
+    return {
+        "pc": step,
+        "op": "SLOAD",
+        "gas": 1537802 - step,
+        "gasCost": 2100,
+        "depth": 1,
+        "stack": ["0x1", hex(step)],
+        "memory": ["00" * 32] * 7 + [f"{step // 10:064x}"],
+        "storage": {f"{slot:064x}": f"{step:064x}" for slot in range(64)},
+        "refund": 0,
+        "error": "",
+    }
+
+
+def _vm_trace_json(steps: int) -> str:
+    return json.dumps(
+        {
+            "failed": False,
+            "gas": 798496,
+            "returnValue": "",
+            "structLogs": [_struct_log(i) for i in range(steps)],
+        }
+    )
+
+
+def test_project_struct_log_fields_keeps_consumed_fields():
+    vm_trace = json.loads(_vm_trace_json(3), object_hook=project_struct_log_fields)
+
+    assert vm_trace["gas"] == 798496
+    for i, step in enumerate(vm_trace["structLogs"]):
+        assert set(step) == STRUCT_LOG_FIELDS
+        assert step["pc"] == i
+        assert step["stack"] == ["0x1", hex(i)]
+        assert step["memory"] == ["00" * 32] * 7 + [f"{i // 10:064x}"]
+
+
+def test_struct_log_deduplicator_shares_unchanged_memory():
+    steps = json.loads(_vm_trace_json(12), object_hook=StructLogDeduplicator())[
+        "structLogs"
+    ]
+
+    assert set(steps[0]) == STRUCT_LOG_FIELDS
+    assert steps[1]["memory"] is steps[0]["memory"]
+    assert steps[9]["memory"] is steps[0]["memory"]
+    assert steps[10]["memory"] is not steps[9]["memory"]
+    assert steps[10]["memory"] == (*["00" * 32] * 7, f"{1:064x}")
+    assert all(steps[10]["memory"][i] is steps[9]["memory"][i] for i in range(7))
+
+
+def test_struct_log_deduplicator_shares_immutable_memory():
+    steps = json.loads(_vm_trace_json(3), object_hook=StructLogDeduplicator())[
+        "structLogs"
+    ]
+
+    assert isinstance(steps[0]["memory"], tuple)
+    assert isinstance(steps[2]["memory"], tuple)
+
+
+def test_vm_trace_events_parser_shares_values_without_changing_the_events():
+    # memory grows, changes and shrinks between the steps
+    vm_trace = json.dumps(
+        {
+            "structLogs": [
+                {**_struct_log(step), "memory": memory}
+                for step, memory in enumerate(
+                    [[], ["00" * 32], ["00" * 32, "11" * 32], ["22" * 32, "11" * 32]]
+                    * 3
+                )
+            ]
+        }
+    )
+
+    events = list(VmTraceEventsParser().parse([vm_trace]))
+    expected = list(VmTraceEventsParser(share_unchanged_values=False).parse([vm_trace]))
+
+    assert [(e.pc, e.op, e.stack, e.memory, e.depth) for e in events] == [
+        (e.pc, e.op, e.stack, e.memory, e.depth) for e in expected
+    ]
+
+
+def test_struct_log_deduplicator_shares_unchanged_stack_prefix():
+    steps = json.loads(_vm_trace_json(2), object_hook=StructLogDeduplicator())[
+        "structLogs"
+    ]
+
+    assert steps[0]["stack"] == ["0x1", "0x0"]
+    assert steps[1]["stack"] == ["0x1", "0x1"]
+    assert steps[1]["stack"][0] is steps[0]["stack"][0]
+
+
+def test_struct_log_deduplicator_without_projection():
+    steps = json.loads(
+        _vm_trace_json(2), object_hook=StructLogDeduplicator(project_fields=False)
+    )["structLogs"]
+
+    assert "storage" in steps[0]
+    assert steps[1]["memory"] is steps[0]["memory"]
+
+
+@pytest.mark.parametrize("indent", [None, 4])
+def test_iter_lazy_struct_logs_matches_projected_decoding(indent):
+    vm_trace = _vm_trace_json(3)
+    if indent:
+        vm_trace = json.dumps(json.loads(vm_trace), indent=indent)
+
+    steps = list(iter_lazy_struct_logs(vm_trace))
+    expected = json.loads(vm_trace, object_hook=project_struct_log_fields)
+
+    assert [dict(step) for step in steps] == expected["structLogs"]
+
+
+def test_iter_lazy_struct_logs_skips_nested_and_escaped_values():
+    vm_trace = json.dumps(
+        {
+            "returnValue": "]}",
+            "structLogs": [
+                {
+                    "pc": 1,
+                    "op": "REVERT",
+                    "depth": 1,
+                    "stack": ["0x0", "0x0"],
+                    "storage": {"nested": {"x": [1, 2]}},
+                    "error": 'execution "reverted" ]}',
+                    "memory": [],
+                }
+            ],
+        }
+    )
+
+    (step,) = iter_lazy_struct_logs(vm_trace)
+
+    assert dict(step) == {
+        "pc": 1,
+        "op": "REVERT",
+        "depth": 1,
+        "stack": ["0x0", "0x0"],
+        "memory": [],
+    }
+
+
+def test_iter_lazy_struct_logs_decodes_memory_on_access():
+    vm_trace = '{"structLogs": [{"pc": 1, "op": "STOP", "depth": 1, "stack": [], "memory": [invalid]}]}'
+
+    (step,) = iter_lazy_struct_logs(vm_trace)
+
+    assert step["pc"] == 1
+    assert "memory" in step
+    with pytest.raises(json.JSONDecodeError):
+        step["memory"]
+
+
+def test_iter_lazy_struct_logs_without_steps():
+    assert list(iter_lazy_struct_logs('{"failed": false, "structLogs": []}')) == []
+
+    with pytest.raises(KeyError):
+        list(iter_lazy_struct_logs('{"failed": false}'))
+
+
+def test_lazy_memory_events_decode_memory_on_access():
+    vm_trace = _vm_trace_json(3)
+
+    events = list(VmTraceEventsParser(lazy_memory=True).parse([vm_trace]))
+    expected = list(VmTraceEventsParser().parse([vm_trace]))
+
+    assert [(e.pc, e.op, e.stack, e.depth) for e in events] == [
+        (e.pc, e.op, e.stack, e.depth) for e in expected
+    ]
+    assert not any(event.memory_decoded for event in events)
+    assert events[2].memory == expected[2].memory
+    assert events[2].memory_decoded
+    assert not events[1].memory_decoded
+
+
+def test_lazy_memory_events_equal_eager_events():
+    vm_trace = _vm_trace_json(3)
+
+    events = list(VmTraceEventsParser(lazy_memory=True).parse([vm_trace]))
+    expected = list(VmTraceEventsParser().parse([vm_trace]))
+
+    assert events == expected
+    assert expected == events
+    assert events[0] != expected[1]
+    assert all(event.memory_decoded for event in events)
+
+
+def test_triage_only_decodes_the_memory_of_logs():
+    vm_trace = json.dumps(generate_vm_trace(SyntheticTraceConfig(500, log_density=0.3)))
+    parser = VmTraceEventsParser(lazy_memory=True)
+    normal = list(parser.parse([vm_trace]))
+    reverse = list(parser.parse([vm_trace]))
+
+    triage_transaction(normal, reverse, HexString("0x" + "ab" * 20))
+
+    assert {event.op for event in normal if event.memory_decoded} == {LOG3.opcode}
+
+
+def _decoding_memory(json_str: str, object_hook) -> tuple[int, int]:
+    tracemalloc.start()
+    try:
+        vm_trace = json.loads(json_str, object_hook=object_hook)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(vm_trace["structLogs"]) > 0
+    return retained, peak
+
+
+@pytest.mark.slow
+def test_project_struct_log_fields_reduces_peak_memory():
+    json_str = _vm_trace_json(2_000)
+
+    retained_full, peak_full = _decoding_memory(json_str, None)
+    retained_projected, peak_projected = _decoding_memory(
+        json_str, project_struct_log_fields
+    )
+
+    # the storage maps dominate the full decoding and never exist with the projection
+    assert peak_projected * 3 < peak_full
+    assert retained_projected * 3 < retained_full
+
+
+@pytest.mark.slow
+def test_struct_log_deduplicator_reduces_retained_memory():
+    json_str = _vm_trace_json(2_000)
+
+    retained_projected, _ = _decoding_memory(json_str, project_struct_log_fields)
+    retained_shared, _ = _decoding_memory(json_str, StructLogDeduplicator())
+
+    assert retained_shared * 2 < retained_projected
@@ -0,0 +1,192 @@
+import json
+from pathlib import Path
+
+from traces_analyzer.benchmark.synthetic import (
+    SyntheticTraceConfig,
+    write_synthetic_bundle,
+)
+from traces_analyzer.cli import (
+    analyze_main,
+    bench_main,
+    merge_main,
+    no_difference_evaluations,
+)
+
+
+def test_no_difference_evaluations():
+    reports = [e.dict_report() for e in no_difference_evaluations()]
+
+    assert reports == [
+        {
+            "evaluation_type": "securify_properties",
+            "report": {
+                "TOD_Transfer": False,
+                "TOD_Amount": False,
+                "TOD_Receiver": False,
+            },
+        },
+        {
+            "evaluation_type": "financial_gain_loss",
+            "report": {"gains": {}, "losses": {}},
+        },
+        {
+            "evaluation_type": "tod_source",
+            "report": {"found": False, "source": None},
+        },
+    ]
+
+
+def test_no_difference_evaluations_include_the_requested_evaluations():
+    evaluations = no_difference_evaluations(
+        locate_divergences=True, extractor_costs=True
+    )
+    reports = {
+        report["evaluation_type"]: report["report"]
+        for report in (e.dict_report() for e in evaluations)
+    }
+
+    assert list(reports) == [
+        "securify_properties",
+        "financial_gain_loss",
+        "tod_source",
+        "divergence",
+        "extractor_costs",
+    ]
+    assert reports["divergence"]["identical"]
+    assert reports["extractor_costs"] == {"extractors": []}
+
+
+def test_bench_synthetic_corpus(capsys):
+    bench_main(["--synthetic", "2", "--synthetic-steps", "200", "--result", "b.json"])
+
+    result = json.loads(Path("b.json").read_text())
+
+    assert result["bundles"] == 2
+    assert len(result["runs"]) == 3
+    assert set(result["latency_seconds"]) == {"p50", "p95", "p99"}
+    assert result["config"]["analyze_args"] == []
+    assert "bundles/s" in capsys.readouterr().out
+
+
+def test_analyze_timings():
+    bundle = write_synthetic_bundle(Path("corpus"), "bundle", SyntheticTraceConfig(200))
+
+    analyze_main(["--bundles", str(bundle), "--out", "out", "--timings"])
+
+    (timings,) = [json.loads(line) for line in Path("out/timings.jsonl").open()]
+    summary = json.loads(Path("out/timings_summary.json").read_text())
+
+    assert timings["bundle"] == "bundle"
+    assert timings["steps"] > 4 * 200
+    assert {"load", "parse", "features", "evaluation", "report", "save"} <= set(
+        timings["stages"]
+    )
+    assert summary["slowest_bundles"][0]["bundle"] == "bundle"
+
+
+def test_analyze_profiles_selected_and_slow_bundles():
+    config = SyntheticTraceConfig(200)
+    bundle_1 = write_synthetic_bundle(Path("corpus"), "bundle_1", config)
+    bundle_2 = write_synthetic_bundle(Path("corpus"), "bundle_2", config)
+
+    analyze_main(
+        [
+            *("--bundles", str(bundle_1), str(bundle_2), "--out", "out"),
+            *("--profile-bundles", "bundle_1", "--profile-slower-than", "0"),
+        ]
+    )
+
+    assert sorted(path.name for path in Path("out/profiles").iterdir()) == [
+        "bundle_1.pstats",
+        "bundle_2.pstats",
+    ]
+
+
+def test_analyze_in_workers_with_limits():
+    small = write_synthetic_bundle(Path("corpus"), "small", SyntheticTraceConfig(200))
+    large = write_synthetic_bundle(Path("corpus"), "large", SyntheticTraceConfig(2000))
+
+    analyze_main(
+        [
+            *("--bundles", str(small), str(large), "--out", "out"),
+            *("--workers", "2", "--max-steps", "5000"),
+        ]
+    )
+
+    results = {
+        result["bundle"]: result
+        for result in map(json.loads, Path("out/bundle_results.jsonl").open())
+    }
+    assert results["small"]["status"] == "ok"
+    assert results["large"]["status"] == "skipped"
+    assert results["large"]["reason"] == "max_steps"
+    assert Path("out/small.json").exists()
+    assert not Path("out/large.json").exists()
+
+
+def test_analyze_shards_and_merge():
+    config = SyntheticTraceConfig(100)
+    bundles = [
+        str(write_synthetic_bundle(Path("corpus"), f"bundle_{i}", config))
+        for i in range(4)
+    ]
+
+    for shard in ("1/2", "2/2"):
+        analyze_main(
+            ["--bundles", *bundles, "--out", f"out_{shard[0]}", "--shard", shard]
+        )
+    merge_main(["out_1", "out_2", "--out", "out"])
+
+    shard_bundles = [
+        json.loads(Path(f"out_{i}/shard.json").read_text())["bundles"] for i in (1, 2)
+    ]
+    merge_report = json.loads(Path("out/merge.json").read_text())
+    assert sum(shard_bundles) == 4
+    assert merge_report["bundles"] == 4
+    assert merge_report["duplicates"] == {}
+    assert merge_report["missing_shards"] == []
+    assert all(Path(f"out/bundle_{i}.json").exists() for i in range(4))
+
+
+def test_analyze_in_pipeline():
+    config = SyntheticTraceConfig(100)
+    bundles = [
+        str(write_synthetic_bundle(Path("corpus"), f"bundle_{i}", config))
+        for i in range(3)
+    ]
+
+    analyze_main(
+        [
+            *("--bundles", *bundles, "--out", "out"),
+            *("--pipeline", "read=2,analyze=2", "--skip-identical"),
+        ]
+    )
+
+    assert all(Path(f"out/bundle_{i}.json").exists() for i in range(3))
+
+
+def test_analyze_in_pipeline_records_failing_bundles():
+    config = SyntheticTraceConfig(100)
+    good = write_synthetic_bundle(Path("corpus"), "good", config)
+    broken = write_synthetic_bundle(Path("corpus"), "broken", config)
+    next((broken / "actual").iterdir()).write_text("{not json")
+
+    analyze_main(
+        [
+            *("--bundles", str(good), str(broken), "--out", "out"),
+            *("--pipeline", "analyze=1", "--timings"),
+        ]
+    )
+
+    results = {
+        result["bundle"]: result
+        for result in map(json.loads, Path("out/bundle_results.jsonl").open())
+    }
+    assert results["good"]["status"] == "ok"
+    assert results["broken"]["status"] == "failed"
+    assert results["broken"]["detail"].startswith("in the analyze stage")
+    assert Path("out/good.json").exists()
+    assert not Path("out/broken.json").exists()
+    timings = [json.loads(line) for line in Path("out/timings.jsonl").open()]
+    assert [bundle["bundle"] for bundle in timings] == ["good"]
+    assert "parse" in timings[0]["stages"]
@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+import json
+from pathlib import Path
+
+
+def _test_tx_hash(name: str) -> str:
+    return "0x" + hashlib.sha256(name.encode()).hexdigest()
+
+
+def _test_vm_trace(steps: int = 3) -> dict:
+    struct_logs = [
+        {
+            "depth": 1,
+            "gas": 100_000 - 3 * i,
+            "gasCost": 3,
+            "memory": [],
+            "op": "PUSH1",
+            "pc": 2 * i,
+            "stack": ["0x1"] * i,
+        }
+        for i in range(steps - 1)
+    ]
+    struct_logs.append(
+        {
+            "depth": 1,
+            "gas": 100_000 - 3 * (steps - 1),
+            "gasCost": 0,
+            "memory": [],
+            "op": "STOP",
+            "pc": 2 * (steps - 1),
+            "stack": ["0x1"] * (steps - 1),
+        }
+    )
+    return {
+        "failed": False,
+        "gas": 3 * steps,
+        "returnValue": "",
+        "structLogs": struct_logs,
+    }
+
+
+def _test_eip3155_trace(steps: int = 3) -> str:
+    """The EIP-3155 lines of the steps of _test_vm_trace, followed by the summary line"""
+    lines = [
+        json.dumps(
+            {
+                "pc": log["pc"],
+                "op": 0x60 if log["op"] == "PUSH1" else 0x00,
+                "gas": hex(log["gas"]),
+                "gasCost": hex(log["gasCost"]),
+                "memory": "0x",
+                "memSize": 0,
+                "stack": log["stack"],
+                "depth": log["depth"],
+                "refund": 0,
+                "opName": log["op"],
+            }
+        )
+        for log in _test_vm_trace(steps)["structLogs"]
+    ]
+    lines.append(json.dumps({"output": "", "gasUsed": hex(3 * steps)}))
+    return "\n".join(lines) + "\n"
+
+
+def _test_bundle_dir(
+    root: Path,
+    id: str,
+    steps: int = 3,
+    extension: str = "json",
+    reverse_steps: int | None = None,
+    trace_format: str = "structlogs",
+) -> Path:
+    """Create a bundle directory with a metadata.json and vm traces (or EIP-3155 traces) for two transactions"""
+    dir = root / id
+    (dir / "actual").mkdir(parents=True)
+    (dir / "reverse").mkdir(parents=True)
+
+    tx_hashes = [_test_tx_hash(f"{id}_a"), _test_tx_hash(f"{id}_b")]
+    metadata = {
+        "id": id,
+        "transactions_order": tx_hashes,
+        "transactions": {
+            hash: {
+                "hash": hash,
+                "from": "0x8591204047dc7d6edc782fa3cc8ee29e2bdd61e5",
+                "to": "0xdef171fe48cf0115b1d80b88dc8eab59176fee57",
+                "input": "0xa94e78ef",
+                "value": "0x0",
+            }
+            for hash in tx_hashes
+        },
+    }
+    (dir / "metadata.json").write_text(json.dumps(metadata))
+
+    for hash in tx_hashes:
+        for scenario, n in (("actual", steps), ("reverse", reverse_steps or steps)):
+            if trace_format == "eip3155":
+                content = _test_eip3155_trace(n).encode()
+            else:
+                content = json.dumps(_test_vm_trace(n)).encode()
+            if extension.endswith(".gz"):
+                content = gzip.compress(content)
+            (dir / scenario / f"{hash}.{extension}").write_bytes(content)
+
+    return dir
@@ -0,0 +1,104 @@
+import json
+from pathlib import Path
+from threading import Thread
+
+from traces_analyzer.utils.tracing import (
+    SpanTracer,
+    merge_span_files,
+    merge_worker_span_files,
+    set_span_bundle,
+    set_tracer,
+    span,
+    worker_span_tracer,
+)
+
+
+def test_span_without_tracer_does_nothing():
+    with span("parse"):
+        pass
+
+
+def test_span_tracer_writes_chrome_trace_events():
+    tracer = SpanTracer(open("spans.json", "w"))
+    set_tracer(tracer)
+    try:
+        set_span_bundle("bundle_1")
+        with span("bundle"):
+            with span("parse", tx="0xab"):
+                pass
+        with span("prefetch_wait"):
+            pass
+    finally:
+        set_tracer(None)
+        tracer.close()
+
+    events = json.loads(Path("spans.json").read_text())
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    (thread_name,) = [e for e in events if e["ph"] == "M"]
+
+    assert list(spans) == ["parse", "bundle", "prefetch_wait"]
+    assert spans["parse"]["args"] == {"tx": "0xab", "bundle": "bundle_1"}
+    assert spans["bundle"]["ts"] <= spans["parse"]["ts"]
+    assert spans["bundle"]["dur"] >= spans["parse"]["dur"]
+    assert thread_name["tid"] == spans["bundle"]["tid"]
+
+
+def test_span_tracer_tags_only_main_thread_spans_with_the_bundle():
+    tracer = SpanTracer(open("spans.json", "w"))
+    tracer.bundle = "bundle_1"
+
+    def worker():
+        with tracer.span("prefetch"):
+            pass
+
+    thread = Thread(target=worker, name="prefetch-thread")
+    thread.start()
+    thread.join()
+    tracer.close()
+
+    events = json.loads(Path("spans.json").read_text())
+    (prefetch,) = [e for e in events if e["ph"] == "X"]
+    (thread_name,) = [e for e in events if e["ph"] == "M"]
+
+    assert prefetch["args"] == {}
+    assert prefetch["tid"] == thread_name["tid"]
+    assert thread_name["args"] == {"name": "prefetch-thread"}
+
+
+def test_merge_span_files():
+    for i, name in enumerate(["a.json", "b.json"]):
+        tracer = SpanTracer(open(name, "w"))
+        with tracer.span(f"span_{i}"):
+            pass
+        tracer.close()
+    SpanTracer(open("empty.json", "w")).close()
+
+    merge_span_files(
+        [Path("a.json"), Path("empty.json"), Path("b.json")], Path("merged.json")
+    )
+
+    events = json.loads(Path("merged.json").read_text())
+    assert [e["name"] for e in events if e["ph"] == "X"] == ["span_0", "span_1"]
+    assert json.loads(Path("empty.json").read_text()) == []
+
+
+def test_merge_worker_span_files():
+    tracer = SpanTracer(open("spans.json", "w"))
+    with tracer.span("main"):
+        pass
+    tracer.close()
+    with worker_span_tracer(Path("spans.json")):
+        with span("worker"):
+            pass
+    # a killed worker
+    Path("spans.json.worker-1").write_text('[\n{"name": "killed", "ph": "X"},\n{"na')
+
+    merge_worker_span_files(Path("spans.json"))
+
+    events = json.loads(Path("spans.json").read_text())
+    assert sorted(e["name"] for e in events if e["ph"] == "X") == [
+        "killed",
+        "main",
+        "worker",
+    ]
+    assert list(Path().glob("spans.json.worker-*")) == []
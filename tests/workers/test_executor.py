@@ -0,0 +1,63 @@
+import pytest
+
+from traces_analyzer.loader.manifest import ManifestEntry
+from traces_analyzer.workers.executor import InProcessExecutor, PipelineExecutor
+from traces_analyzer.workers.pipeline import Pipeline, Stage
+
+
+def entry(id: str, trace_size: int = 0) -> ManifestEntry:
+    trace = {"path": "", "size": trace_size, "format": "structlogs"}
+    return {
+        "dir": "",
+        "metadata": {"id": id},
+        "traces": {"0xab": {"actual": trace, "reverse": trace}},
+    }
+
+
+def read(entry: ManifestEntry) -> str:
+    id = entry["metadata"]["id"]
+    if id == "unreadable":
+        raise OSError("no such file")
+    return id
+
+
+def analyze(id: str) -> str:
+    if id == "broken":
+        raise ValueError("broken trace")
+    return id
+
+
+def test_pipeline_executor_records_the_failures_of_bundles():
+    executor = PipelineExecutor(
+        Pipeline([Stage("read", read, 2), Stage("analyze", analyze, 2)])
+    )
+
+    results = {
+        result.bundle: result
+        for result in executor.run(
+            [entry("a", 10), entry("unreadable"), entry("broken"), entry("b")]
+        )
+    }
+
+    assert {id: result.status for id, result in results.items()} == {
+        "a": "ok",
+        "unreadable": "failed",
+        "broken": "failed",
+        "b": "ok",
+    }
+    assert results["a"].trace_bytes == 20
+    assert results["unreadable"].reason == "OSError"
+    assert results["unreadable"].detail == "in the read stage: no such file"
+    assert results["broken"].reason == "ValueError"
+    assert results["broken"].detail == "in the analyze stage: broken trace"
+    assert "read" in (executor.summary() or "")
+
+
+def test_in_process_executor_raises_the_errors_of_bundles():
+    executor = InProcessExecutor(analyze)  # type: ignore[arg-type]
+
+    results = executor.run(["a", "broken"])  # type: ignore[list-item]
+
+    assert next(results).bundle == "a"
+    with pytest.raises(ValueError, match="broken trace"):
+        next(results)
@@ -0,0 +1,50 @@
+import pytest
+
+from traces_analyzer.loader.manifest import ManifestEntry
+from traces_analyzer.workers.limits import LimitExceeded, StepLimit, trace_bytes
+
+
+def test_step_limit_counts_the_steps_of_all_traces():
+    step_limit = StepLimit(5)
+
+    assert list(step_limit.limit(range(3))) == [0, 1, 2]
+    with pytest.raises(LimitExceeded) as e:
+        list(step_limit.limit(range(3)))
+
+    assert e.value.reason == "max_steps"
+    assert step_limit.steps == 6
+
+
+def test_trace_bytes():
+    entry: ManifestEntry = {
+        "dir": "bundle",
+        "metadata": {},
+        "traces": {
+            "0xa": {
+                "actual": {
+                    "path": "actual/0xa.json",
+                    "size": 10,
+                    "format": "structlogs",
+                },
+                "reverse": {
+                    "path": "reverse/0xa.json",
+                    "size": 20,
+                    "format": "structlogs",
+                },
+            },
+            "0xb": {
+                "actual": {
+                    "path": "actual/0xb.json",
+                    "size": 30,
+                    "format": "structlogs",
+                },
+                "reverse": {
+                    "path": "reverse/0xb.json",
+                    "size": 40,
+                    "format": "structlogs",
+                },
+            },
+        },
+    }
+
+    assert trace_bytes(entry) == 100
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+
+import pytest
+
+from traces_analyzer.workers.pipeline import Pipeline, Stage
+
+
+def double(item: int) -> int:
+    return 2 * item
+
+
+def process_id(item: int) -> tuple[int, int]:
+    return item, os.getpid()
+
+
+def test_pipeline_passes_items_through_stages():
+    pipeline = Pipeline(
+        [Stage("double", double, 3), Stage("increment", lambda x: x + 1, 2)]
+    )
+
+    results = list(pipeline.run(range(20)))
+
+    assert sorted(results) == [2 * i + 1 for i in range(20)]
+    assert pipeline.stats["double"].items == 20
+    assert pipeline.stats["increment"].items == 20
+
+
+def test_pipeline_runs_process_stages_in_other_processes():
+    pipeline = Pipeline([Stage("pid", process_id, 2, processes=True)])
+
+    results = dict(pipeline.run(range(5)))
+
+    assert sorted(results) == list(range(5))
+    assert os.getpid() not in results.values()
+
+
+def test_pipeline_raises_errors_of_stages():
+    def fail(item: int) -> int:
+        if item == 3:
+            raise ValueError("broken bundle")
+        return item
+
+    pipeline = Pipeline([Stage("fail", fail, 2), Stage("double", double)])
+
+    with pytest.raises(ValueError, match="broken bundle"):
+        list(pipeline.run(range(10)))
+
+
+def test_pipeline_isolates_the_failures_of_items():
+    def fail(item: int) -> int:
+        if item == 3:
+            raise ValueError("broken bundle")
+        return item
+
+    def size(item: int) -> int:
+        if item == 5:
+            raise OSError("missing trace")
+        return 10
+
+    pipeline = Pipeline(
+        [Stage("read", fail, 2, size=size), Stage("double", double, 2)],
+        # a leaked reservation of a failed item would block the others
+        memory_budget=25,
+    )
+
+    outcomes = {outcome.item: outcome for outcome in pipeline.run_isolated(range(10))}
+
+    assert sorted(outcomes) == list(range(10))
+    assert {
+        item: outcome.result for item, outcome in outcomes.items() if not outcome.error
+    } == {i: 2 * i for i in range(10) if i not in (3, 5)}
+    assert (outcomes[3].stage, str(outcomes[3].error)) == ("read", "broken bundle")
+    assert (outcomes[5].stage, str(outcomes[5].error)) == ("read", "missing trace")
+    assert pipeline.stats["double"].items == 10
+
+
+def test_pipeline_bounds_the_queues():
+    read = []
+    slow_stage_started = threading.Event()
+
+    def source():
+        for i in range(100):
+            read.append(i)
+            yield i
+
+    def slow(item: int) -> int:
+        slow_stage_started.set()
+        time.sleep(0.5)
+        return item
+
+    pipeline = Pipeline([Stage("fast", double), Stage("slow", slow)], queue_size=2)
+    results = pipeline.run(source())
+
+    assert next(results) == 0
+    # the source is held up by the slow stage instead of reading every item
+    assert slow_stage_started.is_set()
+    assert len(read) < 10
+    results.close()
+
+
+def test_pipeline_bounds_the_memory_held_by_results():
+    read = []
+    release_slow_stage = threading.Event()
+
+    def read_item(item: int) -> int:
+        read.append(item)
+        return item
+
+    def slow(item: int) -> int:
+        release_slow_stage.wait()
+        return item
+
+    pipeline = Pipeline(
+        [Stage("read", read_item, 2, size=lambda item: 10), Stage("slow", slow)],
+        queue_size=100,
+        memory_budget=25,
+    )
+    results = pipeline.run(range(10))
+    first = []
+    waiter = threading.Thread(target=lambda: first.append(next(results)))
+    waiter.start()
+
+    time.sleep(0.3)
+    # two results fit the budget, the slow stage holds up reading the others
+    assert len(read) == 2
+    release_slow_stage.set()
+    waiter.join()
+    assert sorted([*first, *results]) == list(range(10))
+
+
+def test_pipeline_grants_results_larger_than_the_memory_budget():
+    pipeline = Pipeline(
+        [Stage("big", double, 2, size=lambda item: 100), Stage("double", double)],
+        memory_budget=10,
+    )
+
+    assert sorted(pipeline.run(range(5))) == [4 * i for i in range(5)]
+
+
+def test_pipeline_raises_errors_of_sizing_items():
+    def size(item: int) -> int:
+        if item == 2:
+            raise OSError("missing trace")
+        return 1
+
+    pipeline = Pipeline([Stage("read", double, 2, size=size), Stage("double", double)])
+
+    with pytest.raises(OSError, match="missing trace"):
+        list(pipeline.run(range(10)))
+
+
+def test_pipeline_last_stage_can_not_hold_memory():
+    with pytest.raises(ValueError):
+        Pipeline([Stage("read", double, size=lambda item: 1)])
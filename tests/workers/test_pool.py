@@ -0,0 +1,114 @@
+import os
+from pathlib import Path
+import time
+
+from traces_analyzer.loader.manifest import ManifestEntry
+from traces_analyzer.workers.limits import BundleLimits, LimitExceeded
+from traces_analyzer.workers.pool import BundleResult, WorkerPool
+from traces_analyzer.workers.scheduler import BundleScheduler
+
+
+def entry(id: str, trace_size: int = 0) -> ManifestEntry:
+    trace = {"path": "", "size": trace_size, "format": "structlogs"}
+    return {
+        "dir": "",
+        "metadata": {"id": id},
+        "traces": {"0xab": {"actual": trace, "reverse": trace}},
+    }
+
+
+def analyze(entry: ManifestEntry):
+    id = entry["metadata"]["id"]
+    if id == "sleep":
+        time.sleep(10)
+    elif id == "steps":
+        raise LimitExceeded("max_steps", "too many steps")
+    elif id == "error":
+        raise ValueError("broken trace")
+    elif id == "crash":
+        os._exit(3)
+    elif id == "memory":
+        data = b"x" * 512 * 1024**2
+        time.sleep(10)
+        del data
+    Path(f"{id}.pid").write_text(str(os.getpid()))
+
+
+def run(pool: WorkerPool, entries: list[ManifestEntry]) -> dict[str, BundleResult]:
+    return {result.bundle: result for result in pool.run(entries)}
+
+
+def test_worker_pool_analyzes_bundles():
+    results = run(WorkerPool(analyze, 2), [entry("a"), entry("b"), entry("c")])
+
+    assert {id: result.status for id, result in results.items()} == {
+        "a": "ok",
+        "b": "ok",
+        "c": "ok",
+    }
+    assert Path("a.pid").exists() and Path("c.pid").exists()
+
+
+def test_worker_pool_records_limits_and_failures():
+    pool = WorkerPool(
+        analyze, 2, BundleLimits(max_trace_bytes=1000, timeout=1), poll_interval=0.01
+    )
+
+    results = run(
+        pool,
+        [
+            entry("large", trace_size=501),
+            entry("steps"),
+            entry("error"),
+            entry("crash"),
+            entry("sleep"),
+            entry("after"),
+        ],
+    )
+
+    assert {id: (result.status, result.reason) for id, result in results.items()} == {
+        "large": ("skipped", "max_trace_bytes"),
+        "steps": ("skipped", "max_steps"),
+        "error": ("failed", "ValueError"),
+        "crash": ("failed", "crashed"),
+        "sleep": ("killed", "timeout"),
+        "after": ("ok", None),
+    }
+    assert results["error"].detail == "broken trace"
+    assert results["crash"].detail == "worker exited with code 3"
+    assert 1 <= results["sleep"].seconds < 5
+
+
+def test_worker_pool_kills_workers_above_the_rss_ceiling():
+    pool = WorkerPool(
+        analyze, 1, BundleLimits(max_rss=256 * 1024**2), poll_interval=0.01
+    )
+
+    results = run(pool, [entry("memory"), entry("after")])
+
+    assert (results["memory"].status, results["memory"].reason) == (
+        "killed",
+        "max_rss",
+    )
+    assert results["after"].status == "ok"
+
+
+def test_worker_pool_recycles_workers():
+    run(WorkerPool(analyze, 1, recycle_after=2), [entry(str(i)) for i in range(4)])
+
+    pids = [Path(f"{i}.pid").read_text() for i in range(4)]
+    assert pids[0] == pids[1]
+    assert pids[1] != pids[2]
+    assert pids[2] == pids[3]
+
+
+def test_worker_pool_dispatches_in_the_order_of_the_scheduler():
+    scheduler = BundleScheduler(
+        [entry("small", 10), entry("large", 1000), entry("medium", 100)],
+        largest_first=True,
+    )
+
+    results = list(WorkerPool(analyze, 1).run(scheduler))
+
+    assert [result.bundle for result in results] == ["large", "medium", "small"]
+    assert [result.trace_bytes for result in results] == [2000, 200, 20]
@@ -0,0 +1,153 @@
+import json
+from pathlib import Path
+
+from traces_analyzer.loader.manifest import ManifestEntry
+from traces_analyzer.workers.scheduler import (
+    DEFAULT_MEMORY_PER_TRACE_BYTE,
+    DEFAULT_SECONDS_PER_TRACE_BYTE,
+    BundleScheduler,
+    CostModel,
+    read_bundle_results,
+)
+
+
+def entry(id: str, trace_size: int) -> ManifestEntry:
+    trace = {"path": "", "size": trace_size // 2, "format": "structlogs"}
+    return {
+        "dir": "",
+        "metadata": {"id": id},
+        "traces": {"0xab": {"actual": trace, "reverse": trace}},
+    }
+
+
+def result(id: str, trace_bytes: int, seconds: float, peak_rss_delta: int | None):
+    return {
+        "bundle": id,
+        "status": "ok",
+        "seconds": seconds,
+        "trace_bytes": trace_bytes,
+        "peak_rss_delta": peak_rss_delta,
+    }
+
+
+def ids(scheduler: BundleScheduler) -> list[str]:
+    dispatched = []
+    while (next_entry := scheduler.pop()) is not None:
+        dispatched.append(next_entry["metadata"]["id"])
+        scheduler.release(next_entry)
+    return dispatched
+
+
+def test_cost_model_defaults_to_the_trace_size():
+    costs = CostModel()
+
+    assert costs.seconds(entry("a", 1000)) == 1000 * DEFAULT_SECONDS_PER_TRACE_BYTE
+    assert costs.memory(entry("a", 1000)) == 1000 * DEFAULT_MEMORY_PER_TRACE_BYTE
+
+
+def test_cost_model_uses_the_history():
+    costs = CostModel(
+        [
+            result("a", 1000, 3, 5000),
+            result("b", 3000, 1, None),
+            {"bundle": "c", "status": "killed", "seconds": 60, "trace_bytes": 10},
+            {"bundle": "d", "status": "failed", "seconds": 0, "trace_bytes": 10},
+        ]
+    )
+
+    assert costs.seconds(entry("a", 1000)) == 3
+    assert costs.memory(entry("a", 1000)) == 5000
+    assert costs.seconds(entry("c", 10)) == 60
+    # 4 seconds for 4000 bytes, 5000 bytes of memory for 1000 bytes
+    assert costs.seconds(entry("d", 100)) == 0.1
+    assert costs.memory(entry("b", 100)) == 500
+
+
+def test_scheduler_dispatches_in_order_or_largest_first():
+    entries = [entry("small", 10), entry("large", 1000), entry("medium", 100)]
+
+    assert ids(BundleScheduler(entries)) == ["small", "large", "medium"]
+    assert ids(BundleScheduler(entries, largest_first=True)) == [
+        "large",
+        "medium",
+        "small",
+    ]
+
+
+def test_scheduler_keeps_running_bundles_within_the_memory_budget():
+    scheduler = BundleScheduler(
+        [entry("large", 1000), entry("medium", 600), entry("small", 200)],
+        CostModel([]),
+        largest_first=True,
+        memory_budget=1000 * int(DEFAULT_MEMORY_PER_TRACE_BYTE),
+    )
+
+    large = scheduler.pop()
+    assert large and large["metadata"]["id"] == "large"
+    assert scheduler.pop() is None
+
+    scheduler.release(large)
+    medium = scheduler.pop()
+    small = scheduler.pop()
+    assert medium and medium["metadata"]["id"] == "medium"
+    assert small and small["metadata"]["id"] == "small"
+    assert scheduler.exhausted
+
+
+def test_scheduler_dispatches_a_bundle_larger_than_the_budget_alone():
+    scheduler = BundleScheduler(
+        [entry("huge", 1000), entry("small", 1)], memory_budget=10
+    )
+
+    huge = scheduler.pop()
+    assert huge and huge["metadata"]["id"] == "huge"
+    # without largest_first, the order is kept
+    assert scheduler.pop() is None
+    scheduler.release(huge)
+    assert ids(scheduler) == ["small"]
+
+
+def test_scheduler_backfills_only_before_the_reservation_of_a_waiting_bundle():
+    now = 0.0
+    costs = CostModel(
+        [
+            result("a", 1, 10, 600),
+            result("b", 1, 8, 600),
+            result("c", 1, 2, 300),
+            result("d", 1, 7, 100),
+        ]
+    )
+    scheduler = BundleScheduler(
+        [entry(id, 2) for id in "abcd"],
+        costs,
+        largest_first=True,
+        memory_budget=1000,
+        clock=lambda: now,
+    )
+
+    a = scheduler.pop()
+    assert a and a["metadata"]["id"] == "a"
+    # b waits for a, which is estimated to end at 10
+    now = 5.0
+    c = scheduler.pop()
+    assert c and c["metadata"]["id"] == "c"
+    # d fits as well, but would only end at 12
+    assert scheduler.pop() is None
+
+    scheduler.release(c)
+    now = 11.0
+    # a takes longer than estimated, so b keeps its reservation
+    assert scheduler.pop() is None
+    scheduler.release(a)
+    assert ids(scheduler) == ["b", "d"]
+
+
+def test_read_bundle_results():
+    Path("bundle_results.jsonl").write_text(
+        json.dumps(result("a", 1, 2, 3)) + "\n\n" + json.dumps(result("b", 1, 2, 3))
+    )
+
+    assert [r["bundle"] for r in read_bundle_results(Path("bundle_results.jsonl"))] == [
+        "a",
+        "b",
+    ]
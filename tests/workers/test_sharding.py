@@ -0,0 +1,129 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from traces_analyzer.workers.sharding import Shard, merge_shards, write_shard_info
+
+
+def test_shards_partition_the_bundles():
+    bundle_ids = [f"bundle_{i}" for i in range(100)]
+    shards = [Shard(index, 3) for index in (1, 2, 3)]
+
+    parts = [[id for id in bundle_ids if shard.contains(id)] for shard in shards]
+
+    assert sorted(id for part in parts for id in part) == sorted(bundle_ids)
+    assert all(parts)
+    # stable across processes, unlike hash()
+    assert Shard(1, 3).contains("bundle_0") == ("bundle_0" in parts[0])
+    assert [Shard.parse("2/3").contains(id) for id in parts[1]] == [True] * len(
+        parts[1]
+    )
+
+
+@pytest.mark.parametrize("value", ["0/2", "3/2", "1", "a/b"])
+def test_invalid_shards(value: str):
+    with pytest.raises(ValueError):
+        Shard.parse(value)
+
+
+def write_bundle(out: Path, bundle_id: str, txs: int = 2, complete: bool = True):
+    out.mkdir(exist_ok=True)
+    for i in range(txs):
+        # the tx hashes may be formatted with or without 0x
+        tx_hash = f"0x{i:064x}" if i % 2 else f"{i:064x}"
+        (out / f"{bundle_id}_{tx_hash}.json").write_text(json.dumps({"tx": i}))
+    if complete:
+        (out / f"{bundle_id}.json").write_text(json.dumps({"bundle": bundle_id}))
+
+
+def write_jsonl(path: Path, records: list[dict]):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+def timings(bundle_id: str, wall: float) -> dict:
+    stages = {"parse": {"wall": wall, "cpu": wall}}
+    return {
+        "bundle": bundle_id,
+        "steps": 1,
+        "wall": wall,
+        "cpu": wall,
+        "stages": stages,
+    }
+
+
+def test_merge_shards():
+    write_bundle(Path("shard_1"), "a")
+    write_bundle(Path("shard_1"), "b")
+    write_bundle(Path("shard_1"), "crashed", complete=False)
+    write_jsonl(Path("shard_1/timings.jsonl"), [timings("a", 1), timings("b", 2)])
+    write_shard_info(Path("shard_1"), Shard(1, 3), 2)
+    write_bundle(Path("shard_3"), "b")
+    write_bundle(Path("shard_3"), "c")
+    write_jsonl(Path("shard_3/timings.jsonl"), [timings("b", 5), timings("c", 3)])
+
+    report = merge_shards(
+        [Path("shard_1"), Path("shard_3")],
+        Path("merged"),
+        expected=["a", "b", "c", "crashed", "d"],
+    )
+
+    assert report.bundles == 3
+    assert report.duplicates == {"b": ["shard_1", "shard_3"]}
+    assert report.missing_bundles == ["crashed", "d"]
+    assert report.missing_shards == ["2/3", "3/3"]
+    assert report.incomplete == ["shard_3"]
+    assert sorted(
+        path.name for path in Path("merged").glob("*_*[0-9a-f].json")
+    ) == sorted(
+        f"{id}_{tx_hash}.json"
+        for id in "abc"
+        for tx_hash in (f"{0:064x}", f"0x{1:064x}")
+    )
+    merged_timings = [json.loads(line) for line in open("merged/timings.jsonl")]
+    assert [(t["bundle"], t["wall"]) for t in merged_timings] == [
+        ("a", 1),
+        ("b", 2),
+        ("c", 3),
+    ]
+    summary = json.loads(Path("merged/timings_summary.json").read_text())
+    assert summary["bundles"] == 3
+    assert summary["stages"]["parse"]["wall"] == 6
+    assert json.loads(Path("merged/merge.json").read_text())["bundles"] == 3
+
+
+def test_merge_shards_records_bundle_results():
+    write_bundle(Path("shard_1"), "a")
+    write_jsonl(
+        Path("shard_1/bundle_results.jsonl"),
+        [{"bundle": "a", "status": "ok"}, {"bundle": "huge", "status": "skipped"}],
+    )
+    write_shard_info(Path("shard_1"), Shard(1, 2), 1)
+    Path("shard_2").mkdir()
+    write_jsonl(
+        Path("shard_2/bundle_results.jsonl"), [{"bundle": "huge", "status": "killed"}]
+    )
+    write_shard_info(Path("shard_2"), Shard(2, 2), 0)
+
+    report = merge_shards(
+        [Path("shard_1"), Path("shard_2")], Path("merged"), expected=["a", "huge"]
+    )
+
+    assert report.missing_bundles == []
+    assert report.missing_shards == []
+    assert report.duplicates == {"huge": ["shard_1", "shard_2"]}
+    results = [json.loads(line) for line in open("merged/bundle_results.jsonl")]
+    assert results == [
+        {"bundle": "a", "status": "ok"},
+        {"bundle": "huge", "status": "skipped"},
+    ]
+
+
+def test_merge_shards_rejects_different_shard_counts():
+    Path("shard_1").mkdir()
+    Path("shard_2").mkdir()
+    write_shard_info(Path("shard_1"), Shard(1, 2), 0)
+    write_shard_info(Path("shard_2"), Shard(2, 3), 0)
+
+    with pytest.raises(ValueError):
+        merge_shards([Path("shard_1"), Path("shard_2")], Path("merged"))
@@ -0,0 +1,101 @@
+"""Measure the throughput and latency of repeated analysis runs over a corpus"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+import time
+from typing import Iterable, Sequence
+
+from traces_analyzer.benchmark.memory import peak_rss_bytes
+from traces_analyzer.benchmark.stats import percentile
+from traces_analyzer.loader.directory_loader import DirectoryLoader
+from traces_analyzer.loader.event_parser import EventsParser
+
+
+@dataclass
+class BenchRun:
+    seconds: float = 0
+    latencies: list[float] = field(default_factory=list)
+
+
+class BenchTimer:
+    """Record the latency of each bundle of a run, measured between consecutive bundles"""
+
+    def __init__(self) -> None:
+        self.runs: list[BenchRun] = []
+
+    def time_run(self, bundle_ids: Iterable) -> BenchRun:
+        run = BenchRun()
+        start = last = time.perf_counter()
+        for _ in bundle_ids:
+            now = time.perf_counter()
+            run.latencies.append(now - last)
+            last = now
+        run.seconds = time.perf_counter() - start
+        self.runs.append(run)
+        return run
+
+
+def count_steps(bundle_dirs: Iterable[Path], events_parser: EventsParser) -> int:
+    """Count the trace steps of the bundles, by parsing their trace events"""
+    steps = 0
+    for dir in bundle_dirs:
+        with DirectoryLoader(dir, events_parser) as bundle:
+            for tx in (bundle.tx_a, bundle.tx_b):
+                steps += sum(1 for _ in tx.events_normal)
+                steps += sum(1 for _ in tx.events_reverse)
+    return steps
+
+
+def bench_report(
+    runs: Sequence[BenchRun],
+    bundles: int,
+    steps: int,
+    peak_rss: int | None,
+    setup_rss: int,
+) -> dict:
+    """The throughput, latencies and memory of the runs
+
+    peak_rss is the peak RSS of this process during the runs, or None if it can not be
+    measured without the setup of the benchmark. The peak RSS of the worker processes
+    is taken from RUSAGE_CHILDREN, which covers the processes that have terminated,
+    and is None where it is unknown (Windows).
+    """
+    latencies = [latency for run in runs for latency in run.latencies]
+    return {
+        "bundles": bundles,
+        "steps": steps,
+        "runs": [
+            {
+                "seconds": run.seconds,
+                "bundles_per_second": bundles / run.seconds,
+                "steps_per_second": steps / run.seconds,
+            }
+            for run in runs
+        ],
+        "bundles_per_second": bundles * len(runs) / _total(runs),
+        "steps_per_second": steps * len(runs) / _total(runs),
+        "latency_seconds": {f"p{p}": percentile(latencies, p) for p in (50, 95, 99)},
+        "setup_rss_bytes": setup_rss,
+        "peak_rss_bytes": peak_rss,
+        "children_peak_rss_bytes": peak_rss_bytes(children=True),
+    }
+
+
+def format_bench_report(report: dict) -> str:
+    latency = report["latency_seconds"]
+    return "\n".join(
+        [
+            f"{len(report['runs'])} runs over {report['bundles']} bundles with {report['steps']} steps",
+            f"Throughput: {report['bundles_per_second']:.2f} bundles/s, {report['steps_per_second']:.0f} steps/s",
+            f"Bundle latency: p50 {latency['p50'] * 1000:.1f} ms, p95 {latency['p95'] * 1000:.1f} ms, p99 {latency['p99'] * 1000:.1f} ms",
+            f"Peak RSS: {_format_rss(report['peak_rss_bytes'])} after a setup of {_format_rss(report['setup_rss_bytes'])}, {_format_rss(report['children_peak_rss_bytes'])} in worker processes",
+        ]
+    )
+
+
+def _format_rss(rss: int | None) -> str:
+    return "unknown" if rss is None else f"{rss / 1024**2:.1f} MiB"
+
+
+def _total(runs: Sequence[BenchRun]) -> float:
+    return sum(run.seconds for run in runs)
@@ -0,0 +1,164 @@
+"""Peak memory and allocation sites of analyzing a bundle"""
+
+import gc
+import sys
+import tracemalloc
+
+from traces_parser.datatypes import HexString
+from traces_parser.parser.instructions.instruction import Instruction
+
+# allocations are attributed to the innermost frame in one of these paths
+MODULE_GROUPS = (
+    ("/traces_analyzer/loader/", "loader"),
+    ("/traces_analyzer/features/", "extractors"),
+    ("/traces_analyzer/evaluation/", "evaluations"),
+    ("/traces_parser/", "traces_parser"),
+)
+
+
+class MemoryProfiler:
+    """Measure the peak RSS of a bundle and sample its allocations with tracemalloc
+
+    The allocations are sampled whenever the traced memory is larger than at the
+    previous sample, eg at the end of each analysis stage, to approximate the state at
+    the peak. Counting the objects walks all objects of the garbage collector, so they
+    are only counted again once the traced memory grew by OBJECT_COUNT_GROWTH.
+    """
+
+    OBJECT_COUNT_GROWTH = 1.25
+
+    def __init__(self, top_sites: int = 10, frames: int = 16) -> None:
+        self._top_sites = top_sites
+        self._frames = frames
+        self._rss_before = 0
+        self._peak_reset = False
+        self._sampled_size = -1
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._objects: dict[str, int] = {}
+        self._objects_size = -1
+        self._report: dict = {}
+
+    def start(self):
+        self._peak_reset = reset_peak_rss()
+        self._rss_before = current_rss_bytes()
+        tracemalloc.start(self._frames)
+
+    def sample(self):
+        size = tracemalloc.get_traced_memory()[0]
+        if size <= self._sampled_size:
+            return
+        self._sampled_size = size
+        self._snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        if size >= self._objects_size * self.OBJECT_COUNT_GROWTH:
+            self._objects_size = size
+            self._objects = count_objects()
+
+    def stop(self):
+        self.sample()
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        peak_rss = peak_rss_since_reset()
+        self._report = {
+            "rss_before": self._rss_before,
+            "peak_rss": peak_rss,
+            # without a reset, the peak of the process is only known to increase
+            "peak_rss_delta": max(peak_rss - self._rss_before, 0),
+            "peak_rss_reset": self._peak_reset,
+            "traced_peak": traced_peak,
+            "sampled_traced": self._sampled_size,
+            "by_module": self._by_module(),
+            "top_sites": self._top_sites_report(),
+            "objects": self._objects,
+            "objects_traced": self._objects_size,
+        }
+        self._snapshot = None
+
+    def report(self) -> dict:
+        return self._report
+
+    def _by_module(self) -> dict[str, int]:
+        sizes = {group: 0 for _, group in MODULE_GROUPS}
+        sizes["other"] = 0
+        if self._snapshot:
+            for stat in self._snapshot.statistics("traceback"):
+                sizes[_module_group(stat.traceback)] += stat.size
+        return sizes
+
+    def _top_sites_report(self) -> list[dict]:
+        if not self._snapshot:
+            return []
+        return [
+            {
+                "site": f"{stat.traceback[-1].filename}:{stat.traceback[-1].lineno}",
+                "size": stat.size,
+                "count": stat.count,
+            }
+            for stat in self._snapshot.statistics("lineno")[: self._top_sites]
+        ]
+
+
+def count_objects() -> dict[str, int]:
+    """Count the Instruction and HexString objects tracked by the garbage collector"""
+    counts = {"Instruction": 0, "HexString": 0}
+    for obj in gc.get_objects():
+        if isinstance(obj, Instruction):
+            counts["Instruction"] += 1
+        elif isinstance(obj, HexString):
+            counts["HexString"] += 1
+    return counts
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak RSS of this process, which is only supported on Linux"""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def current_rss_bytes(pid: int | None = None) -> int:
+    """The RSS of this or another process, or 0 if it is unknown"""
+    return _proc_status_bytes("VmRSS", pid) or 0
+
+
+def peak_rss_since_reset() -> int:
+    """The peak RSS since the last reset_peak_rss, or of the whole process if it can not be reset, or 0 if it is unknown"""
+    return _proc_status_bytes("VmHWM") or peak_rss_bytes() or 0
+
+
+def peak_rss_bytes(children: bool = False) -> int | None:
+    """The peak RSS of this process so far, or of its largest terminated child process, or None if it is unknown"""
+    try:
+        # only available on Unix
+        import resource
+    except ImportError:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _proc_status_bytes(key: str, pid: int | None = None) -> int | None:
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as status:
+            for line in status:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _module_group(traceback: tracemalloc.Traceback) -> str:
+    # the frames are ordered from the oldest to the most recent call
+    for frame in reversed(traceback):
+        filename = frame.filename.replace("\\", "/")
+        for path, group in MODULE_GROUPS:
+            if path in filename:
+                return group
+    return "other"
@@ -0,0 +1,124 @@
+"""Profile the analysis of selected or slow bundles"""
+
+from collections import Counter
+from contextlib import contextmanager
+import cProfile
+from pathlib import Path
+import sys
+import threading
+from types import CodeType
+from typing import Iterable
+
+
+class StackSampler:
+    """Periodically sample the call stack of a thread and count the collapsed stacks
+
+    The counts are written in the collapsed stack format ('outer;inner count') of
+    flamegraph.pl, speedscope, inferno and similar tools.
+    """
+
+    def __init__(self, interval: float = 0.001, thread_id: int | None = None) -> None:
+        self.stacks: Counter[str] = Counter()
+        self._interval = interval
+        self._thread_id = thread_id or threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._sample_loop, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def sample(self):
+        frame = sys._current_frames().get(self._thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(frame_name(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def write_collapsed(self, path: Path):
+        with open(path, "w") as collapsed_file:
+            for stack, count in self.stacks.most_common():
+                collapsed_file.write(f"{stack} {count}\n")
+
+    def _sample_loop(self):
+        while not self._stopped.wait(self._interval):
+            self.sample()
+
+
+def frame_name(code: CodeType) -> str:
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+PROFILERS = ("cprofile", "stacks")
+
+
+class BundleProfiler:
+    """Profile the analysis of selected bundles and of bundles slower than a threshold
+
+    Selected bundles are profiled while they are analyzed. Whether a bundle is slow is
+    only known afterwards, so it is analyzed again with profiling. Each profile is
+    saved as <bundle>.pstats with cProfile or as <bundle>.collapsed with the sampled
+    call stacks. Only one of them runs at a time, as the sampler thread would show up
+    in the cProfile timings and cProfile slows down the sampled code.
+    """
+
+    def __init__(
+        self,
+        out_dir: Path,
+        bundle_ids: Iterable[str] = (),
+        slower_than: float | None = None,
+        sample_interval: float = 0.001,
+        profiler: str = "cprofile",
+    ) -> None:
+        if profiler not in PROFILERS:
+            raise ValueError(
+                f"Unknown profiler {profiler}, expected one of {PROFILERS}"
+            )
+        self.out_dir = out_dir
+        self.bundle_ids = set(bundle_ids)
+        self.slower_than = slower_than
+        self.sample_interval = sample_interval
+        self.profiler = profiler
+
+    def selected(self, bundle_id: str) -> bool:
+        return bundle_id in self.bundle_ids
+
+    def too_slow(self, seconds: float) -> bool:
+        return self.slower_than is not None and seconds > self.slower_than
+
+    @contextmanager
+    def profile(self, bundle_id: str):
+        if self.profiler == "stacks":
+            with self._sample_stacks(bundle_id):
+                yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            profile.dump_stats(self.out_dir / f"{bundle_id}.pstats")
+
+    @contextmanager
+    def _sample_stacks(self, bundle_id: str):
+        sampler = StackSampler(self.sample_interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            sampler.write_collapsed(self.out_dir / f"{bundle_id}.collapsed")
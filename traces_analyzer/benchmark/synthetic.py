@@ -0,0 +1,242 @@
+"""Generate deterministic synthetic structLog bundles, eg for benchmarks"""
+
+from dataclasses import dataclass
+import hashlib
+import json
+from pathlib import Path
+import random
+
+TRANSFER_TOPIC = 0xDDF252AD1BE2C89B69C2B068FC378DAA952BA7F163C4A11628F55A4DF523B3EF
+WORD = 32
+
+_PUSH_SIZES = {"PUSH1": 1, "PUSH2": 2, "PUSH20": 20, "PUSH32": 32}
+_GAS_COSTS = {"SLOAD": 2100, "CALL": 2600, "LOG3": 1756, "MSTORE": 6}
+
+
+@dataclass(frozen=True)
+class SyntheticTraceConfig:
+    """Shape of a synthetic trace
+
+    The root call runs a loop until `steps` steps are reached. The loop body consists
+    of `loop_blocks` blocks, each is either arithmetic, a memory write, a storage read,
+    a CALL (to a contract that does the same up to `call_depth`) or an ERC-20 Transfer
+    LOG. CALL values and LOG amounts are the values read from the storage.
+
+    From the step `divergence_step` on, the storage reads of the reverse trace return
+    different values, so the first one is the TOD source.
+    """
+
+    steps: int = 10_000
+    loop_blocks: int = 20
+    call_depth: int = 2
+    call_density: float = 0.05
+    log_density: float = 0.05
+    memory_size: int = 1024
+    divergence_step: int | None = None
+    seed: int = 0
+
+
+def generate_vm_trace(config: SyntheticTraceConfig, reverse: bool = False) -> dict:
+    """Generate the vm trace (as returned by debug_traceTransaction) of a synthetic transaction"""
+    tracer = _Tracer(config, reverse)
+    tracer.run(_root_address(config), depth=1)
+    return {
+        "failed": False,
+        "gas": tracer.gas_used,
+        "returnValue": "",
+        "structLogs": tracer.struct_logs,
+    }
+
+
+def write_synthetic_bundle(
+    root: Path, id: str, config: SyntheticTraceConfig = SyntheticTraceConfig()
+) -> Path:
+    """Write a bundle directory with two synthetic transactions, as read by the DirectoryLoader"""
+    dir = root / id
+    (dir / "actual").mkdir(parents=True, exist_ok=True)
+    (dir / "reverse").mkdir(parents=True, exist_ok=True)
+
+    tx_hashes = [_hash(f"{id}/{config.seed}/{name}") for name in ("a", "b")]
+    metadata = {
+        "id": id,
+        "transactions_order": tx_hashes,
+        "transactions": {
+            hash: {
+                "hash": hash,
+                "from": _address(f"{id}/{hash}/from"),
+                "to": _address_hex(_root_address(config)),
+                "input": "0x",
+                "value": "0x0",
+            }
+            for hash in tx_hashes
+        },
+    }
+
+    for scenario, reverse in (("actual", False), ("reverse", True)):
+        vm_trace = json.dumps(generate_vm_trace(config, reverse))
+        for hash in tx_hashes:
+            (dir / scenario / f"{hash}.json").write_text(vm_trace)
+    (dir / "metadata.json").write_text(json.dumps(metadata))
+    return dir
+
+
+def write_synthetic_corpus(
+    root: Path, count: int, config: SyntheticTraceConfig = SyntheticTraceConfig()
+) -> list[Path]:
+    return [
+        write_synthetic_bundle(root, f"synthetic_{i}", config) for i in range(count)
+    ]
+
+
+class _Code:
+    """The instructions of a synthetic contract, with their program counters"""
+
+    def __init__(self, instructions: list[tuple[str, int | None]]) -> None:
+        self.instructions = instructions
+        self.pcs: list[int] = []
+        pc = 0
+        for name, _ in instructions:
+            self.pcs.append(pc)
+            pc += 1 + _PUSH_SIZES.get(name, 0)
+        self.index_by_pc = {pc: i for i, pc in enumerate(self.pcs)}
+
+
+class _Tracer:
+    def __init__(self, config: SyntheticTraceConfig, reverse: bool) -> None:
+        self.config = config
+        self.reverse = reverse
+        self.struct_logs: list[dict] = []
+        self.gas = 30_000_000
+        self.gas_used = 0
+        self._codes: dict[int, _Code] = {}
+
+    def run(self, address: int, depth: int):
+        code = self._code(address, depth)
+        stack: list[int] = []
+        memory = bytearray()
+        memory_words: list[str] = []
+        i = 0
+        while True:
+            name, immediate = code.instructions[i]
+            cost = _GAS_COSTS.get(name, 3)
+            self.struct_logs.append(
+                {
+                    "pc": code.pcs[i],
+                    "op": name,
+                    "gas": self.gas,
+                    "gasCost": cost,
+                    "depth": depth,
+                    "stack": [hex(x) for x in stack],
+                    "memory": memory_words,
+                }
+            )
+            self.gas -= cost
+            self.gas_used += cost
+            i += 1
+
+            if name in _PUSH_SIZES:
+                # the loop condition is decided at run time, to reach the number of steps
+                stack.append(
+                    self._continue_loop(depth) if immediate is None else immediate
+                )
+            elif name == "POP":
+                stack.pop()
+            elif name == "ADD":
+                stack.append((stack.pop() + stack.pop()) % 2**256)
+            elif name == "MSTORE":
+                offset, value = stack.pop(), stack.pop()
+                if len(memory) < offset + WORD:
+                    memory.extend(bytes(offset + WORD - len(memory)))
+                memory[offset : offset + WORD] = value.to_bytes(WORD, "big")
+                memory_words = [
+                    memory[j : j + WORD].hex() for j in range(0, len(memory), WORD)
+                ]
+            elif name == "SLOAD":
+                stack.append(self._sload(address, stack.pop()))
+            elif name == "LOG3":
+                del stack[-5:]
+            elif name == "CALL":
+                target = stack[-2]
+                del stack[-7:]
+                self.run(target, depth + 1)
+                stack.append(1)
+            elif name == "JUMPI":
+                destination, condition = stack.pop(), stack.pop()
+                if condition:
+                    i = code.index_by_pc[destination]
+            elif name == "STOP":
+                return
+
+    def _continue_loop(self, depth: int) -> int:
+        if depth > 1:
+            return 0
+        return int(len(self.struct_logs) < self.config.steps)
+
+    def _sload(self, address: int, slot: int) -> int:
+        value = int.from_bytes(
+            hashlib.sha256(f"{address}/{slot}".encode()).digest()[:4], "big"
+        )
+        step = len(self.struct_logs) - 1
+        divergence = self.config.divergence_step
+        if self.reverse and divergence is not None and step >= divergence:
+            value += 1
+        return value
+
+    def _code(self, address: int, depth: int) -> _Code:
+        if address not in self._codes:
+            self._codes[address] = _build_code(self.config, address, depth)
+        return self._codes[address]
+
+
+def _build_code(config: SyntheticTraceConfig, address: int, depth: int) -> _Code:
+    rng = random.Random(f"{config.seed}/{address}")
+    blocks = config.loop_blocks if depth == 1 else max(1, config.loop_blocks // 4)
+    memory_words = max(1, config.memory_size // WORD)
+
+    body: list[tuple[str, int | None]] = []
+    for block in range(blocks):
+        kind = rng.random()
+        if kind < config.call_density and depth <= config.call_depth:
+            target = _contract_address(config, depth, block)
+            body += [("PUSH1", 0)] * 4
+            body += [("PUSH1", block), ("SLOAD", None)]
+            body += [("PUSH20", target), ("PUSH2", 0xFFFF), ("CALL", None)]
+            body += [("POP", None)]
+        elif kind < config.call_density + config.log_density:
+            body += [("PUSH1", block), ("SLOAD", None), ("PUSH1", 0), ("MSTORE", None)]
+            body += [("PUSH20", address), ("PUSH20", rng.getrandbits(160))]
+            body += [("PUSH32", TRANSFER_TOPIC), ("PUSH1", WORD), ("PUSH1", 0)]
+            body += [("LOG3", None)]
+        elif rng.random() < 0.3:
+            body += [("PUSH32", rng.getrandbits(256))]
+            body += [("PUSH2", WORD * rng.randrange(memory_words)), ("MSTORE", None)]
+        elif rng.random() < 0.5:
+            body += [("PUSH1", block), ("SLOAD", None), ("POP", None)]
+        else:
+            body += [("PUSH1", rng.getrandbits(8)), ("PUSH1", rng.getrandbits(8))]
+            body += [("ADD", None), ("POP", None)]
+
+    instructions: list[tuple[str, int | None]] = [("JUMPDEST", None), *body]
+    # the loop condition is pushed at run time, the destination is the JUMPDEST at pc 0
+    instructions += [("PUSH1", None), ("PUSH1", 0), ("JUMPI", None), ("STOP", None)]
+    return _Code(instructions)
+
+
+def _root_address(config: SyntheticTraceConfig) -> int:
+    return int(_address(f"root/{config.seed}"), 16)
+
+
+def _contract_address(config: SyntheticTraceConfig, depth: int, block: int) -> int:
+    return int(_address(f"contract/{config.seed}/{depth}/{block}"), 16)
+
+
+def _hash(name: str) -> str:
+    return "0x" + hashlib.sha256(name.encode()).hexdigest()
+
+
+def _address(name: str) -> str:
+    return _hash(name)[:42]
+
+
+def _address_hex(address: int) -> str:
+    return "0x" + address.to_bytes(20, "big").hex()
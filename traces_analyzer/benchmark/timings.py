@@ -0,0 +1,195 @@
+"""Wall and CPU time of the analysis stages of each bundle"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import heapq
+import time
+from typing import ContextManager, Iterable, Iterator, TypeVar
+
+from traces_analyzer.benchmark.stats import percentile
+from traces_analyzer.benchmark.memory import MemoryProfiler
+from traces_analyzer.utils.tracing import span
+
+T = TypeVar("T")
+
+_END = object()
+
+
+@dataclass
+class StageTime:
+    wall: float = 0
+    cpu: float = 0
+
+
+class StageTimer:
+    """Accumulate the time spent in each stage of analyzing a bundle
+
+    Stages can be nested, eg decoding the trace events while they are parsed. The time
+    is charged to the innermost stage only, so the stages add up to the total time.
+    With a MemoryProfiler, the memory is sampled at the end of each stage.
+    """
+
+    def __init__(self, memory: MemoryProfiler | None = None) -> None:
+        self.stages: dict[str, StageTime] = {}
+        self.steps = 0
+        self.memory = memory
+        self._active: list[StageTime] = []
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        with span(name):
+            self.enter(name)
+            try:
+                yield
+            finally:
+                self.exit()
+                if self.memory:
+                    self.memory.sample()
+                    # the sampling is not charged to any stage
+                    self._wall, self._cpu = time.perf_counter(), time.process_time()
+
+    def enter(self, name: str):
+        self._charge()
+        self._active.append(self.stages.setdefault(name, StageTime()))
+
+    def exit(self):
+        self._charge()
+        self._active.pop()
+
+    def timed_events(self, events: Iterable[T]) -> Iterator[T]:
+        """Charge the time to produce each event, eg decoding it, to the 'load' stage"""
+        iterator = iter(events)
+        while True:
+            self.enter("load")
+            event = next(iterator, _END)
+            self.exit()
+            if event is _END:
+                return
+            self.steps += 1
+            yield event  # type: ignore
+
+    def report(self) -> dict:
+        report = {
+            "steps": self.steps,
+            "wall": sum(stage.wall for stage in self.stages.values()),
+            "cpu": sum(stage.cpu for stage in self.stages.values()),
+            "stages": {
+                name: {"wall": stage.wall, "cpu": stage.cpu}
+                for name, stage in self.stages.items()
+            },
+        }
+        if self.memory:
+            report["memory"] = self.memory.report()
+        return report
+
+    def _charge(self):
+        wall, cpu = time.perf_counter(), time.process_time()
+        if self._active:
+            self._active[-1].wall += wall - self._wall
+            self._active[-1].cpu += cpu - self._cpu
+        self._wall, self._cpu = wall, cpu
+
+
+def timed(timer: StageTimer | None, stage: str) -> ContextManager:
+    """Time the stage with the timer, if any, and record it as a span"""
+    return timer.stage(stage) if timer else span(stage)
+
+
+@dataclass
+class TimingsSummary:
+    """Aggregate the stage timings of the bundles of a run"""
+
+    slowest: int = 10
+    bundles: int = 0
+    _stage_walls: dict[str, list[float]] = field(default_factory=dict)
+    _stage_cpus: dict[str, float] = field(default_factory=dict)
+    _slowest_bundles: list[tuple[float, str, int]] = field(default_factory=list)
+    _peak_rss_deltas: list[int] = field(default_factory=list)
+    _largest_bundles: list[tuple[int, str, int]] = field(default_factory=list)
+
+    def add(self, bundle_id: str, report: dict):
+        self.bundles += 1
+        for name, stage in report["stages"].items():
+            self._stage_walls.setdefault(name, []).append(stage["wall"])
+            self._stage_cpus[name] = self._stage_cpus.get(name, 0) + stage["cpu"]
+
+        self._push(self._slowest_bundles, (report["wall"], bundle_id, report["steps"]))
+        if "memory" in report:
+            peak_rss_delta = report["memory"]["peak_rss_delta"]
+            self._peak_rss_deltas.append(peak_rss_delta)
+            self._push(
+                self._largest_bundles, (peak_rss_delta, bundle_id, report["steps"])
+            )
+
+    def report(self) -> dict:
+        return {
+            "bundles": self.bundles,
+            "stages": {
+                name: {
+                    "wall": sum(walls),
+                    "cpu": self._stage_cpus[name],
+                    **{f"p{p}": percentile(walls, p) for p in (50, 95, 99)},
+                }
+                for name, walls in self._stage_walls.items()
+            },
+            "slowest_bundles": [
+                {"bundle": bundle_id, "wall": wall, "steps": steps}
+                for wall, bundle_id, steps in sorted(
+                    self._slowest_bundles, reverse=True
+                )
+            ],
+            **({"memory": self._memory_report()} if self._peak_rss_deltas else {}),
+        }
+
+    def _memory_report(self) -> dict:
+        deltas = self._peak_rss_deltas
+        return {
+            "peak_rss_delta": {
+                **{f"p{p}": percentile(deltas, p) for p in (50, 95, 99)},
+                "max": max(deltas),
+            },
+            "largest_bundles": [
+                {"bundle": bundle_id, "peak_rss_delta": delta, "steps": steps}
+                for delta, bundle_id, steps in sorted(
+                    self._largest_bundles, reverse=True
+                )
+            ],
+        }
+
+    def _push(self, heap: list, entry: tuple):
+        """Keep the `slowest` largest entries"""
+        if len(heap) < self.slowest:
+            heapq.heappush(heap, entry)
+        elif self.slowest:
+            heapq.heappushpop(heap, entry)
+
+
+def format_timings_summary(summary: dict) -> str:
+    lines = [
+        f"Stage timings of {summary['bundles']} bundles (seconds, per bundle wall):"
+    ]
+    for name, stage in summary["stages"].items():
+        lines.append(
+            f"  {name:<18} wall {stage['wall']:9.3f}  cpu {stage['cpu']:9.3f}  "
+            f"p50 {stage['p50']:.4f}  p95 {stage['p95']:.4f}  p99 {stage['p99']:.4f}"
+        )
+    lines.append("Slowest bundles:")
+    for bundle in summary["slowest_bundles"]:
+        lines.append(
+            f"  {bundle['bundle']}: {bundle['wall']:.3f} s, {bundle['steps']} steps"
+        )
+    if "memory" in summary:
+        delta = summary["memory"]["peak_rss_delta"]
+        lines.append(
+            f"Peak RSS delta per bundle (MiB): p50 {delta['p50'] / 1024**2:.1f}  "
+            f"p95 {delta['p95'] / 1024**2:.1f}  p99 {delta['p99'] / 1024**2:.1f}  "
+            f"max {delta['max'] / 1024**2:.1f}"
+        )
+        lines.append("Largest bundles:")
+        for bundle in summary["memory"]["largest_bundles"]:
+            lines.append(
+                f"  {bundle['bundle']}: {bundle['peak_rss_delta'] / 1024**2:.1f} MiB, {bundle['steps']} steps"
+            )
+    return "\n".join(lines)
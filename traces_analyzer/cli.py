@@ -1,14 +1,63 @@
 """CLI interface for traces_analyzer project."""
 
+from contextlib import ExitStack, nullcontext, redirect_stdout
+from dataclasses import asdict, dataclass
+from functools import partial
 import json
-from argparse import ArgumentParser, BooleanOptionalAction
+from argparse import (
+    ArgumentParser,
+    ArgumentTypeError,
+    BooleanOptionalAction,
+    Namespace,
+)
+import os
 from pathlib import Path
-from typing import Iterable
+import sys
+import threading
+import time
+from tempfile import TemporaryDirectory
+from typing import Iterable, Iterator
 from importlib.metadata import version
 
 from tqdm import tqdm
 
+from traces_analyzer.benchmark.bench import (
+    BenchTimer,
+    bench_report,
+    count_steps,
+    format_bench_report,
+)
+from traces_analyzer.benchmark.memory import (
+    MemoryProfiler,
+    current_rss_bytes,
+    peak_rss_since_reset,
+    reset_peak_rss,
+)
+from traces_analyzer.benchmark.profiling import PROFILERS, BundleProfiler
+from traces_analyzer.benchmark.synthetic import (
+    SyntheticTraceConfig,
+    write_synthetic_corpus,
+)
+from traces_analyzer.utils.tracing import (
+    SpanTracer,
+    get_tracer,
+    merge_worker_span_files,
+    set_span_bundle,
+    set_tracer,
+    span,
+    worker_span_tracer,
+)
+from traces_analyzer.benchmark.timings import (
+    StageTimer,
+    TimingsSummary,
+    format_timings_summary,
+    timed,
+)
+from traces_analyzer.evaluation.divergence_evaluation import DivergenceEvaluation
 from traces_analyzer.evaluation.evaluation import Evaluation
+from traces_analyzer.evaluation.extractor_costs_evaluation import (
+    ExtractorCostsEvaluation,
+)
 from traces_analyzer.evaluation.financial_gain_loss_evaluation import (
     FinancialGainLossEvaluation,
 )
@@ -19,6 +68,8 @@ from traces_analyzer.evaluation.securify_properties_evaluation import (
     SecurifyPropertiesEvaluation,
 )
 from traces_analyzer.evaluation.tod_source_evaluation import TODSourceEvaluation
+from traces_analyzer.evaluation.triage_evaluation import TriageEvaluation
+from traces_analyzer.features.divergence_locator import Divergence, locate_divergence
 from traces_analyzer.features.extractors.currency_changes import (
     CurrencyChangesFeatureExtractor,
 )
@@ -36,12 +87,64 @@ from traces_analyzer.features.feature_extraction_runner import (
     FeatureExtractionRunner,
     RunInfo,
 )
+from traces_analyzer.features.triage import TransactionTriage, TriageResult
 from traces_analyzer.features.feature_extractor import (
     SingleToDoubleInstructionFeatureExtractor,
 )
-from traces_analyzer.loader.directory_loader import DirectoryLoader
-from traces_analyzer.loader.event_parser import VmTraceEventsParser
-from traces_analyzer.loader.loader import PotentialAttack
+from traces_analyzer.loader.bundle_discovery import (
+    discover_bundle_dirs,
+    read_bundle_paths,
+)
+from traces_analyzer.loader.directory_loader import (
+    BundleDir,
+    DirectoryLoader,
+    split_bundle_dir,
+)
+from traces_analyzer.loader.event_parser import (
+    EIP3155EventsParser,
+    EventsParser,
+    VmTraceEventsParser,
+)
+from traces_analyzer.loader.json_backend import (
+    JSON_BACKENDS,
+    JsonBackend,
+    get_json_backend,
+)
+from traces_analyzer.loader.in_memory_loader import InMemoryLoader
+from traces_analyzer.loader.loader import PotentialAttack, TraceLoader
+from traces_analyzer.loader.manifest import (
+    ManifestEntry,
+    ManifestLoader,
+    SCENARIOS,
+    build_manifest,
+    read_manifest,
+    scan_bundles,
+)
+from traces_analyzer.loader.prefetching_loader import (
+    PrefetchingBundleSource,
+    read_trace_file,
+    trace_text_size,
+)
+from traces_analyzer.loader.rpc_loader import RpcLoader, TraceRpcClient
+from traces_analyzer.loader.stream_loader import (
+    StreamBundleSource,
+    open_bundle_stream,
+)
+from traces_analyzer.workers.limits import BundleLimits, StepLimit
+from traces_analyzer.workers.executor import (
+    BundleExecutor,
+    BundleResult,
+    InProcessExecutor,
+    PipelineExecutor,
+)
+from traces_analyzer.workers.pipeline import Pipeline, Stage
+from traces_analyzer.workers.pool import WorkerPool
+from traces_analyzer.workers.scheduler import (
+    BundleScheduler,
+    CostModel,
+    read_bundle_results,
+)
+from traces_analyzer.workers.sharding import Shard, merge_shards, write_shard_info
 from traces_parser.parser.events_parser import TraceEvent
 from traces_parser.parser.information_flow.information_flow_graph import (
     build_information_flow_graph,
@@ -57,7 +160,192 @@ from traces_parser.datatypes import HexString
 
 
 def main():
-    parser = ArgumentParser(description="Analyze bundles of transaction traces")
+    argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
+    else:
+        analyze_main(argv)
+
+
+def index_main(argv: list[str]):
+    parser = ArgumentParser(
+        prog="traces_analyzer index",
+        description="Write a manifest of all bundles below the given directories",
+    )
+    parser.add_argument(
+        "roots",
+        type=Path,
+        nargs="+",
+        help="Directories that are recursively searched for bundles with a metadata.json",
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=Path("manifest.jsonl"),
+        help="The path of the manifest file",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of threads that scan directories",
+    )
+
+    args = parser.parse_args(argv)
+    count = build_manifest(args.roots, args.out, args.workers)
+    print(f"Indexed {count} bundles in {args.out}")
+
+
+def bench_main(argv: list[str]):
+    parser = ArgumentParser(
+        prog="traces_analyzer bench",
+        description="Analyze a corpus of bundles repeatedly and report the throughput, bundle latencies and peak memory",
+        epilog="Unknown arguments are passed to the analysis, eg '--json-backend orjson --prefetch 4'",
+    )
+    corpus = parser.add_mutually_exclusive_group()
+    corpus.add_argument(
+        "--bundles-root",
+        type=Path,
+        nargs="+",
+        metavar="DIR",
+        help="Directories that are recursively searched for the bundles of the corpus",
+    )
+    corpus.add_argument(
+        "--synthetic",
+        type=int,
+        default=10,
+        metavar="COUNT",
+        help="Number of synthetic bundles that are generated as corpus if no --bundles-root is given",
+    )
+    parser.add_argument(
+        "--synthetic-steps",
+        type=int,
+        default=10_000,
+        help="Number of steps of each synthetic trace",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of times the corpus is analyzed",
+    )
+    parser.add_argument(
+        "--result",
+        type=Path,
+        default=Path("bench.json"),
+        help="The path of the JSON result",
+    )
+
+    args, analyze_argv = parser.parse_known_args(argv)
+
+    with TemporaryDirectory(prefix="traces_analyzer_bench_") as tmp:
+        if args.bundles_root:
+            # sorted, so repeated benchmarks analyze the bundles in the same order
+            bundle_dirs = sorted(discover_bundle_dirs(args.bundles_root))
+        else:
+            config = SyntheticTraceConfig(
+                steps=args.synthetic_steps, divergence_step=args.synthetic_steps // 2
+            )
+            bundle_dirs = write_synthetic_corpus(
+                Path(tmp) / "corpus", args.synthetic, config
+            )
+        if not bundle_dirs:
+            parser.error("The corpus does not contain any bundles")
+
+        analyze_args = parse_analyze_args(
+            [
+                *analyze_argv,
+                "--bundles",
+                *map(str, bundle_dirs),
+                "--out",
+                str(Path(tmp) / "out"),
+            ]
+        )
+        events_parser = create_events_parser(
+            analyze_args.trace_format,
+            bool(analyze_args.lazy_memory),
+            get_json_backend(analyze_args.json_backend),
+        )
+        # also warms the page cache for the first run
+        steps = count_steps(bundle_dirs, events_parser)
+        # the peak RSS of the runs does not include generating the corpus and counting its steps
+        setup_rss = current_rss_bytes()
+        peak_rss_reset = reset_peak_rss()
+
+        timer = BenchTimer()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            for _ in range(args.repeat):
+                timer.time_run(analyze(analyze_args))
+
+        peak_rss = peak_rss_since_reset() if peak_rss_reset else None
+
+    report = bench_report(timer.runs, len(bundle_dirs), steps, peak_rss, setup_rss)
+    report["config"] = {
+        "corpus": [str(root) for root in args.bundles_root]
+        if args.bundles_root
+        else {"synthetic": args.synthetic, "steps": args.synthetic_steps},
+        "analyze_args": analyze_argv,
+        "repeat": args.repeat,
+    }
+    args.result.write_text(json.dumps(report, indent=2))
+    print(format_bench_report(report))
+    print(f"Saved the result to {args.result}")
+
+
+def merge_main(argv: list[str]):
+    parser = ArgumentParser(
+        prog="traces_analyzer merge",
+        description="Merge the output directories of runs with --shard into one",
+    )
+    parser.add_argument(
+        "shard_dirs",
+        type=Path,
+        nargs="+",
+        metavar="DIR",
+        help="The --out directories of the shards. A bundle in several of them is taken from the first",
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=Path("out"),
+        help="The directory where the merged reports should be saved",
+    )
+    parser.add_argument(
+        "--expected",
+        type=Path,
+        metavar="MANIFEST",
+        help="A manifest of all bundles of the run, to report the bundles that are missing from the shards",
+    )
+
+    args = parser.parse_args(argv)
+    expected = None
+    if args.expected:
+        expected = [entry["metadata"]["id"] for entry in read_manifest(args.expected)]
+    report = merge_shards(args.shard_dirs, args.out, expected)
+
+    print(f"Merged {report.bundles} bundles into {args.out}")
+    for shard in report.missing_shards:
+        print(f"Missing shard {shard}")
+    for shard in report.duplicate_shards:
+        print(f"Shard {shard} is contained multiple times")
+    for dir in report.incomplete:
+        print(f"{dir} has no shard.json, its run did not complete")
+    for bundle_id, dirs in report.duplicates.items():
+        print(f"Duplicate bundle {bundle_id} in {', '.join(dirs)}")
+    if report.missing_bundles:
+        print(f"{len(report.missing_bundles)} bundles are missing, see merge.json")
+
+
+def analyze_main(argv: list[str]):
+    for _ in analyze(parse_analyze_args(argv)):
+        pass
+
+
+def parse_analyze_args(argv: list[str]) -> Namespace:
+    parser = ArgumentParser(
+        description="Analyze bundles of transaction traces",
+        epilog="Run 'traces_analyzer index --help' to create a manifest for --manifest, 'traces_analyzer bench --help' to measure the throughput and 'traces_analyzer merge --help' to combine the outputs of --shard runs",
+    )
     parser.add_argument(
         "--version", action="version", version="%(prog)s " + version("traces_analyzer")
     )
@@ -67,30 +355,952 @@ def main():
         default=Path("out"),
         help="The directory where the reports should be saved",
     )
-    parser.add_argument(
+    bundles_input = parser.add_mutually_exclusive_group(required=True)
+    bundles_input.add_argument(
         "--bundles",
         type=Path,
         nargs="+",
-        required=True,
         help="The directory path(s) that contain a metadata.json that describes what should be analyzed",
     )
+    bundles_input.add_argument(
+        "--bundles-from",
+        metavar="FILE",
+        help="A file with one bundle directory path per line, or '-' to read them from stdin",
+    )
+    bundles_input.add_argument(
+        "--bundles-root",
+        type=Path,
+        nargs="+",
+        metavar="DIR",
+        help="Directories that are recursively searched for bundles with a metadata.json",
+    )
+    bundles_input.add_argument(
+        "--stream",
+        metavar="SOURCE",
+        help="Read framed bundles and EIP-3155 traces (requires --trace-format eip3155) from '-' (stdin), 'unix:<socket path>' or a named pipe, see FramedStreamReader",
+    )
+    bundles_input.add_argument(
+        "--manifest",
+        type=Path,
+        help="A manifest created with 'traces_analyzer index' that lists the bundles to analyze",
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=["structlogs", "eip3155"],
+        default="structlogs",
+        help="Whether the traces are geth structLogs or EIP-3155 JSONL files",
+    )
+    parser.add_argument(
+        "--lazy-memory",
+        action=BooleanOptionalAction,
+        required=False,
+        help="Decode the memory of a trace step only when it is accessed",
+    )
+    parser.add_argument(
+        "--json-backend",
+        choices=["auto", *JSON_BACKENDS],
+        default="auto",
+        help="The JSON library to decode traces with. 'auto' picks the fastest installed one, but decodes vm traces with 'json', which drops the unused fields while decoding",
+    )
+    in_process = parser.add_argument_group(
+        "analysis in this process", "Options that require no --workers or --pipeline"
+    )
+    in_process.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        help="Number of bundles that are read into memory in the background while the current one is analyzed",
+    )
+    in_process.add_argument(
+        "--prefetch-memory",
+        type=int,
+        default=1024,
+        help="Maximum MiB of decompressed trace text that prefetched bundles may hold, with an estimate of the decoded traces for --prefetch-decode",
+    )
+    in_process.add_argument(
+        "--prefetch-decode",
+        action=BooleanOptionalAction,
+        required=False,
+        help="Also JSON decode the prefetched traces in the background",
+    )
+    in_process.add_argument(
+        "--rpc",
+        metavar="URL",
+        help="Fetch the traces from this JSON-RPC endpoint instead of reading them from the bundle directories, which then only need a metadata.json",
+    )
+    in_process.add_argument(
+        "--rpc-cache",
+        type=Path,
+        metavar="DIR",
+        help="Save the traces fetched with --rpc as bundle directories in DIR",
+    )
+    parser.add_argument(
+        "--skip-identical",
+        action=BooleanOptionalAction,
+        default=False,
+        help="Report no differences for transactions whose normal and reverse trace files are byte-identical, without analyzing them",
+    )
+    parser.add_argument(
+        "--divergence",
+        action=BooleanOptionalAction,
+        required=False,
+        help="Compare the normal and reverse traces step by step before parsing them and report where they diverge. Keeps the trace events of a transaction in memory",
+    )
+    parser.add_argument(
+        "--triage",
+        action=BooleanOptionalAction,
+        required=False,
+        help="Screen the CALLs, LOGs and reverts of the raw traces first and only run the full analysis for bundles where they differ. Bundles without differences only get the triage report",
+    )
+    parser.add_argument(
+        "--step-index",
+        action=BooleanOptionalAction,
+        required=False,
+        help="Write a <trace>.idx file next to each uncompressed trace, mapping steps to byte offsets for random access",
+    )
+    parser.add_argument(
+        "--extractor-costs",
+        action=BooleanOptionalAction,
+        required=False,
+        help="Measure the time each feature extractor spends per call and per opcode and add it to the transaction reports",
+    )
+    parser.add_argument(
+        "--trace-spans",
+        type=Path,
+        metavar="FILE",
+        help="Record the loading and analysis stages of each bundle as spans in a Chrome trace event JSON file, eg for https://ui.perfetto.dev",
+    )
+    parser.add_argument(
+        "--timings",
+        action=BooleanOptionalAction,
+        required=False,
+        help="Record the wall and CPU time of each analysis stage per bundle in timings.jsonl and summarize them at the end. Not supported with --workers",
+    )
+    in_process.add_argument(
+        "--memory-profile",
+        action=BooleanOptionalAction,
+        required=False,
+        help="Also record the peak RSS, the tracemalloc allocation sites by module and the Instruction/HexString counts of each bundle in the --timings output. Slows down the analysis",
+    )
+    parser.add_argument(
+        "--timings-slowest",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Number of the slowest bundles listed in the --timings summary",
+    )
+    in_process.add_argument(
+        "--profile-bundles",
+        metavar="ID,...",
+        help="Profile the analysis of these bundles with --profiler and save the profiles in <out>/profiles",
+    )
+    in_process.add_argument(
+        "--profile-slower-than",
+        type=float,
+        metavar="SECONDS",
+        help="Analyze bundles whose analysis took longer than SECONDS again with profiling, like --profile-bundles. Only supported for bundles read from directories",
+    )
+    in_process.add_argument(
+        "--profiler",
+        choices=PROFILERS,
+        default="cprofile",
+        help="Profile with cProfile (<bundle>.pstats) or by sampling the call stack every millisecond (<bundle>.collapsed)",
+    )
+    workers = parser.add_argument_group(
+        "worker processes",
+        "Analyze the bundles in parallel processes, which skip or kill a bundle that exceeds the bundle limits",
+    )
+    workers.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Number of processes that analyze bundles in parallel, with the bundle limits below (0 analyzes them in this process)",
+    )
+    workers.add_argument(
+        "--max-trace-size",
+        type=int,
+        metavar="MiB",
+        help="Skip bundles whose trace files are larger in total",
+    )
+    workers.add_argument(
+        "--max-steps",
+        type=int,
+        help="Stop analyzing a bundle when its traces have more steps in total",
+    )
+    workers.add_argument(
+        "--bundle-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="Kill the worker of a bundle that takes longer",
+    )
+    workers.add_argument(
+        "--max-rss",
+        type=int,
+        metavar="MiB",
+        help="Kill a worker whose RSS grows larger (Linux only)",
+    )
+    workers.add_argument(
+        "--recycle-after",
+        type=int,
+        metavar="N",
+        help="Replace each worker process after it analyzed N bundles, to contain memory fragmentation",
+    )
+    workers.add_argument(
+        "--largest-first",
+        action=BooleanOptionalAction,
+        default=True,
+        help="Dispatch the bundles with the longest estimated analysis time to the workers first, based on the trace sizes and --cost-history. Reads all bundles before the analysis starts",
+    )
+    workers.add_argument(
+        "--cost-history",
+        type=Path,
+        metavar="FILE",
+        help="The bundle_results.jsonl of a previous run, whose times and memory are used to estimate the costs of the bundles (default: the one in --out, if any)",
+    )
+    workers.add_argument(
+        "--memory-budget",
+        type=int,
+        metavar="MiB",
+        help="Only run bundles in parallel while their estimated peak memory stays within this budget",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="I/N",
+        help="Only analyze the I-th of N parts of the bundles (1 <= I <= N), partitioned by a hash of the bundle id. Combine the outputs with 'traces_analyzer merge'",
+    )
+    pipeline = parser.add_argument_group(
+        "pipeline",
+        "Analyze the bundles in stages that run concurrently, a bundle for which a stage fails is skipped",
+    )
+    pipeline.add_argument(
+        "--pipeline",
+        nargs="?",
+        const="",
+        type=parse_pipeline_workers,
+        metavar="STAGE=N,...",
+        help="Analyze the bundles in a pipeline whose stages run concurrently: discover (threads), read (threads), analyze (processes) and write (threads). Optionally sets the workers per stage, eg 'read=8,analyze=4' (default: "
+        + ",".join(f"{stage}={n}" for stage, n in PIPELINE_WORKERS.items())
+        + ")",
+    )
+    pipeline.add_argument(
+        "--pipeline-queue-size",
+        type=int,
+        default=4,
+        metavar="N",
+        help="Number of bundles that may wait between two stages of --pipeline",
+    )
+    pipeline.add_argument(
+        "--pipeline-memory",
+        type=int,
+        default=1024,
+        metavar="MIB",
+        help="Maximum MiB of decompressed trace text that --pipeline holds between reading the bundles and analyzing them",
+    )
     parser.add_argument("--verbose", action=BooleanOptionalAction, required=False)
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.rpc and (args.stream or args.trace_format != "structlogs"):
+        parser.error(
+            "--rpc fetches structLogs and can not be used with --stream or --trace-format eip3155"
+        )
+    if args.workers > 0 and args.pipeline is not None:
+        parser.error("--workers and --pipeline can not be used together")
+    executor = executor_name(args)
+    unsupported = [
+        flag
+        for dest, (flag, executors) in EXECUTOR_OPTIONS.items()
+        if executor not in executors and is_set(parser, args, dest)
+    ]
+    if unsupported:
+        parser.error(
+            f"{', '.join(unsupported)} can not be used {EXECUTOR_USAGE[executor]}"
+        )
+    try:
+        get_json_backend(args.json_backend)
+    except ImportError as e:
+        parser.error(str(e))
+    if args.stream and args.trace_format != "eip3155":
+        parser.error(
+            "--stream parses the traces while they are received and requires --trace-format eip3155"
+        )
+    if args.shard and args.stream:
+        parser.error("--shard can not be used with --stream")
+    if args.skip_identical and args.stream:
+        parser.error("--skip-identical can not be used with --stream")
+    return args
+
+
+# the options that not every way to execute the analysis supports, by dest: the
+# flag and the executors that support it
+EXECUTOR_OPTIONS = {
+    "rpc": ("--rpc", {"in-process"}),
+    "stream": ("--stream", {"in-process"}),
+    "prefetch": ("--prefetch", {"in-process"}),
+    "timings": ("--timings", {"in-process", "pipeline"}),
+    "memory_profile": ("--memory-profile", {"in-process"}),
+    "profile_bundles": ("--profile-bundles", {"in-process"}),
+    "profile_slower_than": ("--profile-slower-than", {"in-process"}),
+    "max_trace_size": ("--max-trace-size", {"workers"}),
+    "max_steps": ("--max-steps", {"workers"}),
+    "bundle_timeout": ("--bundle-timeout", {"workers"}),
+    "max_rss": ("--max-rss", {"workers"}),
+    "memory_budget": ("--memory-budget", {"workers"}),
+}
+EXECUTOR_USAGE = {
+    "in-process": "without --workers",
+    "workers": "with --workers",
+    "pipeline": "with --pipeline",
+}
+
+
+def executor_name(args: Namespace) -> str:
+    if args.workers > 0:
+        return "workers"
+    return "in-process" if args.pipeline is None else "pipeline"
 
+
+def is_set(parser: ArgumentParser, args: Namespace, dest: str) -> bool:
+    value = getattr(args, dest)
+    # eg --no-timings is not set, while --profile-slower-than 0 is
+    return value is not False and value != parser.get_default(dest)
+
+
+PIPELINE_WORKERS = {
+    "discover": 8,
+    "read": 4,
+    "analyze": os.cpu_count() or 1,
+    # a single writer keeps the CLI output of the bundles apart
+    "write": 1,
+}
+
+
+def parse_pipeline_workers(value: str) -> dict[str, int]:
+    workers = dict(PIPELINE_WORKERS)
+    for part in filter(None, value.split(",")):
+        stage, _, count = part.partition("=")
+        if stage not in workers or not count.isdigit() or int(count) < 1:
+            raise ArgumentTypeError(
+                f"invalid pipeline workers {part}, expected STAGE=N with N >= 1 and a stage of {', '.join(workers)}"
+            )
+        workers[stage] = int(count)
+    return workers
+
+
+def parse_shard(value: str) -> Shard:
+    try:
+        return Shard.parse(value)
+    except ValueError as e:
+        raise ArgumentTypeError(f"invalid shard {value}, expected I/N ({e})")
+
+
+@dataclass
+class BundleReports:
+    """The JSON reports of a bundle by file name and its CLI output"""
+
+    bundle_id: str
+    reports: dict[str, dict]
+    cli_output: list[str]
+    # the stage timings of the analysis, with --timings
+    timings: dict | None = None
+
+
+def analyze(args: Namespace) -> Iterator[str]:
+    """Analyze the bundles selected by the arguments, yielding the id of each bundle once its reports are saved"""
     out = args.out
-    bundles = args.bundles
-    verbose = bool(args.verbose)
+    json_backend = get_json_backend(args.json_backend)
+    events_parser = create_events_parser(
+        args.trace_format, bool(args.lazy_memory), json_backend
+    )
 
     out.mkdir(exist_ok=True)
+    bundles: Iterable[BundleDir] = iter_bundle_dirs(args)
+    if args.shard:
+        bundles = iter_shard_bundle_dirs(args, bundles, events_parser, json_backend)
+
+    # discovered or streamed bundles are analyzed before their total is known
+    total = len(args.bundles) if args.bundles and not args.shard else None
+    entries: list[ManifestEntry] | None = None
+    if args.manifest:
+        entries = list(read_manifest_shard(args, json_backend))
+        total = len(entries)
+
+    timings_summary = None
+    if args.timings or args.memory_profile:
+        timings_summary = TimingsSummary(args.timings_slowest)
+        (out / "timings.jsonl").write_text("")
+
+    # closed once the bundles are analyzed, eg the connections of the RPC client
+    resources = ExitStack()
+    executor: BundleExecutor
+    inputs: Iterable
+    if args.workers > 0:
+        # the scheduler reads the bundle_results.jsonl of the previous run before
+        # the results of this one replace it
+        inputs = create_scheduler(
+            args, scan_bundles(bundles) if entries is None else entries
+        )
+        executor = create_worker_pool(args)
+    elif args.pipeline:
+        discover = args.pipeline["discover"]
+        inputs = scan_bundles(bundles, discover) if entries is None else entries
+        executor = create_pipeline_executor(args, timings_summary)
+    else:
+        inputs = open_bundle_loaders(
+            args, bundles, entries, events_parser, json_backend, resources
+        )
+        executor = InProcessExecutor(
+            partial(analyze_loaded_bundle, args, timings_summary, create_profiler(args))
+        )
+
+    if args.trace_spans:
+        set_tracer(SpanTracer(open(args.trace_spans, "w")))
+    analyzed = 0
+    try:
+        for bundle_id in record_bundle_results(out, executor.run(inputs), total):
+            analyzed += 1
+            yield bundle_id
+    finally:
+        resources.close()
+        if tracer := get_tracer():
+            set_tracer(None)
+            tracer.close()
+            if args.workers > 0:
+                merge_worker_span_files(args.trace_spans)
+
+    if executor_summary := executor.summary():
+        print(executor_summary)
+
+    if args.shard:
+        write_shard_info(out, args.shard, analyzed)
+
+    if timings_summary:
+        summary = timings_summary.report()
+        (out / "timings_summary.json").write_text(json.dumps(summary, indent=2))
+        print(format_timings_summary(summary))
+
+
+def record_bundle_results(
+    out: Path, results: Iterable[BundleResult], total: int | None
+) -> Iterator[str]:
+    """Record the outcome of each bundle in bundle_results.jsonl, yielding the ids of the analyzed bundles"""
+    with open(out / "bundle_results.jsonl", "w") as results_file:
+        for result in (bar := tqdm(results, total=total, dynamic_ncols=True)):
+            bar.set_postfix_str(result.bundle)
+            results_file.write(json.dumps(asdict(result)) + "\n")
+            results_file.flush()
+            if result.status == "ok":
+                yield result.bundle
+            else:
+                print(
+                    f"{result.status.capitalize()} {result.bundle} ({result.reason}): {result.detail}"
+                )
+
+
+def open_bundle_loaders(
+    args: Namespace,
+    bundles: Iterable[BundleDir],
+    entries: list[ManifestEntry] | None,
+    events_parser: EventsParser,
+    json_backend: JsonBackend,
+    resources: ExitStack,
+) -> Iterable[TraceLoader]:
+    """The loaders of the bundles that are analyzed in this process, by where their traces are read from"""
+    if args.rpc:
+        if entries is not None:
+            metadatas = (entry["metadata"] for entry in entries)
+        else:
+            metadatas = (
+                DirectoryLoader(
+                    dir, events_parser, json_backend, metadata=metadata
+                ).read_metadata()
+                for dir, metadata in map(split_bundle_dir, bundles)
+            )
+        client = resources.enter_context(TraceRpcClient(args.rpc))
+        return (
+            RpcLoader(
+                metadata, client, events_parser, args.rpc_cache, args.skip_identical
+            )
+            for metadata in metadatas
+        )
+    if args.stream:
+        return StreamBundleSource(open_bundle_stream(args.stream), events_parser)
+    if entries is not None:
+        return (
+            ManifestLoader(
+                entry,
+                events_parser,
+                json_backend,
+                bool(args.step_index),
+                args.skip_identical,
+            )
+            for entry in entries
+        )
+    if args.prefetch > 0:
+        return PrefetchingBundleSource(
+            bundles,
+            events_parser,
+            json_backend,
+            prefetch=args.prefetch,
+            memory_budget=args.prefetch_memory * 1024**2,
+            decode=bool(args.prefetch_decode),
+            step_index=bool(args.step_index),
+            detect_identical=args.skip_identical,
+        )
+    return (
+        DirectoryLoader(
+            path,
+            events_parser,
+            json_backend,
+            bool(args.step_index),
+            args.skip_identical,
+            metadata,
+        )
+        for path, metadata in map(split_bundle_dir, bundles)
+    )
+
+
+def create_profiler(args: Namespace) -> BundleProfiler | None:
+    if not args.profile_bundles and args.profile_slower_than is None:
+        return None
+    return BundleProfiler(
+        args.out / "profiles",
+        args.profile_bundles.split(",") if args.profile_bundles else (),
+        args.profile_slower_than,
+        profiler=args.profiler,
+    )
+
+
+def analyze_loaded_bundle(
+    args: Namespace,
+    timings_summary: TimingsSummary | None,
+    profiler: BundleProfiler | None,
+    loader: TraceLoader,
+) -> str:
+    """Analyze a bundle in this process, with its --timings, --memory-profile and --profile-*"""
+    out = args.out
+    memory = MemoryProfiler() if args.memory_profile else None
+    timer = StageTimer(memory) if timings_summary else None
+    if memory:
+        memory.start()
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(span("bundle"))
+            with timed(timer, "load"):
+                bundle = stack.enter_context(loader)
+            set_span_bundle(bundle.id)
+            if timer:
+                for tx in (bundle.tx_a, bundle.tx_b):
+                    tx.events_normal = timer.timed_events(tx.events_normal)
+                    tx.events_reverse = timer.timed_events(tx.events_reverse)
+            profile = None
+            if profiler and profiler.selected(bundle.id):
+                profile = profiler.profile(bundle.id)
+            start = time.perf_counter()
+            with profile or nullcontext():
+                analyze_transactions_in_dir(
+                    bundle,
+                    out,
+                    bool(args.verbose),
+                    bool(args.divergence),
+                    bool(args.triage),
+                    timer,
+                    bool(args.extractor_costs),
+                )
+            seconds = time.perf_counter() - start
+    finally:
+        # tracemalloc slows everything down, so it is stopped even if the bundle fails
+        if memory:
+            memory.stop()
+    if timer and timings_summary:
+        record_timings(out, timings_summary, bundle.id, timer.report())
+    if profiler and not profile and profiler.too_slow(seconds):
+        profile_slow_bundle(args, loader, bundle.id, profiler)
+    set_span_bundle(None)
+    return bundle.id
+
+
+# the pipeline may save the reports, and their timings, in several threads
+_timings_lock = threading.Lock()
+
+
+def record_timings(
+    out: Path, timings_summary: TimingsSummary, bundle_id: str, report: dict
+):
+    """Add the stage timings of a bundle to timings.jsonl and the --timings summary"""
+    with _timings_lock:
+        timings_summary.add(bundle_id, report)
+        with open(out / "timings.jsonl", "a") as timings_file:
+            timings_file.write(json.dumps({"bundle": bundle_id, **report}) + "\n")
+
+
+def create_scheduler(
+    args: Namespace, entries: Iterable[ManifestEntry]
+) -> BundleScheduler:
+    """Order the bundles for --workers by their costs in --cost-history, or in the previous bundle_results.jsonl"""
+    history_path = args.cost_history or args.out / "bundle_results.jsonl"
+    history = []
+    if args.cost_history or history_path.exists():
+        history = list(read_bundle_results(history_path))
+    return BundleScheduler(
+        entries,
+        CostModel(history),
+        args.largest_first,
+        mib_to_bytes(args.memory_budget),
+    )
+
+
+def create_worker_pool(args: Namespace) -> WorkerPool:
+    return WorkerPool(
+        partial(analyze_bundle_in_worker, args),
+        args.workers,
+        BundleLimits(
+            max_trace_bytes=mib_to_bytes(args.max_trace_size),
+            max_steps=args.max_steps,
+            timeout=args.bundle_timeout,
+            max_rss=mib_to_bytes(args.max_rss),
+        ),
+        args.recycle_after,
+        partial(worker_span_tracer, args.trace_spans) if args.trace_spans else None,
+    )
+
+
+def analyze_bundle_in_worker(args: Namespace, entry: ManifestEntry):
+    json_backend = get_json_backend(args.json_backend)
+    events_parser = create_events_parser(
+        args.trace_format, bool(args.lazy_memory), json_backend
+    )
+    loader = ManifestLoader(
+        entry,
+        events_parser,
+        json_backend,
+        bool(args.step_index),
+        args.skip_identical,
+    )
+    with span("bundle"), loader as bundle:
+        set_span_bundle(bundle.id)
+        if args.max_steps is not None:
+            step_limit = StepLimit(args.max_steps)
+            for tx in (bundle.tx_a, bundle.tx_b):
+                tx.events_normal = step_limit.limit(tx.events_normal)
+                tx.events_reverse = step_limit.limit(tx.events_reverse)
+        analyze_transactions_in_dir(
+            bundle,
+            args.out,
+            bool(args.verbose),
+            bool(args.divergence),
+            bool(args.triage),
+            None,
+            bool(args.extractor_costs),
+        )
+
+
+def create_pipeline_executor(
+    args: Namespace, timings_summary: TimingsSummary | None
+) -> PipelineExecutor:
+    """Read, analyze and save the bundles in the concurrent stages of --pipeline
+
+    Parsing the traces, extracting the features and evaluating them share one process
+    stage, as the parsed instructions are too costly to send between processes. With
+    --timings, that stage times them separately. The texts that are read and not
+    analyzed yet are bounded by --pipeline-memory.
+    """
+    workers = args.pipeline
+    pipeline = Pipeline(
+        [
+            Stage("read", read_bundle_traces, workers["read"], size=bundle_text_size),
+            Stage(
+                "analyze",
+                partial(analyze_bundle_traces, args),
+                workers["analyze"],
+                processes=True,
+            ),
+            Stage(
+                "write",
+                partial(write_bundle_reports, args.out, timings_summary),
+                workers["write"],
+            ),
+        ],
+        args.pipeline_queue_size,
+        args.pipeline_memory * 1024**2,
+    )
+    return PipelineExecutor(pipeline)
+
+
+def read_bundle_traces(
+    entry: ManifestEntry,
+) -> tuple[ManifestEntry, dict[str, dict[str, str]]]:
+    """Read the trace files of a bundle by transaction hash and scenario"""
+    dir = Path(entry["dir"])
+    traces = {
+        hash: {
+            scenario: read_trace_file(dir / trace["path"])
+            for scenario, trace in scenarios.items()
+        }
+        for hash, scenarios in entry["traces"].items()
+    }
+    return entry, traces
+
+
+def bundle_text_size(entry: ManifestEntry) -> int:
+    """The size of the decompressed texts of the trace files of a bundle"""
+    dir = Path(entry["dir"])
+    return sum(
+        trace_text_size(dir / trace["path"])
+        for scenarios in entry["traces"].values()
+        for trace in scenarios.values()
+    )
+
+
+def analyze_bundle_traces(
+    args: Namespace, bundle_traces: tuple[ManifestEntry, dict[str, dict[str, str]]]
+) -> BundleReports:
+    entry, traces = bundle_traces
+    metadata = entry["metadata"]
+    events_parser = create_events_parser(
+        args.trace_format, bool(args.lazy_memory), get_json_backend(args.json_backend)
+    )
+    hashes = metadata["transactions_order"][:2]
+    tx_a, tx_b = (metadata["transactions"][hash] for hash in hashes)
+    # the actual and reverse trace of each transaction
+    texts = [
+        tuple(traces[HexString(hash).with_prefix()][scenario] for scenario in SCENARIOS)
+        for hash in hashes
+    ]
+    loader = InMemoryLoader(
+        metadata["id"],
+        tx_a,
+        tx_b,
+        *(text.splitlines(keepends=True) for pair in texts for text in pair),
+        parser=events_parser,
+    )
+    timer = StageTimer() if args.timings else None
+    with ExitStack() as stack:
+        stack.enter_context(span("bundle"))
+        with timed(timer, "load"):
+            bundle = stack.enter_context(loader)
+        set_span_bundle(bundle.id)
+        if args.skip_identical:
+            for tx, (text_normal, text_reverse) in zip(
+                (bundle.tx_a, bundle.tx_b), texts
+            ):
+                if text_normal == text_reverse:
+                    # identical traces are only parsed once
+                    tx.identical_traces = True
+                    tx.events_reverse = tx.events_normal
+        if timer:
+            for tx in (bundle.tx_a, bundle.tx_b):
+                tx.events_normal = timer.timed_events(tx.events_normal)
+                tx.events_reverse = timer.timed_events(tx.events_reverse)
+        bundle_reports = analyze_bundle_reports(
+            bundle,
+            bool(args.verbose),
+            bool(args.divergence),
+            bool(args.triage),
+            timer,
+            bool(args.extractor_costs),
+        )
+    if timer:
+        bundle_reports.timings = timer.report()
+    return bundle_reports
 
-    for path in (bar := tqdm(bundles, dynamic_ncols=True)):
-        with DirectoryLoader(path, VmTraceEventsParser()) as bundle:
-            bar.set_postfix_str(bundle.id)
-            analyze_transactions_in_dir(bundle, out, verbose)
+
+def write_bundle_reports(
+    out: Path, timings_summary: TimingsSummary | None, bundle_reports: BundleReports
+) -> str:
+    with span("save"):
+        save_bundle_reports(bundle_reports, out)
+    if timings_summary and bundle_reports.timings:
+        record_timings(
+            out, timings_summary, bundle_reports.bundle_id, bundle_reports.timings
+        )
+    return bundle_reports.bundle_id
+
+
+def mib_to_bytes(mib: int | None) -> int | None:
+    return None if mib is None else mib * 1024**2
+
+
+def profile_slow_bundle(
+    args: Namespace, loader: TraceLoader, bundle_id: str, profiler: BundleProfiler
+):
+    """Analyze a slow bundle again with profiling, discarding its reports"""
+    if not isinstance(loader, DirectoryLoader):
+        print(
+            f"Can not profile {bundle_id}, only bundles from directories are reloaded"
+        )
+        return
+    # the reopened loader has the options of the first analysis, eg --skip-identical
+    with loader.reopen() as bundle, span("profile"), profiler.profile(bundle_id):
+        analyze_bundle_reports(
+            bundle,
+            False,
+            bool(args.divergence),
+            bool(args.triage),
+            None,
+            bool(args.extractor_costs),
+        )
+
+
+def in_shard(args: Namespace, metadata: dict) -> bool:
+    return args.shard is None or args.shard.contains(metadata["id"])
+
+
+def iter_shard_bundle_dirs(
+    args: Namespace,
+    dirs: Iterable[Path],
+    events_parser: EventsParser,
+    json_backend: JsonBackend,
+) -> Iterator[tuple[Path, dict]]:
+    """The bundle directories in the --shard, with the metadata that was read to select them"""
+    for dir in dirs:
+        metadata = DirectoryLoader(dir, events_parser, json_backend).read_metadata()
+        if in_shard(args, metadata):
+            yield dir, metadata
+
+
+def read_manifest_shard(
+    args: Namespace, json_backend: JsonBackend
+) -> Iterator[ManifestEntry]:
+    """The entries of the --manifest in the --shard"""
+    for entry in read_manifest(args.manifest, json_backend):
+        if in_shard(args, entry["metadata"]):
+            yield entry
+
+
+def iter_bundle_dirs(args) -> Iterator[Path]:
+    """Yield the bundle directories as they are read or discovered, so the analysis can start early"""
+    if args.bundles:
+        yield from args.bundles
+    elif args.bundles_root:
+        yield from discover_bundle_dirs(args.bundles_root)
+    elif args.bundles_from == "-":
+        yield from read_bundle_paths(sys.stdin)
+    elif args.bundles_from:
+        with open(args.bundles_from) as bundles_file:
+            yield from read_bundle_paths(bundles_file)
+
+
+COMMANDS = {
+    "index": index_main,
+    "bench": bench_main,
+    "merge": merge_main,
+}
+
+
+def create_events_parser(
+    trace_format: str, lazy_memory: bool, json_backend: JsonBackend
+) -> EventsParser:
+    if trace_format == "eip3155":
+        return EIP3155EventsParser()
+    return VmTraceEventsParser(lazy_memory=lazy_memory, json_backend=json_backend)
+
+
+def analyze_transactions_in_dir(
+    bundle: PotentialAttack,
+    out_dir: Path,
+    verbose: bool,
+    locate_divergences: bool = False,
+    triage: bool = False,
+    timer: StageTimer | None = None,
+    extractor_costs: bool = False,
+):
+    bundle_reports = analyze_bundle_reports(
+        bundle, verbose, locate_divergences, triage, timer, extractor_costs
+    )
+    with timed(timer, "save"):
+        save_bundle_reports(bundle_reports, out_dir)
+
+
+def analyze_bundle_reports(
+    bundle: PotentialAttack,
+    verbose: bool,
+    locate_divergences: bool = False,
+    triage: bool = False,
+    timer: StageTimer | None = None,
+    extractor_costs: bool = False,
+) -> BundleReports:
+    triage_evaluation = None
+    if triage:
+        with timed(timer, "triage"):
+            triage_evaluation = triage_bundle(bundle)
+    if triage_evaluation and not triage_evaluation.escalate:
+        # the transactions are not analyzed, so only the triage is reported
+        with timed(timer, "report"):
+            return BundleReports(
+                bundle.id,
+                {f"{bundle.id}.json": evaluation_reports([triage_evaluation])},
+                [triage_evaluation.cli_report()],
+            )
+    evaluations_a, evaluations_b = compare_bundle_traces(
+        bundle, verbose, locate_divergences, timer, extractor_costs
+    )
+
+    with timed(timer, "evaluation"):
+        overall_properties_evaluation = OverallPropertiesEvaluation(
+            attackers=(bundle.tx_a.caller, bundle.tx_a.to),
+            victim=bundle.tx_b.caller,
+            securify_properties_evaluations=(evaluations_a[0], evaluations_b[0]),  # type: ignore
+            financial_gain_loss_evaluations=(evaluations_a[1], evaluations_b[1]),  # type: ignore
+        )
+    bundle_evaluations: list[Evaluation] = [overall_properties_evaluation]
+    if triage_evaluation:
+        bundle_evaluations.append(triage_evaluation)
+
+    with timed(timer, "report"):
+        # the bundle report is saved last, see merge_shards
+        reports = {
+            f"{bundle.id}_{bundle.tx_a.hash}.json": evaluation_reports(evaluations_a),
+            f"{bundle.id}_{bundle.tx_b.hash}.json": evaluation_reports(evaluations_b),
+            f"{bundle.id}.json": evaluation_reports(bundle_evaluations),
+        }
+        cli_output = [overall_properties_evaluation.cli_report()]
+
+    if verbose:
+        if triage_evaluation:
+            cli_output.append(triage_evaluation.cli_report())
+
+        cli_output.append(f"Tx A: {bundle.tx_b.hash}")
+        for evaluation in evaluations_a:
+            cli_output.append(evaluation.cli_report())
+
+        cli_output.append(f"Tx B: {bundle.tx_b.hash}")
+        for evaluation in evaluations_b:
+            cli_output.append(evaluation.cli_report())
+
+    return BundleReports(bundle.id, reports, cli_output)
+
+
+def save_bundle_reports(bundle_reports: BundleReports, out_dir: Path):
+    for filename, reports in bundle_reports.reports.items():
+        (out_dir / filename).write_text(json.dumps(reports, indent=2))
+    for output in bundle_reports.cli_output:
+        print(output)
 
 
-def analyze_transactions_in_dir(bundle: PotentialAttack, out_dir: Path, verbose: bool):
+def triage_bundle(bundle: PotentialAttack) -> TriageEvaluation:
+    """Screen the transactions of a bundle, keeping the screened events to parse them after escalating"""
+    results: dict[HexString, TriageResult] = {}
+    for tx in (bundle.tx_a, bundle.tx_b):
+        if tx.identical_traces:
+            results[tx.hash] = TriageResult(
+                escalate=False, reasons=["identical_traces"]
+            )
+            continue
+        triage = TransactionTriage(tx.events_normal, tx.events_reverse, tx.to)
+        results[tx.hash] = triage.run()
+        tx.events_normal = triage.events_normal
+        tx.events_reverse = triage.events_reverse
+    return TriageEvaluation(results)
+
+
+def compare_bundle_traces(
+    bundle: PotentialAttack,
+    verbose: bool,
+    locate_divergences: bool,
+    timer: StageTimer | None = None,
+    extractor_costs: bool = False,
+) -> tuple[list[Evaluation], list[Evaluation]]:
     evaluations_a = compare_traces(
         bundle.tx_a.hash,
         bundle.tx_a.caller,
@@ -99,6 +1309,10 @@ def analyze_transactions_in_dir(bundle: PotentialAttack, out_dir: Path, verbose:
         bundle.tx_a.value,
         (bundle.tx_a.events_normal, bundle.tx_a.events_reverse),
         verbose,
+        bundle.tx_a.identical_traces,
+        locate_divergences,
+        timer,
+        extractor_costs,
     )
     evaluations_b = compare_traces(
         bundle.tx_b.hash,
@@ -108,29 +1322,12 @@ def analyze_transactions_in_dir(bundle: PotentialAttack, out_dir: Path, verbose:
         bundle.tx_b.value,
         (bundle.tx_b.events_normal, bundle.tx_b.events_reverse),
         verbose,
+        bundle.tx_b.identical_traces,
+        locate_divergences,
+        timer,
+        extractor_costs,
     )
-
-    overall_properties_evaluation = OverallPropertiesEvaluation(
-        attackers=(bundle.tx_a.caller, bundle.tx_a.to),
-        victim=bundle.tx_b.caller,
-        securify_properties_evaluations=(evaluations_a[0], evaluations_b[0]),  # type: ignore
-        financial_gain_loss_evaluations=(evaluations_a[1], evaluations_b[1]),  # type: ignore
-    )
-
-    save_evaluations(evaluations_a, out_dir / f"{bundle.id}_{bundle.tx_a.hash}.json")
-    save_evaluations(evaluations_b, out_dir / f"{bundle.id}_{bundle.tx_b.hash}.json")
-    save_evaluations([overall_properties_evaluation], out_dir / f"{bundle.id}.json")
-
-    print(overall_properties_evaluation.cli_report())
-
-    if verbose:
-        print(f"Tx A: {bundle.tx_b.hash}")
-        for evaluation in evaluations_a:
-            print(evaluation.cli_report())
-
-        print(f"Tx B: {bundle.tx_b.hash}")
-        for evaluation in evaluations_b:
-            print(evaluation.cli_report())
+    return evaluations_a, evaluations_b
 
 
 def compare_traces(
@@ -141,6 +1338,10 @@ def compare_traces(
     value: HexString,
     traces: tuple[Iterable[TraceEvent], Iterable[TraceEvent]],
     verbose: bool,
+    identical: bool = False,
+    locate_divergences: bool = False,
+    timer: StageTimer | None = None,
+    extractor_costs: bool = False,
 ) -> list[Evaluation]:
     """
     I want this analysis of normal vs reverse to return:
@@ -150,6 +1351,17 @@ def compare_traces(
     - TOD Amount
     - TOD Receiver
     """
+    if identical:
+        return no_difference_evaluations(locate_divergences, extractor_costs)
+
+    divergence_evaluations: list[Evaluation] = []
+    if locate_divergences:
+        with timed(timer, "divergence"):
+            # the events are iterated twice, for locating the divergence and for parsing
+            traces = (list(traces[0]), list(traces[1]))
+            divergence = locate_divergence(traces[0], traces[1])
+            divergence_evaluations.append(DivergenceEvaluation(divergence))
+
     tod_source_analyzer = TODSourceFeatureExtractor()
     instruction_changes_analyzer = InstructionDifferencesFeatureExtractor()
     instruction_usage_analyzers = SingleToDoubleInstructionFeatureExtractor(
@@ -163,14 +1375,15 @@ def compare_traces(
         InstructionLocationsGrouperFeatureExtractor([CALL.opcode]),
     )
 
-    transaction_one = parse_transaction(
-        TransactionParsingInfo(sender, to, calldata, value),
-        traces[0],
-    )
-    transaction_two = parse_transaction(
-        TransactionParsingInfo(sender, to, calldata, value),
-        traces[1],
-    )
+    with timed(timer, "parse"):
+        transaction_one = parse_transaction(
+            TransactionParsingInfo(sender, to, calldata, value),
+            traces[0],
+        )
+        transaction_two = parse_transaction(
+            TransactionParsingInfo(sender, to, calldata, value),
+            traces[1],
+        )
 
     runner = FeatureExtractionRunner(
         RunInfo(
@@ -182,12 +1395,15 @@ def compare_traces(
                 calls_grouper,
             ],
             transactions=(transaction_one, transaction_two),
-        )
+        ),
+        instrumented=extractor_costs,
     )
-    runner.run()
+    with timed(timer, "features"):
+        runner.run()
 
-    build_information_flow_graph(transaction_one.instructions)
-    build_information_flow_graph(transaction_two.instructions)
+    with timed(timer, "information_flow"):
+        build_information_flow_graph(transaction_one.instructions)
+        build_information_flow_graph(transaction_two.instructions)
 
     # if verbose:
     #     call_tree_normal, call_tree_reverse = runner.get_call_trees()
@@ -261,35 +1477,61 @@ def compare_traces(
     #         print(f"{indent}> {context.code_address}.{signature}")
     #     print(f"{sink_indent}> {sink_instruction}")
 
+    with timed(timer, "evaluation"):
+        evaluations: list[Evaluation] = [
+            SecurifyPropertiesEvaluation(
+                calls_grouper.normal.instruction_groups,  # type: ignore
+                calls_grouper.reverse.instruction_groups,  # type: ignore
+            ),
+            FinancialGainLossEvaluation(
+                currency_changes_analyzer.normal.currency_changes,
+                currency_changes_analyzer.reverse.currency_changes,
+            ),
+            TODSourceEvaluation(tod_source_analyzer.get_tod_source()),
+            # InstructionDifferencesEvaluation(
+            #     occurrence_changes=instruction_changes_analyzer.get_instructions_only_executed_by_one_trace(),
+            #     input_changes=instruction_changes_analyzer.get_instructions_with_different_inputs(),
+            # ),
+            # InstructionUsageEvaluation(
+            #     instruction_usage_analyzers.normal.get_used_opcodes_per_contract(),
+            #     instruction_usage_analyzers.reverse.get_used_opcodes_per_contract(),
+            #     filter_opcodes=[CALL.opcode, STATICCALL.opcode],
+            # ),
+            *divergence_evaluations,
+        ]
+        if extractor_costs:
+            evaluations.append(ExtractorCostsEvaluation(runner.get_extractor_costs()))
+
+    return evaluations
+
+
+def no_difference_evaluations(
+    locate_divergences: bool = False, extractor_costs: bool = False
+) -> list[Evaluation]:
+    """The evaluations of compare_traces for a normal and reverse trace that do not differ"""
     evaluations: list[Evaluation] = [
-        SecurifyPropertiesEvaluation(
-            calls_grouper.normal.instruction_groups,  # type: ignore
-            calls_grouper.reverse.instruction_groups,  # type: ignore
-        ),
-        FinancialGainLossEvaluation(
-            currency_changes_analyzer.normal.currency_changes,
-            currency_changes_analyzer.reverse.currency_changes,
-        ),
-        TODSourceEvaluation(tod_source_analyzer.get_tod_source()),
-        # InstructionDifferencesEvaluation(
-        #     occurrence_changes=instruction_changes_analyzer.get_instructions_only_executed_by_one_trace(),
-        #     input_changes=instruction_changes_analyzer.get_instructions_with_different_inputs(),
-        # ),
-        # InstructionUsageEvaluation(
-        #     instruction_usage_analyzers.normal.get_used_opcodes_per_contract(),
-        #     instruction_usage_analyzers.reverse.get_used_opcodes_per_contract(),
-        #     filter_opcodes=[CALL.opcode, STATICCALL.opcode],
-        # ),
+        SecurifyPropertiesEvaluation({}, {}),
+        FinancialGainLossEvaluation([], []),
+        TODSourceEvaluation(TODSourceFeatureExtractor().get_tod_source()),
     ]
-
+    if locate_divergences:
+        evaluations.append(DivergenceEvaluation(Divergence(identical=True)))
+    if extractor_costs:
+        # no feature extractor ran
+        evaluations.append(ExtractorCostsEvaluation([]))
     return evaluations
 
 
 def save_evaluations(evaluations: list[Evaluation], path: Path):
+    path.write_text(json.dumps(evaluation_reports(evaluations), indent=2))
+
+
+def evaluation_reports(evaluations: list[Evaluation]) -> dict:
     reports = {}
 
     for evaluation in evaluations:
-        dict_report = evaluation.dict_report()
+        with span("dict_report", evaluation=type(evaluation).__name__):
+            dict_report = evaluation.dict_report()
         reports[dict_report["evaluation_type"]] = dict_report["report"]
 
-    path.write_text(json.dumps(reports, indent=2))
+    return reports
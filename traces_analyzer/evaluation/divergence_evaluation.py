@@ -0,0 +1,40 @@
+from dataclasses import asdict
+from typing_extensions import override
+
+from traces_analyzer.evaluation.evaluation import Evaluation
+from traces_analyzer.features.divergence_locator import Divergence
+
+
+class DivergenceEvaluation(Evaluation):
+    @property
+    @override
+    def _type_key(self):
+        return "divergence"
+
+    @property
+    @override
+    def _type_name(self):
+        return "Divergence"
+
+    def __init__(self, divergence: Divergence):
+        super().__init__()
+        self._divergence = divergence
+
+    @override
+    def _dict_report(self) -> dict:
+        report = asdict(self._divergence)
+        report["regions"] = [list(region) for region in self._divergence.regions]
+        return report
+
+    @override
+    def _cli_report(self) -> str:
+        d = self._divergence
+        if d.identical:
+            return "No divergence, the traces are identical."
+        if d.first_divergence is None:
+            return f"No divergence in {d.steps_normal} steps."
+        return (
+            f"First divergence at step {d.first_divergence} (depth {d.first_divergence_depth})\n"
+            f"Divergent steps: {d.divergent_steps} in {len(d.regions)} regions\n"
+            f"Steps: {d.steps_normal} normal, {d.steps_reverse} reverse"
+        )
@@ -0,0 +1,37 @@
+from typing_extensions import override
+
+from traces_analyzer.evaluation.evaluation import Evaluation
+from traces_analyzer.features.feature_extraction_runner import ExtractorCost
+
+
+class ExtractorCostsEvaluation(Evaluation):
+    @property
+    @override
+    def _type_key(self):
+        return "extractor_costs"
+
+    @property
+    @override
+    def _type_name(self):
+        return "Feature extractor costs"
+
+    def __init__(self, costs: list[ExtractorCost]):
+        super().__init__()
+        self._costs = costs
+
+    @override
+    def _dict_report(self) -> dict:
+        return {"extractors": [cost.report() for cost in self._costs]}
+
+    @override
+    def _cli_report(self) -> str:
+        lines = []
+        for cost in self._costs:
+            lines.append(_format_cost(cost))
+            lines.extend("  " + _format_cost(inner) for inner in cost.inner)
+        return "\n".join(lines)
+
+
+def _format_cost(cost: ExtractorCost) -> str:
+    per_call = cost.seconds / cost.calls if cost.calls else 0
+    return f"{cost.extractor}: {cost.seconds:.4f} s, {cost.calls} calls, {per_call * 1e6:.2f} us/call"
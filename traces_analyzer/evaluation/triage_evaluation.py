@@ -0,0 +1,47 @@
+from typing_extensions import override
+
+from traces_analyzer.evaluation.evaluation import Evaluation
+from traces_analyzer.features.triage import TriageResult
+from traces_parser.datatypes import HexString
+
+
+class TriageEvaluation(Evaluation):
+    @property
+    @override
+    def _type_key(self):
+        return "triage"
+
+    @property
+    @override
+    def _type_name(self):
+        return "Triage"
+
+    def __init__(self, results: dict[HexString, TriageResult]):
+        super().__init__()
+        self._results = results
+
+    @property
+    def escalate(self) -> bool:
+        """If any transaction needs the full analysis"""
+        return any(result.escalate for result in self._results.values())
+
+    @property
+    def tier(self) -> str:
+        return "full_analysis" if self.escalate else "screening"
+
+    @override
+    def _dict_report(self) -> dict:
+        return {
+            "tier": self.tier,
+            "transactions": {
+                hash: {"escalate": result.escalate, "reasons": result.reasons}
+                for hash, result in self._results.items()
+            },
+        }
+
+    @override
+    def _cli_report(self) -> str:
+        s = f"Decided by: {self.tier}\n"
+        for hash, result in self._results.items():
+            s += f"> {hash}: {', '.join(result.reasons) or 'no CALL or LOG differences'}\n"
+        return s
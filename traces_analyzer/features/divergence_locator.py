@@ -0,0 +1,76 @@
+from dataclasses import dataclass, field
+from itertools import zip_longest
+from typing import Hashable, Iterable
+
+from traces_parser.parser.events_parser import TraceEvent
+
+StepKey = tuple[int, int, int, Hashable]
+
+
+@dataclass
+class Divergence:
+    """Where two traces execute different steps, compared by their step index"""
+
+    steps_normal: int = 0
+    steps_reverse: int = 0
+    first_divergence: int | None = None
+    # the smaller call depth of both steps at the first divergence
+    first_divergence_depth: int | None = None
+    divergent_steps: int = 0
+    # half-open ranges of step indexes, only the first max_regions are kept
+    regions: list[tuple[int, int]] = field(default_factory=list)
+    regions_truncated: bool = False
+    # the traces were byte-identical, so they were not compared step by step
+    identical: bool = False
+
+
+def step_key(event: TraceEvent) -> StepKey:
+    stack_top = event.stack[-1] if event.stack else None
+    return event.op, event.pc, event.depth, stack_top
+
+
+def locate_divergence(
+    events_normal: Iterable[TraceEvent],
+    events_reverse: Iterable[TraceEvent],
+    max_regions: int = 1000,
+) -> Divergence:
+    """Compare two event streams step by step on (op, pc, depth, stack top)
+
+    The steps are paired by their index, as the FeatureExtractionRunner does.
+    """
+    divergence = Divergence()
+    region_start: int | None = None
+    step = -1
+    for step, (normal, reverse) in enumerate(
+        zip_longest(events_normal, events_reverse)
+    ):
+        if normal is not None:
+            divergence.steps_normal += 1
+        if reverse is not None:
+            divergence.steps_reverse += 1
+
+        if normal is not None and reverse is not None:
+            if step_key(normal) == step_key(reverse):
+                if region_start is not None:
+                    _add_region(divergence, region_start, step, max_regions)
+                    region_start = None
+                continue
+
+        divergence.divergent_steps += 1
+        if region_start is None:
+            region_start = step
+        if divergence.first_divergence is None:
+            divergence.first_divergence = step
+            depths = [e.depth for e in (normal, reverse) if e is not None]
+            divergence.first_divergence_depth = min(depths)
+
+    if region_start is not None:
+        _add_region(divergence, region_start, step + 1, max_regions)
+    return divergence
+
+
+def _add_region(divergence: Divergence, start: int, end: int, max_regions: int):
+    if len(divergence.regions) < max_regions:
+        divergence.regions.append((start, end))
+    else:
+        divergence.regions_truncated = True
@@ -1,7 +1,12 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from itertools import zip_longest
+from time import perf_counter
+from typing import Callable
 
-from traces_analyzer.features.feature_extractor import DoubleInstructionFeatureExtractor
+from traces_analyzer.features.feature_extractor import (
+    DoubleInstructionFeatureExtractor,
+    SingleToDoubleInstructionFeatureExtractor,
+)
 from traces_parser.parser.environment.call_context_manager import CallTree
 from traces_parser.parser.instructions.instruction import Instruction
 from traces_parser.parser.instructions_parser import ParsedTransaction
@@ -13,13 +18,64 @@ class RunInfo:
     transactions: tuple[ParsedTransaction, ParsedTransaction]
 
 
+@dataclass
+class OpcodeCost:
+    calls: int = 0
+    seconds: float = 0
+
+
+@dataclass
+class ExtractorCost:
+    """Time spent in the hooks of a feature extractor, in total and per opcode"""
+
+    extractor: str
+    calls: int = 0
+    seconds: float = 0
+    opcodes: dict[str, OpcodeCost] = field(default_factory=dict)
+    # the inner extractors of a SingleToDoubleInstructionFeatureExtractor
+    inner: list["ExtractorCost"] = field(default_factory=list)
+
+    def record(self, instruction: Instruction, seconds: float):
+        self.calls += 1
+        self.seconds += seconds
+        opcode = self.opcodes.get(instruction.name)
+        if opcode is None:
+            opcode = self.opcodes[instruction.name] = OpcodeCost()
+        opcode.calls += 1
+        opcode.seconds += seconds
+
+    def report(self) -> dict:
+        report = {
+            "extractor": self.extractor,
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "seconds_per_call": self.seconds / self.calls if self.calls else 0,
+            "opcodes": {
+                name: {"calls": cost.calls, "seconds": cost.seconds}
+                for name, cost in sorted(
+                    self.opcodes.items(), key=lambda item: -item[1].seconds
+                )
+            },
+        }
+        if self.inner:
+            report["inner"] = [cost.report() for cost in self.inner]
+        return report
+
+
 class FeatureExtractionRunner:
-    def __init__(self, run_info: RunInfo) -> None:
+    def __init__(self, run_info: RunInfo, instrumented: bool = False) -> None:
+        """With `instrumented`, the cost of each feature extractor is measured, see get_extractor_costs"""
         self.feature_extractors = run_info.feature_extractors
         self.transaction_one = run_info.transactions[0]
         self.transaction_two = run_info.transactions[1]
+        self.instrumented = instrumented
+        self._extractor_costs: list[ExtractorCost] = []
 
     def run(self):
+        if self.instrumented:
+            self._run_instrumented()
+            return
+
         for instruction_one, instruction_two in zip_longest(
             self.transaction_one.instructions,
             self.transaction_two.instructions,
@@ -34,6 +90,66 @@ class FeatureExtractionRunner:
     def get_call_trees(self) -> tuple[CallTree, CallTree]:
         return self.transaction_one.call_tree, self.transaction_two.call_tree
 
+    def get_extractor_costs(self) -> list[ExtractorCost]:
+        """The costs of the feature extractors, measured by an instrumented run"""
+        return self._extractor_costs
+
     def _process_step(self, instructions: tuple[Instruction, Instruction]):
         for feature_extractor in self.feature_extractors:
             feature_extractor.on_instructions(instructions[0], instructions[1])
+
+    def _run_instrumented(self):
+        hooks = [_instrumented_hook(e) for e in self.feature_extractors]
+        self._extractor_costs = [cost for _, cost in hooks]
+
+        for instruction_one, instruction_two in zip_longest(
+            self.transaction_one.instructions,
+            self.transaction_two.instructions,
+        ):
+            for hook, _ in hooks:
+                hook(instruction_one, instruction_two)
+
+
+InstructionsHook = Callable[[Instruction | None, Instruction | None], None]
+
+
+def _instrumented_hook(
+    feature_extractor: DoubleInstructionFeatureExtractor,
+) -> tuple[InstructionsHook, ExtractorCost]:
+    cost = ExtractorCost(type(feature_extractor).__name__)
+
+    if (
+        isinstance(feature_extractor, SingleToDoubleInstructionFeatureExtractor)
+        and type(feature_extractor).on_instructions
+        is SingleToDoubleInstructionFeatureExtractor.on_instructions
+    ):
+        # time the inner extractors separately, as SingleToDouble would call them
+        normal = ExtractorCost(f"{type(feature_extractor.normal).__name__} (normal)")
+        reverse = ExtractorCost(f"{type(feature_extractor.reverse).__name__} (reverse)")
+        cost.inner = [normal, reverse]
+        normal_hook = feature_extractor.normal.on_instruction
+        reverse_hook = feature_extractor.reverse.on_instruction
+
+        def hook_single_to_double(
+            instruction_one: Instruction | None, instruction_two: Instruction | None
+        ):
+            start = perf_counter()
+            if instruction_one:
+                normal_hook(instruction_one)
+                normal.record(instruction_one, perf_counter() - start)
+            middle = perf_counter()
+            if instruction_two:
+                reverse_hook(instruction_two)
+                reverse.record(instruction_two, perf_counter() - middle)
+            cost.record(instruction_one or instruction_two, perf_counter() - start)  # type: ignore
+
+        return hook_single_to_double, cost
+
+    on_instructions = feature_extractor.on_instructions
+
+    def hook(instruction_one: Instruction | None, instruction_two: Instruction | None):
+        start = perf_counter()
+        on_instructions(instruction_one, instruction_two)
+        cost.record(instruction_one or instruction_two, perf_counter() - start)  # type: ignore
+
+    return hook, cost
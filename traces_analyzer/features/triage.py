@@ -0,0 +1,236 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import chain, zip_longest
+from typing import Hashable, Iterable
+
+from traces_parser.datatypes import HexString
+from traces_parser.parser.events_parser import TraceEvent
+from traces_parser.parser.instructions.instructions import (
+    CALL,
+    CALLCODE,
+    CREATE,
+    CREATE2,
+    DELEGATECALL,
+    LOG0,
+    LOG1,
+    LOG2,
+    LOG3,
+    LOG4,
+    RETURN,
+    SELFDESTRUCT,
+    STATICCALL,
+    STOP,
+)
+
+Location = tuple[Hashable, int]
+
+_LOG_TOPICS = {
+    LOG0.opcode: 0,
+    LOG1.opcode: 1,
+    LOG2.opcode: 2,
+    LOG3.opcode: 3,
+    LOG4.opcode: 4,
+}
+# the instructions that end a call without reverting it
+_HALTS = {STOP.opcode, RETURN.opcode, SELFDESTRUCT.opcode}
+
+
+@dataclass
+class ScreeningSignals:
+    """Cheap signals of a trace, grouped by the (storage address, pc) of the instruction"""
+
+    # (receiver, value) of each CALL and CALLCODE
+    calls: dict[Location, list[tuple]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    # (topics, data) of each LOG, data is None if the trace has no memory
+    logs: dict[Location, list[tuple]] = field(default_factory=lambda: defaultdict(list))
+    # if the call of each CALL, CALLCODE and LOG above was reverted, in the same order
+    reverted: dict[Location, list[bool]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+
+
+@dataclass
+class TriageResult:
+    escalate: bool
+    reasons: list[str]
+
+
+class EventScreener:
+    """Collect the CALLs and LOGs of a trace event by event, without parsing it
+
+    The storage addresses are tracked through the call depth. Addresses of contracts
+    created in the trace are not known and are represented by their creation site.
+    A call is reverted if its last instruction is not a STOP, RETURN or SELFDESTRUCT,
+    eg a REVERT or an exceptional halt, or if its caller is reverted.
+    """
+
+    def __init__(self, to: HexString) -> None:
+        self.signals = ScreeningSignals()
+        self._storage_addresses: list[Hashable] = [to.with_prefix()]
+        # the CALLs and LOGs in each open call, with their index in signals.reverted
+        self._screened: list[list[tuple[Location, int]]] = [[]]
+        self._entered: Hashable = None
+        self._previous_op: int | None = None
+
+    def screen(self, event: TraceEvent) -> tuple[str, Location] | None:
+        """Screen the next event, returning the kind and location of a CALL or LOG signal"""
+        if event.depth > len(self._storage_addresses):
+            self._storage_addresses.append(self._entered)
+            self._screened.append([])
+        while len(self._screened) > max(event.depth, 1):
+            self._end_call()
+        del self._storage_addresses[max(event.depth, 1) :]
+        address = self._storage_addresses[-1]
+        op, stack = event.op, event.stack
+        self._previous_op = op
+
+        screened = None
+        if op in (CALL.opcode, CALLCODE.opcode):
+            screened = self._add("calls", (address, event.pc), (stack[-2], stack[-3]))
+        if op in (CALL.opcode, STATICCALL.opcode):
+            self._entered = _normalize_address(stack[-2])
+        elif op in (CALLCODE.opcode, DELEGATECALL.opcode):
+            self._entered = address
+        elif op in (CREATE.opcode, CREATE2.opcode):
+            self._entered = ("created", address, event.pc)
+        elif op in _LOG_TOPICS:
+            topics = tuple(stack[-3 : -3 - _LOG_TOPICS[op] : -1])
+            data = _read_memory(event, stack[-1], stack[-2])
+            screened = self._add("logs", (address, event.pc), (topics, data))
+        return screened
+
+    def finish(self) -> ScreeningSignals:
+        """End the open calls and return the signals of the trace"""
+        while self._screened:
+            self._end_call()
+        return self.signals
+
+    def _add(
+        self, kind: str, location: Location, signal: tuple
+    ) -> tuple[str, Location]:
+        getattr(self.signals, kind)[location].append(signal)
+        reverted = self.signals.reverted[location]
+        self._screened[-1].append((location, len(reverted)))
+        reverted.append(False)
+        return kind, location
+
+    def _end_call(self):
+        """Mark the signals of the innermost call as reverted if it did not halt, and pass them to its caller"""
+        call = self._screened.pop()
+        if self._previous_op not in _HALTS:
+            for location, index in call:
+                self.signals.reverted[location][index] = True
+        if self._screened:
+            # a revert of the caller also reverts this call
+            self._screened[-1].extend(call)
+        # calls that return to a caller deeper than this one were halted exceptionally
+        self._previous_op = None
+
+
+def screen_events(events: Iterable[TraceEvent], to: HexString) -> ScreeningSignals:
+    """Collect the CALLs and LOGs of a trace without parsing it, see EventScreener"""
+    screener = EventScreener(to)
+    for event in events:
+        screener.screen(event)
+    return screener.finish()
+
+
+class TransactionTriage:
+    """Screen the normal and reverse trace of a transaction in lockstep
+
+    The screening stops at the first CALL or LOG that differs between the traces. The
+    screened events are kept until then, so that the traces can still be parsed after
+    escalating: events_normal and events_reverse yield the kept events followed by the
+    events that were not screened.
+    """
+
+    def __init__(
+        self,
+        events_normal: Iterable[TraceEvent],
+        events_reverse: Iterable[TraceEvent],
+        to: HexString,
+    ) -> None:
+        self._events = (iter(events_normal), iter(events_reverse))
+        self._kept: tuple[list[TraceEvent], list[TraceEvent]] = ([], [])
+        self._to = to
+
+    @property
+    def events_normal(self) -> Iterable[TraceEvent]:
+        return chain(self._kept[0], self._events[0])
+
+    @property
+    def events_reverse(self) -> Iterable[TraceEvent]:
+        return chain(self._kept[1], self._events[1])
+
+    def run(self, keep_events: bool = True) -> TriageResult:
+        """Decide if the CALLs, LOGs or their reverts differ, and a full analysis is needed"""
+        screeners = (EventScreener(self._to), EventScreener(self._to))
+        for pair in zip_longest(*self._events, fillvalue=_END):
+            for side, event in enumerate(pair):
+                if event is _END:
+                    continue
+                if keep_events:
+                    self._kept[side].append(event)
+                screened = screeners[side].screen(event)
+                if screened and _differs(screeners, side, *screened):
+                    return TriageResult(
+                        escalate=True, reasons=[_DIFFERENCE_REASONS[screened[0]]]
+                    )
+        return _compare(screeners[0].finish(), screeners[1].finish())
+
+
+def triage_transaction(
+    events_normal: Iterable[TraceEvent],
+    events_reverse: Iterable[TraceEvent],
+    to: HexString,
+) -> TriageResult:
+    """Decide if the CALLs, LOGs or their reverts differ in the two traces, and a full analysis is needed"""
+    return TransactionTriage(events_normal, events_reverse, to).run(keep_events=False)
+
+
+_END = object()
+_DIFFERENCE_REASONS = {"calls": "call_differences", "logs": "log_differences"}
+
+
+def _differs(
+    screeners: tuple[EventScreener, EventScreener],
+    side: int,
+    kind: str,
+    location: Location,
+) -> bool:
+    """Check if the last signal at location differs from the signal at the same index in the other trace"""
+    signals = getattr(screeners[side].signals, kind)[location]
+    other = getattr(screeners[1 - side].signals, kind).get(location, ())
+    index = len(signals) - 1
+    return index < len(other) and signals[index] != other[index]
+
+
+def _compare(normal: ScreeningSignals, reverse: ScreeningSignals) -> TriageResult:
+    reasons = []
+    if normal.calls != reverse.calls:
+        reasons.append("call_differences")
+    if normal.logs != reverse.logs:
+        reasons.append("log_differences")
+    elif _has_unknown_log_data(normal) or _has_unknown_log_data(reverse):
+        reasons.append("log_data_unavailable")
+    if not reasons and normal.reverted != reverse.reverted:
+        reasons.append("revert_differences")
+    return TriageResult(escalate=bool(reasons), reasons=reasons)
+
+
+def _normalize_address(value: HexString) -> str:
+    return HexString(value).as_address().with_prefix()
+
+
+def _read_memory(event: TraceEvent, offset: HexString, size: HexString) -> str | None:
+    if event.memory is None:
+        return None
+    memory = HexString(event.memory).with_prefix()[2:]
+    start = 2 * HexString(offset).as_int()
+    return memory[start : start + 2 * HexString(size).as_int()]
+
+
+def _has_unknown_log_data(signals: ScreeningSignals) -> bool:
+    return any(data is None for logs in signals.logs.values() for _, data in logs)
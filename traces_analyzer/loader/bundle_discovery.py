@@ -0,0 +1,72 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+from pathlib import Path
+from typing import Generator, Iterable, Iterator, TextIO
+
+METADATA_FILENAME = "metadata.json"
+# the directories whose metadata.json is checked by one task of the thread pool
+CHECK_BATCH_SIZE = 64
+
+
+def discover_bundle_dirs(
+    roots: Iterable[Path], workers: int = 8
+) -> Generator[Path, None, None]:
+    """Recursively find the bundle directories (those with a metadata.json) below the roots
+
+    The directories are listed one entry at a time, while a pool of threads checks
+    which subdirectories are bundles, eg to overlap the latency of a network filesystem.
+    At most 2 * workers batches of subdirectories are checked at once, and the bundles
+    are yielded as soon as their batch is checked, in the order of the listing.
+    Bundle directories are not descended into.
+    """
+    # subdirectories that are not bundles, to be listed after the current directory
+    to_list: deque[str] = deque()
+    checking: deque[tuple[list[str], Future[list[bool]]]] = deque()
+    with ThreadPoolExecutor(workers, thread_name_prefix="bundle-discovery") as executor:
+
+        def check(dirs: list[str]):
+            checking.append((dirs, executor.submit(_are_bundles, dirs)))
+
+        def take_checked() -> Iterator[Path]:
+            dirs, are_bundles = checking.popleft()
+            for dir, is_bundle in zip(dirs, are_bundles.result()):
+                if is_bundle:
+                    yield Path(dir)
+                else:
+                    to_list.append(dir)
+
+        try:
+            check([os.fspath(root) for root in roots])
+            while checking or to_list:
+                if not to_list:
+                    yield from take_checked()
+                    continue
+                batch: list[str] = []
+                with os.scandir(to_list.popleft()) as entries:
+                    for entry in entries:
+                        if not entry.is_dir():
+                            continue
+                        batch.append(entry.path)
+                        if len(batch) == CHECK_BATCH_SIZE:
+                            check(batch)
+                            batch = []
+                            if len(checking) >= 2 * workers:
+                                yield from take_checked()
+                if batch:
+                    check(batch)
+        finally:
+            for _, future in checking:
+                future.cancel()
+
+
+def _are_bundles(dirs: list[str]) -> list[bool]:
+    return [os.path.isfile(os.path.join(dir, METADATA_FILENAME)) for dir in dirs]
+
+
+def read_bundle_paths(lines: TextIO) -> Generator[Path, None, None]:
+    """Read newline separated bundle paths, skipping empty lines"""
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield Path(line)
@@ -1,34 +1,60 @@
-from io import TextIOWrapper
-import json
+import gzip
 from pathlib import Path
+from typing import IO, Iterable
 from typing_extensions import override
 
 from traces_analyzer.loader.event_parser import EventsParser
+from traces_analyzer.loader.fingerprint import traces_identical
+from traces_analyzer.loader.json_backend import JsonBackend, get_json_backend
 from traces_analyzer.loader.loader import PotentialAttack, TraceLoader, TraceBundle
+from traces_analyzer.loader.step_index import StepIndex
+from traces_analyzer.utils.tracing import span
 
 from traces_parser.datatypes import HexString
+from traces_parser.parser.events_parser import TraceEvent
+
+# a bundle directory, or a bundle directory with its metadata if it was read already
+BundleDir = Path | tuple[Path, dict]
+
+
+def split_bundle_dir(bundle: BundleDir) -> tuple[Path, dict | None]:
+    """The directory of a bundle and its metadata, None if it was not read yet"""
+    return bundle if isinstance(bundle, tuple) else (bundle, None)
 
 
 class DirectoryLoader(TraceLoader):
     METADATA_FILENAME = "metadata.json"
+    TRACE_FILE_EXTENSIONS = ["json", "jsonl", "json.gz", "jsonl.gz"]
 
-    def __init__(self, dir: Path, file_parser: EventsParser) -> None:
+    def __init__(
+        self,
+        dir: Path,
+        file_parser: EventsParser,
+        json_backend: JsonBackend | None = None,
+        step_index: bool = False,
+        detect_identical: bool = False,
+        metadata: dict | None = None,
+    ) -> None:
         super().__init__()
         self._dir = dir
-        self._files: list[TextIOWrapper] = []
+        # the metadata if it was read before, eg to select the bundles of a shard
+        self._metadata = metadata
+        self._files: list[IO[str]] = []
         self._file_parser = file_parser
+        self._json = json_backend or get_json_backend()
+        self._step_index = step_index
+        self._detect_identical = detect_identical
 
     @override
     def __enter__(self):
-        with open(self._dir / self.METADATA_FILENAME) as metadata_file:
-            metadata = json.load(metadata_file)
+        metadata = self.read_metadata()
 
-            id = metadata["id"]
-            tx_a_hash: str = metadata["transactions_order"][0]
-            tx_b_hash: str = metadata["transactions_order"][1]
-            tx_a: dict[str, str] = metadata["transactions"][tx_a_hash]
-            tx_b: dict[str, str] = metadata["transactions"][tx_b_hash]
-            return self._load(id, tx_a, tx_b)
+        id = metadata["id"]
+        tx_a_hash: str = metadata["transactions_order"][0]
+        tx_b_hash: str = metadata["transactions_order"][1]
+        tx_a: dict[str, str] = metadata["transactions"][tx_a_hash]
+        tx_b: dict[str, str] = metadata["transactions"][tx_b_hash]
+        return self._load(id, tx_a, tx_b)
 
     @override
     def __exit__(self, exc_type, exc_value, traceback):
@@ -36,12 +62,59 @@ class DirectoryLoader(TraceLoader):
             if not file.closed:
                 file.close()
 
+    def reopen(self) -> "DirectoryLoader":
+        """A loader that reads the bundle from its directory again, eg to analyze it a second time"""
+        return DirectoryLoader(
+            self._dir,
+            self._file_parser,
+            self._json,
+            self._step_index,
+            self._detect_identical,
+            self._metadata,
+        )
+
+    def read_metadata(self) -> dict:
+        if self._metadata is not None:
+            return self._metadata
+        with span("read_metadata"):
+            with open(self._dir / self.METADATA_FILENAME, "rb") as metadata_file:
+                return self._json.loads(metadata_file.read())
+
+    def find_trace_paths(self, hash: HexString) -> tuple[Path, Path]:
+        """Find the paths of the normal and reverse trace of a transaction"""
+        path_normal = None
+        path_reverse = None
+        for ext in self.TRACE_FILE_EXTENSIONS:
+            path_normal = self._dir / "actual" / f"{hash.with_prefix()}.{ext}"
+            path_reverse = self._dir / "reverse" / f"{hash.with_prefix()}.{ext}"
+            if path_normal.exists() and path_reverse.exists():
+                break
+        return path_normal, path_reverse  # type: ignore
+
+    def load_step_index(self, hash: HexString, reverse: bool = False) -> StepIndex:
+        """Load or build the step index of a trace, to decode windows of its steps"""
+        path = self.find_trace_paths(hash)[1 if reverse else 0]
+        if path.suffix == ".gz":
+            raise ValueError(f"Can not index compressed trace {path}")
+        return StepIndex.ensure(path)
+
+    def _load_events(self, path: Path) -> Iterable[TraceEvent]:
+        lines = self._lazy_load_file(path)
+        if self._step_index and path.suffix != ".gz" and StepIndex.load(path) is None:
+            # index the trace while it is parsed
+            lines = StepIndex.indexing(path, lines)
+        return self._file_parser.parse(lines)
+
     def _lazy_load_file(self, path: Path):
-        file = open(path)
+        # the line endings are kept, so the lengths of the lines match the file
+        file = gzip.open(path, "rt") if path.suffix == ".gz" else open(path, newline="")
         self._files.append(file)
         for line in file:
             yield line
 
+    def _traces_identical(self, path_normal: Path, path_reverse: Path) -> bool:
+        return traces_identical(path_normal, path_reverse)
+
     def _load(
         self, id: str, tx_a: dict[str, str], tx_b: dict[str, str]
     ) -> PotentialAttack:
@@ -53,18 +126,14 @@ class DirectoryLoader(TraceLoader):
 
     def _load_transaction_bundle(self, tx: dict[str, str]) -> TraceBundle:
         hash = HexString(tx["hash"])
-
-        file_extensions = ["json", "jsonl"]
-        path_normal = None
-        path_reverse = None
-        for ext in file_extensions:
-            path_normal = self._dir / "actual" / f"{hash.with_prefix()}.{ext}"
-            path_reverse = self._dir / "reverse" / f"{hash.with_prefix()}.{ext}"
-            if path_normal.exists() and path_reverse.exists():
-                break
-
-        traces_normal_file = self._lazy_load_file(path_normal)  # type: ignore
-        traces_reverse_file = self._lazy_load_file(path_reverse)  # type: ignore
+        path_normal, path_reverse = self.find_trace_paths(hash)
+        identical = False
+        if self._detect_identical:
+            with span("fingerprint", tx=hash.with_prefix()):
+                identical = self._traces_identical(path_normal, path_reverse)
+        events_normal = self._load_events(path_normal)
+        # identical traces are only parsed once
+        events_reverse = events_normal if identical else self._load_events(path_reverse)
 
         return TraceBundle(
             hash=hash,
@@ -72,6 +141,7 @@ class DirectoryLoader(TraceLoader):
             to=HexString(tx["to"]),
             calldata=HexString(tx["input"]),
             value=HexString(tx["value"]),
-            events_normal=self._file_parser.parse(traces_normal_file),
-            events_reverse=self._file_parser.parse(traces_reverse_file),
+            events_normal=events_normal,
+            events_reverse=events_reverse,
+            identical_traces=identical,
         )
@@ -1,8 +1,17 @@
 from abc import ABC, abstractmethod
-import json
-from typing import Generic, Iterable, TypeVar
+from dataclasses import fields
+from itertools import tee
+from typing import Generic, Iterable, Iterator, TypeVar
 from typing_extensions import override
 
+from traces_analyzer.loader.json_backend import JsonBackend, get_json_backend
+from traces_analyzer.loader.struct_logs import (
+    LazyStructLog,
+    ObjectHook,
+    StructLogDeduplicator,
+    iter_lazy_struct_logs,
+    project_struct_log_fields,
+)
 from traces_parser.parser.events_parser import (
     TraceEvent,
     parse_events_eip3155,
@@ -11,12 +20,22 @@ from traces_parser.parser.events_parser import (
 
 T = TypeVar("T")
 
+# decoded structLogs measured 1.8 to 2.6 times the size of their JSON text
+DECODED_BYTES_PER_TEXT_BYTE = 3
+
 
 class EventsParser(ABC, Generic[T]):
     @abstractmethod
     def parse(self, lines: T) -> Iterable[TraceEvent]:
         pass
 
+    def parsed_size(self, text_size: int) -> int:
+        """The bytes that the result of parse holds before its events are consumed, for a trace of text_size bytes
+
+        By default the events are decoded lazily from the lines, which hold the text.
+        """
+        return text_size
+
 
 class EIP3155EventsParser(EventsParser):
     """Parse a EIP-3155 traces where each step is passed as a separate JSON string"""
@@ -29,10 +48,101 @@ class EIP3155EventsParser(EventsParser):
 class VmTraceEventsParser(EventsParser):
     """Parse a vm trace, where the whole iterable is a single JSON string"""
 
+    def __init__(
+        self,
+        project_fields: bool = True,
+        share_unchanged_values: bool = True,
+        lazy_memory: bool = False,
+        json_backend: JsonBackend | None = None,
+    ) -> None:
+        super().__init__()
+        self._json = json_backend or get_json_backend()
+        self._project_fields = project_fields
+        self._share_unchanged_values = share_unchanged_values
+        self._lazy_memory = lazy_memory
+
     @override
     def parse(self, lines: Iterable[str]) -> Iterable[TraceEvent]:
         json_str = "".join(lines)
-        return parse_events_struct_logs(json.loads(json_str)["structLogs"])
+        if self._lazy_memory:
+            # steps are decoded one by one and their memory only when it is accessed
+            return parse_lazy_memory_events(iter_lazy_struct_logs(json_str))
+        object_hook = self._create_object_hook()
+        if object_hook:
+            vm_trace = self._json.loads_vm_trace(json_str, object_hook)
+        else:
+            vm_trace = self._json.loads(json_str)
+        return parse_events_struct_logs(vm_trace["structLogs"])
+
+    @override
+    def parsed_size(self, text_size: int) -> int:
+        if self._lazy_memory:
+            # the steps are decoded while the events are consumed
+            return text_size
+        return text_size * DECODED_BYTES_PER_TEXT_BYTE
+
+    def _create_object_hook(self) -> ObjectHook | None:
+        if self._share_unchanged_values:
+            return StructLogDeduplicator(self._project_fields)
+        if self._project_fields:
+            return project_struct_log_fields
+        return None
+
+
+class LazyMemoryTraceEvent(TraceEvent):
+    """A TraceEvent that only decodes the memory of its step when it is accessed
+
+    It equals a TraceEvent with the same fields, which decodes the memory to compare it.
+    """
+
+    def __init__(self, event: TraceEvent, step: LazyStructLog) -> None:
+        # the dataclass __init__ would set the memory, so the other fields are copied
+        for name in _EAGER_EVENT_FIELDS:
+            setattr(self, name, getattr(event, name))
+        self._step: LazyStructLog | None = step
+        self._memory = None
+
+    def __eq__(self, other: object) -> bool:
+        # the dataclass __eq__ only compares events of the exact same class
+        if not isinstance(other, TraceEvent):
+            return NotImplemented
+        return all(
+            getattr(self, field.name) == getattr(other, field.name)
+            for field in fields(TraceEvent)
+        )
+
+    # hashable exactly if TraceEvent is, defining __eq__ would remove the hash
+    __hash__ = TraceEvent.__hash__
+
+    @property
+    def memory_decoded(self) -> bool:
+        return self._step is None
+
+    @property  # type: ignore[override]
+    def memory(self):
+        if self._step is not None:
+            (event,) = parse_events_struct_logs([self._step])
+            self._memory = event.memory
+            self._step = None
+        return self._memory
+
+    @memory.setter
+    def memory(self, value):
+        self._memory = value
+        self._step = None
+
+
+_EAGER_EVENT_FIELDS = tuple(
+    field.name for field in fields(TraceEvent) if field.name != "memory"
+)
+
+
+def parse_lazy_memory_events(steps: Iterable[LazyStructLog]) -> Iterator[TraceEvent]:
+    """Parse the steps without their memory, which is parsed when an event accesses it"""
+    steps, eager_steps = tee(steps)
+    events = parse_events_struct_logs(step.eager_fields for step in eager_steps)
+    for event, step in zip(events, steps):
+        yield LazyMemoryTraceEvent(event, step) if "memory" in step else event
 
 
 class VmTraceDictEventsParser(EventsParser):
@@ -0,0 +1,22 @@
+import hashlib
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def trace_fingerprint(path: Path, chunk_size: int = CHUNK_SIZE) -> tuple[int, str]:
+    """The size and a streaming BLAKE2 hash of a trace file"""
+    hash = hashlib.blake2b(digest_size=32)
+    size = 0
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            hash.update(chunk)
+            size += len(chunk)
+    return size, hash.hexdigest()
+
+
+def traces_identical(path_a: Path, path_b: Path) -> bool:
+    """Check if two trace files are byte-identical, comparing the cheap file sizes first"""
+    if path_a.stat().st_size != path_b.stat().st_size:
+        return False
+    return trace_fingerprint(path_a) == trace_fingerprint(path_b)
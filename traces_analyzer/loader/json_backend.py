@@ -0,0 +1,136 @@
+from abc import ABC, abstractmethod
+import json
+from typing import Any
+from typing_extensions import override
+
+from traces_analyzer.loader.struct_logs import ObjectHook
+
+
+class JsonBackend(ABC):
+    name: str
+    # the pip package that provides the JSON library
+    package: str
+
+    @abstractmethod
+    def loads(self, data: str | bytes) -> Any:
+        pass
+
+    def loads_vm_trace(self, data: str | bytes, object_hook: ObjectHook) -> dict:
+        """Decode a vm trace and pass each of its structLog steps to the object_hook"""
+        vm_trace = self.loads(data)
+        vm_trace["structLogs"] = [object_hook(step) for step in vm_trace["structLogs"]]
+        return vm_trace
+
+
+class StdlibJsonBackend(JsonBackend):
+    name = "json"
+    package = "json"
+
+    @override
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+    @override
+    def loads_vm_trace(self, data: str | bytes, object_hook: ObjectHook) -> dict:
+        # the hook runs while decoding, so dropped fields never accumulate in memory
+        return json.loads(data, object_hook=object_hook)
+
+
+class OrjsonBackend(JsonBackend):
+    name = "orjson"
+    package = "orjson"
+
+    def __init__(self) -> None:
+        super().__init__()
+        import orjson  # type: ignore[import-not-found]
+
+        self._loads = orjson.loads
+
+    @override
+    def loads(self, data: str | bytes) -> Any:
+        return self._loads(data)
+
+
+class SimdjsonBackend(JsonBackend):
+    name = "simdjson"
+    package = "pysimdjson"
+
+    def __init__(self) -> None:
+        super().__init__()
+        import simdjson  # type: ignore[import-not-found]
+
+        self._loads = simdjson.loads
+
+    @override
+    def loads(self, data: str | bytes) -> Any:
+        return self._loads(data)
+
+
+JSON_BACKENDS: dict[str, type[JsonBackend]] = {
+    StdlibJsonBackend.name: StdlibJsonBackend,
+    OrjsonBackend.name: OrjsonBackend,
+    SimdjsonBackend.name: SimdjsonBackend,
+}
+
+AUTO_PREFERENCE = (OrjsonBackend.name, SimdjsonBackend.name, StdlibJsonBackend.name)
+
+
+class AutoJsonBackend(JsonBackend):
+    """Decode with the fastest importable backend, except for vm traces
+
+    orjson and simdjson have no object hook, so they would decode every field of the
+    structLogs, eg the storage maps, before they are dropped. Vm traces are thus
+    decoded by the stdlib with the hook, which keeps the peak memory low.
+    """
+
+    name = "auto"
+    package = "json"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.fastest: JsonBackend = StdlibJsonBackend()
+        for candidate in AUTO_PREFERENCE:
+            try:
+                self.fastest = JSON_BACKENDS[candidate]()
+                break
+            except ImportError:
+                continue
+        self._stdlib = StdlibJsonBackend()
+
+    @override
+    def loads(self, data: str | bytes) -> Any:
+        return self.fastest.loads(data)
+
+    @override
+    def loads_vm_trace(self, data: str | bytes, object_hook: ObjectHook) -> dict:
+        return self._stdlib.loads_vm_trace(data, object_hook)
+
+
+def get_json_backend(name: str = "auto") -> JsonBackend:
+    """Create the JSON backend with the given name, see AutoJsonBackend for 'auto'
+
+    Raises an ImportError naming the package if the library of the backend is not installed.
+    """
+    if name == "auto":
+        return AutoJsonBackend()
+    if name not in JSON_BACKENDS:
+        raise ValueError(
+            f"Unknown JSON backend '{name}', expected one of: auto, {', '.join(JSON_BACKENDS)}"
+        )
+    backend_type = JSON_BACKENDS[name]
+    try:
+        return backend_type()
+    except ImportError as e:
+        raise ImportError(
+            f"The JSON backend '{name}' requires the {backend_type.package} package, install it with 'pip install {backend_type.package}'"
+        ) from e
+
+
+def get_available_json_backends() -> list[JsonBackend]:
+    backends: list[JsonBackend] = []
+    for backend_type in JSON_BACKENDS.values():
+        try:
+            backends.append(backend_type())
+        except ImportError:
+            continue
+    return backends
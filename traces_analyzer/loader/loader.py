@@ -17,6 +17,8 @@ class TraceBundle:
     value: HexString
     events_normal: Iterable[TraceEvent]
     events_reverse: Iterable[TraceEvent]
+    # the traces are byte-identical and events_reverse is events_normal
+    identical_traces: bool = False
 
 
 @dataclass
@@ -0,0 +1,168 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, TypedDict
+from typing_extensions import override
+
+from traces_analyzer.loader.bundle_discovery import (
+    METADATA_FILENAME,
+    discover_bundle_dirs,
+)
+from traces_analyzer.loader.directory_loader import (
+    BundleDir,
+    DirectoryLoader,
+    split_bundle_dir,
+)
+from traces_analyzer.loader.event_parser import EventsParser
+from traces_analyzer.loader.json_backend import JsonBackend, get_json_backend
+
+from traces_parser.datatypes import HexString
+
+SCENARIOS = ("actual", "reverse")
+
+
+class ManifestTrace(TypedDict):
+    path: str
+    size: int
+    format: str
+
+
+class ManifestEntry(TypedDict):
+    dir: str
+    metadata: dict
+    traces: dict[str, dict[str, ManifestTrace]]
+
+
+def trace_format(path: str) -> str:
+    """The --trace-format of a trace file, based on its extension"""
+    return "eip3155" if path.removesuffix(".gz").endswith(".jsonl") else "structlogs"
+
+
+def scan_bundle(dir: Path, metadata: dict | None = None) -> ManifestEntry:
+    """Read the metadata of a bundle, unless it is given, and locate its traces with one listing per scenario"""
+    if metadata is None:
+        with open(dir / METADATA_FILENAME, "rb") as metadata_file:
+            metadata = json.loads(metadata_file.read())
+
+    sizes: dict[str, dict[str, int]] = {}
+    for scenario in SCENARIOS:
+        with os.scandir(dir / scenario) as entries:
+            sizes[scenario] = {
+                entry.name: entry.stat().st_size for entry in entries if entry.is_file()
+            }
+
+    traces: dict[str, dict[str, ManifestTrace]] = {}
+    for hash in metadata["transactions_order"]:
+        hash = HexString(hash).with_prefix()
+        for ext in DirectoryLoader.TRACE_FILE_EXTENSIONS:
+            name = f"{hash}.{ext}"
+            if all(name in sizes[scenario] for scenario in SCENARIOS):
+                traces[hash] = {
+                    scenario: {
+                        "path": f"{scenario}/{name}",
+                        "size": sizes[scenario][name],
+                        "format": trace_format(name),
+                    }
+                    for scenario in SCENARIOS
+                }
+                break
+        else:
+            raise FileNotFoundError(f"Could not find the traces of {hash} in {dir}")
+
+    return {"dir": str(dir), "metadata": metadata, "traces": traces}
+
+
+def scan_bundles(
+    dirs: Iterable[BundleDir], workers: int = 8
+) -> Iterator[ManifestEntry]:
+    """Scan bundle directories in parallel, yielding the entries in the order of the dirs"""
+    dirs = iter(dirs)
+    pending: deque[Future[ManifestEntry]] = deque()
+    with ThreadPoolExecutor(workers, thread_name_prefix="bundle-scan") as executor:
+        try:
+            for dir in dirs:
+                pending.append(executor.submit(scan_bundle, *split_bundle_dir(dir)))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def build_manifest(roots: Iterable[Path], path: Path, workers: int = 8) -> int:
+    """Discover the bundles below the roots and write their manifest to path
+
+    Returns the number of bundles.
+    """
+    dirs = discover_bundle_dirs(roots, workers)
+    return write_manifest(scan_bundles(dirs, workers), path)
+
+
+def write_manifest(entries: Iterable[ManifestEntry], path: Path) -> int:
+    """Write the entries as JSON lines, with the bundle dirs relative to the manifest"""
+    count = 0
+    with open(path, "w") as manifest_file:
+        for entry in entries:
+            entry = {**entry, "dir": os.path.relpath(entry["dir"], path.parent)}
+            manifest_file.write(json.dumps(entry) + "\n")
+            count += 1
+    return count
+
+
+def read_manifest(
+    path: Path, json_backend: JsonBackend | None = None
+) -> Iterator[ManifestEntry]:
+    json_backend = json_backend or get_json_backend()
+    with open(path, "rb") as manifest_file:
+        for line in manifest_file:
+            if not line.strip():
+                continue
+            entry: ManifestEntry = json_backend.loads(line)
+            entry["dir"] = str(path.parent / entry["dir"])
+            yield entry
+
+
+class ManifestLoader(DirectoryLoader):
+    """DirectoryLoader that takes the metadata and trace paths from a manifest entry instead of the file system"""
+
+    def __init__(
+        self,
+        entry: ManifestEntry,
+        file_parser: EventsParser,
+        json_backend: JsonBackend | None = None,
+        step_index: bool = False,
+        detect_identical: bool = False,
+    ) -> None:
+        super().__init__(
+            Path(entry["dir"]),
+            file_parser,
+            json_backend,
+            step_index,
+            detect_identical,
+        )
+        self._entry = entry
+
+    @override
+    def reopen(self) -> "ManifestLoader":
+        return ManifestLoader(
+            self._entry,
+            self._file_parser,
+            self._json,
+            self._step_index,
+            self._detect_identical,
+        )
+
+    @override
+    def read_metadata(self) -> dict:
+        return self._entry["metadata"]
+
+    @override
+    def find_trace_paths(self, hash: HexString) -> tuple[Path, Path]:
+        traces = self._entry["traces"][hash.with_prefix()]
+        path_normal = self._dir / traces["actual"]["path"]
+        path_reverse = self._dir / traces["reverse"]["path"]
+        return path_normal, path_reverse
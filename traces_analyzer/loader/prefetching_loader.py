@@ -0,0 +1,279 @@
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+import gzip
+from itertools import islice
+import os
+from pathlib import Path
+from threading import Condition
+from typing import Iterable, Iterator
+from typing_extensions import override
+
+from traces_analyzer.loader.directory_loader import (
+    BundleDir,
+    DirectoryLoader,
+    split_bundle_dir,
+)
+from traces_analyzer.loader.event_parser import EventsParser
+from traces_analyzer.loader.json_backend import JsonBackend, get_json_backend
+from traces_analyzer.loader.loader import TraceLoader
+from traces_analyzer.loader.step_index import StepIndex
+from traces_analyzer.utils.tracing import span
+
+from traces_parser.datatypes import HexString
+from traces_parser.parser.events_parser import TraceEvent
+
+
+class OrderedMemoryBudget:
+    """Limit the bytes held by prefetched bundles, granting them in the order of their tickets
+
+    Granting in order ensures that the oldest bundle, which the consumer waits for,
+    never starves behind younger ones. A request larger than the whole budget is
+    granted once nothing else is held.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self._limit = limit
+        self._used = 0
+        self._next_ticket = 0
+        self._closed = False
+        self._condition = Condition()
+
+    def acquire(self, ticket: int, size: int):
+        with self._condition:
+            self._condition.wait_for(
+                lambda: (
+                    self._closed
+                    or (
+                        ticket == self._next_ticket
+                        and (self._used == 0 or self._used + size <= self._limit)
+                    )
+                )
+            )
+            if self._closed:
+                raise CancelledError()
+            self._used += size
+            self._next_ticket += 1
+            self._condition.notify_all()
+
+    def release(self, size: int):
+        with self._condition:
+            self._used -= size
+            self._condition.notify_all()
+
+    def close(self):
+        """Wake up and cancel all waiting acquisitions"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class PrefetchedDirectoryLoader(DirectoryLoader):
+    """DirectoryLoader that serves a bundle which has already been read into memory"""
+
+    def __init__(
+        self,
+        dir: Path,
+        file_parser: EventsParser,
+        json_backend: JsonBackend,
+        metadata: dict,
+        traces: dict[Path, str],
+        events: dict[Path, Iterable[TraceEvent]],
+        budget: OrderedMemoryBudget,
+        size: int,
+        step_index: bool = False,
+        identical: set[Path] | None = None,
+    ) -> None:
+        super().__init__(
+            dir, file_parser, json_backend, step_index, identical is not None, metadata
+        )
+        self._traces = traces
+        self._events = events
+        # the reverse traces that are identical to their normal trace
+        self._identical = identical or set()
+        self._budget = budget
+        self._size = size
+
+    @override
+    def __enter__(self):
+        try:
+            return super().__enter__()
+        except BaseException as e:
+            # __exit__ is not called if entering fails, so the memory is released here
+            self.__exit__(type(e), e, e.__traceback__)
+            raise
+
+    @override
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        self._traces.clear()
+        self._events.clear()
+        self._budget.release(self._size)
+        self._size = 0
+
+    @override
+    def _load_events(self, path: Path) -> Iterable[TraceEvent]:
+        if path in self._events:
+            return self._events.pop(path)
+        return super()._load_events(path)
+
+    @override
+    def _traces_identical(self, path_normal: Path, path_reverse: Path) -> bool:
+        return path_reverse in self._identical
+
+    @override
+    def _lazy_load_file(self, path: Path):
+        yield from self._traces.pop(path).splitlines(keepends=True)
+
+
+class PrefetchingBundleSource:
+    """Iterate over bundle directories while background threads read the next bundles into memory
+
+    At most `prefetch` bundles are read ahead, and together they hold at most
+    `memory_budget` bytes of decompressed trace text. With `decode`, the traces are
+    also passed to the events parser in the background, eg to JSON decode vm traces,
+    and are charged with the parsed_size of the parser, which is larger than the text
+    only if the parser decodes eagerly.
+    """
+
+    def __init__(
+        self,
+        dirs: Iterable[BundleDir],
+        file_parser: EventsParser,
+        json_backend: JsonBackend | None = None,
+        prefetch: int = 2,
+        memory_budget: int = 1024**3,
+        decode: bool = False,
+        step_index: bool = False,
+        detect_identical: bool = False,
+    ) -> None:
+        self._dirs = dirs
+        self._file_parser = file_parser
+        self._json = json_backend or get_json_backend()
+        self._prefetch = prefetch
+        self._memory_budget = memory_budget
+        self._decode = decode
+        self._step_index = step_index
+        self._detect_identical = detect_identical
+
+    def __iter__(self) -> Iterator[TraceLoader]:
+        if self._prefetch <= 0:
+            for dir, metadata in map(split_bundle_dir, self._dirs):
+                yield DirectoryLoader(
+                    dir,
+                    self._file_parser,
+                    self._json,
+                    self._step_index,
+                    self._detect_identical,
+                    metadata,
+                )
+            return
+
+        dirs = enumerate(self._dirs)
+        budget = OrderedMemoryBudget(self._memory_budget)
+        pending: deque[Future[PrefetchedDirectoryLoader]] = deque()
+        with ThreadPoolExecutor(
+            self._prefetch, thread_name_prefix="bundle-prefetch"
+        ) as executor:
+
+            def submit(ticket: int, bundle: BundleDir):
+                pending.append(
+                    executor.submit(self._read_bundle, budget, ticket, bundle)
+                )
+
+            try:
+                for ticket, bundle in islice(dirs, self._prefetch):
+                    submit(ticket, bundle)
+                while pending:
+                    with span("prefetch_wait"):
+                        loader = pending.popleft().result()
+                    for ticket, bundle in islice(dirs, 1):
+                        submit(ticket, bundle)
+                    yield loader
+            finally:
+                for future in pending:
+                    future.cancel()
+                budget.close()
+
+    def _read_bundle(
+        self, budget: OrderedMemoryBudget, ticket: int, bundle: BundleDir
+    ) -> PrefetchedDirectoryLoader:
+        dir, metadata = split_bundle_dir(bundle)
+        with span("prefetch", dir=str(dir)):
+            return self._read_bundle_files(budget, ticket, dir, metadata)
+
+    def _read_bundle_files(
+        self,
+        budget: OrderedMemoryBudget,
+        ticket: int,
+        dir: Path,
+        metadata: dict | None = None,
+    ) -> PrefetchedDirectoryLoader:
+        loader = DirectoryLoader(dir, self._file_parser, self._json, metadata=metadata)
+        pairs: list[tuple[Path, Path]] = []
+        size = 0
+        try:
+            metadata = loader.read_metadata()
+            for hash in metadata["transactions_order"]:
+                pairs.append(loader.find_trace_paths(HexString(hash)))
+            size = sum(trace_text_size(path) for pair in pairs for path in pair)
+            if self._decode:
+                size = self._file_parser.parsed_size(size)
+        finally:
+            # take the turn even if reading failed, so younger bundles are not blocked
+            budget.acquire(ticket, size)
+
+        try:
+            traces = {path: read_trace_file(path) for pair in pairs for path in pair}
+            identical = None
+            if self._detect_identical:
+                identical = {
+                    path_reverse
+                    for path_normal, path_reverse in pairs
+                    if traces[path_normal] == traces[path_reverse]
+                }
+            events: dict[Path, Iterable[TraceEvent]] = {}
+            if self._decode:
+                for path in traces.keys() - (identical or set()):
+                    lines: Iterable[str] = traces.pop(path).splitlines(keepends=True)
+                    if (
+                        self._step_index
+                        and path.suffix != ".gz"
+                        and StepIndex.load(path) is None
+                    ):
+                        lines = StepIndex.indexing(path, lines)
+                    events[path] = self._file_parser.parse(lines)
+        except BaseException:
+            budget.release(size)
+            raise
+
+        return PrefetchedDirectoryLoader(
+            dir,
+            self._file_parser,
+            self._json,
+            metadata,
+            traces,
+            events,
+            budget,
+            size,
+            self._step_index,
+            identical,
+        )
+
+
+def read_trace_file(path: Path) -> str:
+    if path.suffix == ".gz":
+        return gzip.decompress(path.read_bytes()).decode()
+    with open(path, newline="") as trace_file:
+        return trace_file.read()
+
+
+def trace_text_size(path: Path) -> int:
+    """The size of the decompressed text of a trace file"""
+    size = path.stat().st_size
+    if path.suffix != ".gz":
+        return size
+    with open(path, "rb") as file:
+        # the gzip trailer ends with the uncompressed size modulo 2**32
+        file.seek(-4, os.SEEK_END)
+        uncompressed = int.from_bytes(file.read(4), "little")
+    return max(size, uncompressed)
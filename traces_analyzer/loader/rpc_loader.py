@@ -0,0 +1,238 @@
+import codecs
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import count
+import json
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Iterable, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from traces_analyzer.loader.event_parser import EventsParser
+from traces_analyzer.loader.loader import PotentialAttack, TraceBundle, TraceLoader
+from traces_analyzer.loader.struct_logs import read_object_members
+from traces_analyzer.utils.tracing import span
+
+from traces_parser.datatypes import HexString
+
+# geth structLogger options, storage is not used by the analysis
+TRACE_CONFIG = {"enableMemory": True, "disableStorage": True}
+
+T = TypeVar("T")
+
+
+class JsonRpcError(ValueError):
+    """A JSON-RPC call failed or returned no result"""
+
+
+class TraceRpcClient:
+    """Fetch vm traces from a JSON-RPC endpoint, reusing connections across requests
+
+    The requests of all bundles share a pool of pool_size threads, one per connection.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = 8,
+        timeout: float = 300,
+        chunk_size: int = 1024 * 1024,
+    ) -> None:
+        self._url = url
+        self._timeout = timeout
+        self._chunk_size = chunk_size
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._ids = count()
+        self._ids_lock = Lock()
+        self._executor = ThreadPoolExecutor(pool_size, thread_name_prefix="rpc")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+        self._session.close()
+
+    def submit(self, fetch: Callable[..., T], *args) -> Future[T]:
+        """Run a function that fetches traces in the thread pool of the client"""
+        return self._executor.submit(fetch, *args)
+
+    def trace_transaction(self, hash: HexString) -> str:
+        return self.call("debug_traceTransaction", [hash.with_prefix(), TRACE_CONFIG])
+
+    def trace_call(self, call: dict, block: str, state_overrides: dict) -> str:
+        config = {**TRACE_CONFIG, "stateOverrides": state_overrides}
+        return self.call("debug_traceCall", [call, block, config])
+
+    def call(self, method: str, params: list) -> str:
+        """Call a method and return the JSON of its result, without decoding it
+
+        The whole response is held in memory, as the vm trace parser decodes the
+        result from a single string.
+        """
+        with self._ids_lock:
+            id = next(self._ids)
+        request = {"jsonrpc": "2.0", "id": id, "method": method, "params": params}
+        with self._session.post(
+            self._url, json=request, stream=True, timeout=self._timeout
+        ) as response:
+            response.raise_for_status()
+            text = _decode_utf8(response.iter_content(self._chunk_size))
+        return rpc_result(text, method)
+
+
+def rpc_result(response: str, method: str = "call") -> str:
+    """The JSON of the result of a JSON-RPC response, raising a JsonRpcError for errors and missing results"""
+    try:
+        members = read_object_members(response)
+    except ValueError as e:
+        raise JsonRpcError(
+            f"{method}: incomplete or invalid JSON-RPC response, {e}"
+        ) from e
+    if "error" in members:
+        error = json.loads(members["error"])
+        if isinstance(error, dict) and "message" in error:
+            error = f"{error['message']} (code {error.get('code')})"
+        raise JsonRpcError(f"{method} failed: {error}")
+    result = members.get("result", "null")
+    if result == "null":
+        raise JsonRpcError(f"{method} returned no result")
+    return result
+
+
+def _decode_utf8(chunks: Iterable[bytes]) -> str:
+    # the decoded chunks are released once they are joined
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts = [decoder.decode(chunk) for chunk in chunks]
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+class RpcLoader(TraceLoader):
+    """Load the traces of a bundle from a JSON-RPC endpoint
+
+    The normal traces are fetched with debug_traceTransaction. The reverse traces are
+    fetched with debug_traceCall. The state of the reverse scenario can not be derived
+    from the transactions of the bundle, so the metadata also needs the block and
+    state overrides to trace each transaction with:
+
+        "reverse_calls": {
+            <tx hash>: {"block": <block number or hash>, "stateOverrides": {...}, "gas": <optional>}
+        }
+
+    With a `cache_dir`, the bundle is also written in the format of the DirectoryLoader.
+    With `detect_identical`, identical normal and reverse traces are only parsed once.
+    """
+
+    def __init__(
+        self,
+        metadata: dict,
+        client: TraceRpcClient,
+        file_parser: EventsParser,
+        cache_dir: Path | None = None,
+        detect_identical: bool = False,
+    ) -> None:
+        super().__init__()
+        self._metadata = metadata
+        self._client = client
+        self._file_parser = file_parser
+        self._cache_dir = cache_dir
+        self._detect_identical = detect_identical
+
+    def __enter__(self) -> PotentialAttack:
+        hashes: list[str] = self._metadata["transactions_order"]
+        reverse_calls = {hash: self._reverse_call(hash) for hash in hashes}
+        normal = [self._client.submit(self._fetch_normal, hash) for hash in hashes]
+        reverse = [
+            self._client.submit(self._fetch_reverse, hash, reverse_calls[hash])
+            for hash in hashes
+        ]
+        try:
+            traces = {
+                hash: (n.result(), r.result())
+                for hash, n, r in zip(hashes, normal, reverse)
+            }
+        finally:
+            for future in normal + reverse:
+                future.cancel()
+
+        if self._cache_dir:
+            self._write_cache(traces)
+
+        tx_a_hash, tx_b_hash = hashes
+        return PotentialAttack(
+            id=self._metadata["id"],
+            tx_a=self._load_transaction_bundle(tx_a_hash, *traces[tx_a_hash]),
+            tx_b=self._load_transaction_bundle(tx_b_hash, *traces[tx_b_hash]),
+        )
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def _fetch_normal(self, hash: str) -> str:
+        with span("rpc_fetch", bundle=self._metadata["id"], tx=hash, scenario="actual"):
+            return self._client.trace_transaction(HexString(hash))
+
+    def _reverse_call(self, hash: str) -> dict:
+        reverse_call = self._metadata.get("reverse_calls", {}).get(hash)
+        if not isinstance(reverse_call, dict) or "block" not in reverse_call:
+            raise ValueError(
+                f"The metadata of bundle {self._metadata['id']} has no reverse_calls entry with a block for {hash}, which is needed to trace the reverse scenario with --rpc (see RpcLoader)"
+            )
+        return reverse_call
+
+    def _fetch_reverse(self, hash: str, reverse_call: dict) -> str:
+        tx = self._metadata["transactions"][hash]
+        call = {
+            "from": tx["from"],
+            "to": tx["to"],
+            "input": tx["input"],
+            "value": tx["value"],
+        }
+        if "gas" in reverse_call:
+            call["gas"] = reverse_call["gas"]
+        with span(
+            "rpc_fetch", bundle=self._metadata["id"], tx=hash, scenario="reverse"
+        ):
+            return self._client.trace_call(
+                call, reverse_call["block"], reverse_call.get("stateOverrides", {})
+            )
+
+    def _load_transaction_bundle(
+        self, hash: str, trace_normal: str, trace_reverse: str
+    ) -> TraceBundle:
+        tx = self._metadata["transactions"][hash]
+        identical = self._detect_identical and trace_normal == trace_reverse
+        events_normal = self._file_parser.parse([trace_normal])
+        return TraceBundle(
+            hash=HexString(hash),
+            caller=HexString(tx["from"]),
+            to=HexString(tx["to"]),
+            calldata=HexString(tx["input"]),
+            value=HexString(tx["value"]),
+            events_normal=events_normal,
+            # identical traces are only parsed once
+            events_reverse=(
+                events_normal if identical else self._file_parser.parse([trace_reverse])
+            ),
+            identical_traces=identical,
+        )
+
+    def _write_cache(self, traces: dict[str, tuple[str, str]]):
+        assert self._cache_dir
+        dir = self._cache_dir / self._metadata["id"]
+        for scenario in ("actual", "reverse"):
+            (dir / scenario).mkdir(parents=True, exist_ok=True)
+        for hash, (trace_normal, trace_reverse) in traces.items():
+            name = f"{HexString(hash).with_prefix()}.json"
+            (dir / "actual" / name).write_text(trace_normal)
+            (dir / "reverse" / name).write_text(trace_reverse)
+        # written last, so an interrupted fetch does not leave a complete looking bundle
+        (dir / "metadata.json").write_text(json.dumps(self._metadata))
@@ -0,0 +1,277 @@
+from array import array
+import json
+from pathlib import Path
+import re
+import struct
+import sys
+from typing import Iterable, Iterator
+
+from traces_analyzer.loader.event_parser import (
+    EIP3155EventsParser,
+    VmTraceDictEventsParser,
+)
+
+from traces_parser.parser.events_parser import TraceEvent
+
+_MAGIC = b"TRACEID2"
+# magic, trace size, trace mtime in ns, number of steps
+_HEADER = struct.Struct("<8sQQQ")
+_SPAN = struct.Struct("<QQ")
+_READ_SIZE = 1024 * 1024
+
+
+class StepIndex:
+    """Byte offsets of the steps in a trace file, to decode a window of steps without reading the whole file
+
+    The index is stored in a sidecar file next to the trace (`<trace>.idx`). It holds
+    the start and end offset of each step. For JSONL traces each line with a "pc" is
+    a step, for vm traces each element of the structLogs. A loaded index only reads
+    the offsets of the requested steps from the sidecar.
+    """
+
+    SUFFIX = ".idx"
+
+    def __init__(
+        self, trace_path: Path, spans: array | None = None, count: int = 0
+    ) -> None:
+        self.trace_path = trace_path
+        # start and end offsets of the steps, interleaved. None if they are read from the sidecar
+        self._spans = spans
+        self._count = len(spans) // 2 if spans is not None else count
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def is_jsonl(self) -> bool:
+        return self.trace_path.suffix == ".jsonl"
+
+    @staticmethod
+    def sidecar_path(trace_path: Path) -> Path:
+        return trace_path.with_name(trace_path.name + StepIndex.SUFFIX)
+
+    @staticmethod
+    def build(trace_path: Path) -> "StepIndex":
+        scanner = span_scanner(trace_path)
+        with open(trace_path, "rb") as file:
+            if trace_path.suffix == ".jsonl":
+                pieces: Iterable[bytes] = file
+            else:
+                pieces = iter(lambda: file.read(_READ_SIZE), b"")
+            for piece in pieces:
+                # latin-1 maps each byte to one character, so positions equal byte offsets
+                scanner.feed(piece.decode("latin-1"))
+        return StepIndex(trace_path, scanner.spans)
+
+    @staticmethod
+    def indexing(trace_path: Path, lines: Iterable[str]) -> Iterator[str]:
+        """Pass the lines of a trace through, and save its index once all of them were read
+
+        This builds the index while the trace is parsed, instead of reading it again.
+        The lines must keep their line endings, eg from a file opened with newline="".
+        """
+        scanner = span_scanner(trace_path)
+        for line in lines:
+            scanner.feed(line if line.isascii() else line.encode().decode("latin-1"))
+            yield line
+        StepIndex(trace_path, scanner.spans).save()
+
+    @staticmethod
+    def load(trace_path: Path) -> "StepIndex | None":
+        """Load the sidecar index of a trace, if it exists and matches the trace size and mtime"""
+        sidecar = StepIndex.sidecar_path(trace_path)
+        if not sidecar.exists():
+            return None
+        with open(sidecar, "rb") as file:
+            header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+        magic, trace_size, trace_mtime, count = _HEADER.unpack(header)
+        stat = trace_path.stat()
+        if (
+            magic != _MAGIC
+            or trace_size != stat.st_size
+            or trace_mtime != stat.st_mtime_ns
+        ):
+            return None
+        return StepIndex(trace_path, count=count)
+
+    @staticmethod
+    def ensure(trace_path: Path) -> "StepIndex":
+        """Load the sidecar index of a trace or build and save it"""
+        index = StepIndex.load(trace_path)
+        if index is None:
+            index = StepIndex.build(trace_path)
+            index.save()
+        return index
+
+    def save(self):
+        spans = array("Q", self._spans_between(0, len(self)))
+        if sys.byteorder == "big":
+            spans.byteswap()
+        stat = self.trace_path.stat()
+        header = _HEADER.pack(_MAGIC, stat.st_size, stat.st_mtime_ns, len(self))
+        with open(StepIndex.sidecar_path(self.trace_path), "wb") as file:
+            file.write(header)
+            spans.tofile(file)
+
+    def read_records(self, start: int, stop: int) -> list[str]:
+        """Read the raw JSON of the steps in [start, stop)"""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if start >= stop:
+            return []
+        spans = self._spans_between(start, stop)
+        base = spans[0]
+        with open(self.trace_path, "rb") as file:
+            file.seek(base)
+            data = file.read(spans[-1] - base)
+        return [
+            data[spans[i] - base : spans[i + 1] - base].decode()
+            for i in range(0, len(spans), 2)
+        ]
+
+    def read_steps(self, start: int, stop: int) -> list[dict]:
+        """Decode the steps in [start, stop)"""
+        return [json.loads(record) for record in self.read_records(start, stop)]
+
+    def read_events(self, start: int, stop: int) -> Iterable[TraceEvent]:
+        """Parse the steps in [start, stop) to TraceEvents"""
+        if self.is_jsonl:
+            return EIP3155EventsParser().parse(self.read_records(start, stop))
+        return VmTraceDictEventsParser().parse(
+            {"structLogs": self.read_steps(start, stop)}
+        )
+
+    def _spans_between(self, start: int, stop: int) -> array:
+        """The interleaved start and end offsets of the steps in [start, stop)"""
+        if self._spans is not None:
+            return self._spans[2 * start : 2 * stop]
+        spans = array("Q")
+        with open(StepIndex.sidecar_path(self.trace_path), "rb") as file:
+            file.seek(_HEADER.size + _SPAN.size * start)
+            spans.fromfile(file, 2 * (stop - start))
+        if sys.byteorder == "big":
+            spans.byteswap()
+        return spans
+
+
+class JsonlSpanScanner:
+    """Find the spans of the steps in the lines of a JSONL trace"""
+
+    def __init__(self) -> None:
+        self.spans = array("Q")
+        self._offset = 0
+
+    def feed(self, line: str):
+        if '"pc"' in line:
+            self.spans.extend((self._offset, self._offset + len(line.rstrip("\r\n"))))
+        self._offset += len(line)
+
+
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_STRING_END = re.compile(r'["\\]')
+_CLOSING = {"[": "]", "{": "}"}
+# depth of the open containers at the structLogs array and at its steps
+_STEPS_DEPTH = 2
+_STEP_DEPTH = 3
+
+
+class StructLogSpanScanner:
+    """Find the spans of the structLog steps in a vm trace that is read in pieces
+
+    The pieces must have one character per byte, eg ASCII or decoded as latin-1. Only
+    the JSON structure is tracked, no values are decoded, and flat values inside the
+    steps are skipped with str.find.
+    """
+
+    def __init__(self) -> None:
+        self.spans = array("Q")
+        self._offset = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        # the characters of a key of the top level object, while it is read
+        self._key: list[str] | None = None
+        self._after_struct_logs_key = False
+        self._in_steps = False
+        self._done = False
+        self._step_start = 0
+
+    def feed(self, piece: str):
+        pos = 0
+        while pos < len(piece) and not self._done:
+            if self._in_string:
+                pos = self._read_string(piece, pos)
+                continue
+            match = _STRUCTURE.search(piece, pos)
+            if match is None:
+                break
+            char, pos = match.group(), match.end()
+            if char == '"':
+                self._in_string = True
+                self._key = [] if self._depth == 1 else None
+            elif char in _CLOSING:
+                pos = self._open(piece, char, match.start(), pos)
+            else:
+                self._close(pos)
+        self._offset += len(piece)
+
+    def _read_string(self, piece: str, pos: int) -> int:
+        if self._escaped:
+            self._escaped = False
+            return pos + 1
+        match = _STRING_END.search(piece, pos)
+        end = match.start() if match else len(piece)
+        if self._key is not None:
+            self._key.append(piece[pos:end])
+        if match is None:
+            return end
+        if match.group() == "\\":
+            self._escaped = True
+        else:
+            self._in_string = False
+            if self._key is not None:
+                self._after_struct_logs_key = "".join(self._key) == "structLogs"
+                self._key = None
+        return match.end()
+
+    def _open(self, piece: str, char: str, start: int, pos: int) -> int:
+        if self._in_steps and self._depth >= _STEP_DEPTH:
+            # skip flat values of a step, eg the stack, without tracking their items
+            end = piece.find(_CLOSING[char], pos)
+            if end != -1 and _is_flat(piece, pos, end):
+                return end + 1
+        self._depth += 1
+        if self._in_steps and self._depth == _STEP_DEPTH:
+            self._step_start = self._offset + start
+        elif (
+            not self._in_steps
+            and self._depth == _STEPS_DEPTH
+            and char == "["
+            and self._after_struct_logs_key
+        ):
+            self._in_steps = True
+        return pos
+
+    def _close(self, pos: int):
+        if self._in_steps and self._depth == _STEP_DEPTH:
+            self.spans.extend((self._step_start, self._offset + pos))
+        elif self._in_steps and self._depth == _STEPS_DEPTH:
+            self._done = True
+        self._depth -= 1
+
+
+def span_scanner(trace_path: Path) -> JsonlSpanScanner | StructLogSpanScanner:
+    if trace_path.suffix == ".jsonl":
+        return JsonlSpanScanner()
+    return StructLogSpanScanner()
+
+
+def _is_flat(piece: str, start: int, end: int) -> bool:
+    """Check that piece[start:end] has no nested values and ends outside of a string"""
+    return (
+        piece.count('"', start, end) % 2 == 0
+        and piece.find("\\", start, end) == -1
+        and piece.find("[", start, end) == -1
+        and piece.find("{", start, end) == -1
+    )
@@ -0,0 +1,204 @@
+from collections import deque
+import codecs
+import json
+import socket
+import sys
+from typing import BinaryIO, Iterable, Iterator
+
+from traces_analyzer.loader.event_parser import EIP3155EventsParser
+from traces_analyzer.loader.loader import PotentialAttack, TraceBundle, TraceLoader
+from traces_analyzer.utils.tracing import span
+
+from traces_parser.datatypes import HexString
+
+TraceKey = tuple[str, str]
+
+
+class FramedStreamReader:
+    """Demultiplex a stream of bundle metadata and trace frames
+
+    Each frame is a header line followed by a payload of the given length:
+
+        bundle <length>\\n<metadata.json>
+        trace <length> <tx hash> <actual|reverse>\\n<part of the trace file>
+
+    A `bundle` frame starts a new bundle and is followed by the `trace` frames of its
+    traces, in any order and interleaving. A trace frame with an empty payload ends
+    the trace. Frames of traces of the current bundle that are not read yet are
+    buffered in memory, the frames that are left when skipping to the next bundle
+    are dropped.
+    """
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self._stream = stream
+        self._next_metadata: dict | None = None
+        self._buffered: dict[TraceKey, deque[bytes]] = {}
+
+    def __iter__(self) -> Iterator[dict]:
+        while (metadata := self.next_bundle()) is not None:
+            yield metadata
+
+    def next_bundle(self) -> dict | None:
+        """Skip to the next bundle frame and return its metadata, or None at the end of the stream"""
+        self._buffered.clear()
+        while self._next_metadata is None:
+            if self._read_frame(keep_traces=False) is None:
+                return None
+        metadata, self._next_metadata = self._next_metadata, None
+        return metadata
+
+    def iter_trace(self, hash: HexString, scenario: str) -> Iterator[bytes]:
+        """Yield the parts of a trace of the current bundle"""
+        buffered = self._buffered.setdefault((hash.with_prefix(), scenario), deque())
+        while True:
+            while buffered:
+                part = buffered.popleft()
+                if not part:
+                    return
+                yield part
+            if self._read_frame() is None or self._next_metadata is not None:
+                raise ValueError(
+                    f"Stream ended before the {scenario} trace of {hash} was complete"
+                )
+
+    def _read_frame(self, keep_traces: bool = True) -> str | None:
+        header = self._stream.readline()
+        if not header:
+            return None
+        kind, length, *trace = header.decode().split()
+        payload = self._stream.read(int(length))
+        if len(payload) != int(length):
+            raise ValueError(f"Stream ended within a {kind} frame")
+
+        if kind == "bundle":
+            self._next_metadata = json.loads(payload)
+        elif kind == "trace":
+            if keep_traces:
+                hash, scenario = trace
+                key = (HexString(hash).with_prefix(), scenario)
+                self._buffered.setdefault(key, deque()).append(payload)
+        else:
+            raise ValueError(f"Unknown frame type {kind}")
+        return kind
+
+
+def write_frame(stream: BinaryIO, kind: str, payload: bytes, *args: str):
+    stream.write(" ".join([kind, str(len(payload)), *args]).encode() + b"\n")
+    stream.write(payload)
+
+
+def write_bundle_frames(
+    stream: BinaryIO,
+    metadata: dict,
+    traces: Iterable[tuple[str, str, Iterable[bytes]]],
+):
+    """Write a bundle and its (hash, scenario, parts) traces as frames, eg to feed a StreamBundleSource"""
+    write_frame(stream, "bundle", json.dumps(metadata).encode())
+    for hash, scenario, parts in traces:
+        for part in parts:
+            if part:
+                write_frame(stream, "trace", part, hash, scenario)
+        write_frame(stream, "trace", b"", hash, scenario)
+
+
+def open_bundle_stream(source: str) -> BinaryIO:
+    """Open '-' (stdin), 'unix:<path>' (connect to a Unix socket) or a file path, eg a named pipe"""
+    if source == "-":
+        return sys.stdin.buffer
+    if source.startswith("unix:"):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(source.removeprefix("unix:"))
+        stream = connection.makefile("rb")
+        # the file object keeps the connection open until it is closed
+        connection.close()
+        return stream
+    return open(source, "rb")
+
+
+class StreamLoader(TraceLoader):
+    """Load a bundle from a FramedStreamReader, parsing its traces while they are received"""
+
+    def __init__(
+        self,
+        reader: FramedStreamReader,
+        metadata: dict,
+        file_parser: EIP3155EventsParser,
+    ) -> None:
+        super().__init__()
+        self._reader = reader
+        self._metadata = metadata
+        self._file_parser = file_parser
+
+    def __enter__(self) -> PotentialAttack:
+        tx_a_hash, tx_b_hash = self._metadata["transactions_order"]
+        return PotentialAttack(
+            id=self._metadata["id"],
+            tx_a=self._load_transaction_bundle(
+                self._metadata["transactions"][tx_a_hash]
+            ),
+            tx_b=self._load_transaction_bundle(
+                self._metadata["transactions"][tx_b_hash]
+            ),
+        )
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def _load_transaction_bundle(self, tx: dict[str, str]) -> TraceBundle:
+        hash = HexString(tx["hash"])
+        return TraceBundle(
+            hash=hash,
+            caller=HexString(tx["from"]),
+            to=HexString(tx["to"]),
+            calldata=HexString(tx["input"]),
+            value=HexString(tx["value"]),
+            events_normal=self._load_events(hash, "actual"),
+            events_reverse=self._load_events(hash, "reverse"),
+        )
+
+    def _load_events(self, hash: HexString, scenario: str):
+        return self._file_parser.parse(
+            _iter_lines(self._reader.iter_trace(hash, scenario))
+        )
+
+
+class StreamBundleSource:
+    """Iterate over the bundles of a framed stream, see FramedStreamReader
+
+    Only EIP-3155 traces can be streamed: their steps are parsed line by line while
+    the frames arrive, whereas a vm trace is one JSON document that would be joined
+    in memory before it is parsed.
+    """
+
+    def __init__(self, stream: BinaryIO, file_parser: EIP3155EventsParser) -> None:
+        if not isinstance(file_parser, EIP3155EventsParser):
+            raise ValueError(
+                f"Streamed traces must be EIP-3155 traces, not parsed with {type(file_parser).__name__}"
+            )
+        self._reader = FramedStreamReader(stream)
+        self._file_parser = file_parser
+
+    def __iter__(self) -> Iterator[TraceLoader]:
+        while True:
+            with span("stream_wait"):
+                metadata = self._reader.next_bundle()
+            if metadata is None:
+                return
+            yield StreamLoader(self._reader, metadata, self._file_parser)
+
+
+def _iter_lines(parts: Iterable[bytes]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending: list[str] = []
+    for part in parts:
+        *lines, last = decoder.decode(part).split("\n")
+        if lines:
+            lines[0] = "".join(pending) + lines[0]
+            pending = []
+            for line in lines:
+                yield line + "\n"
+        if last:
+            pending.append(last)
+    pending.append(decoder.decode(b"", final=True))
+    if rest := "".join(pending):
+        yield rest
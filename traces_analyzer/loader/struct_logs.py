@@ -0,0 +1,309 @@
+import json
+import re
+from typing import Any, Callable, Iterator, Mapping
+
+STRUCT_LOG_FIELDS = frozenset(("pc", "op", "depth", "stack", "memory"))
+"""Fields of a structLog step that are consumed by parse_events_struct_logs"""
+
+ObjectHook = Callable[[dict], dict]
+
+
+def is_struct_log(obj: dict) -> bool:
+    return "pc" in obj and "op" in obj
+
+
+def project_struct_log_fields(obj: dict) -> dict:
+    """JSON object hook that drops the structLog fields we do not consume (eg the storage map)"""
+    if not is_struct_log(obj):
+        return obj
+    return {key: value for key, value in obj.items() if key in STRUCT_LOG_FIELDS}
+
+
+class StructLogDeduplicator:
+    """JSON object hook that lets consecutive structLog steps share unchanged memory and stack values
+
+    The steps must be decoded in trace order, thus a new instance is needed for each trace.
+    """
+
+    def __init__(self, project_fields: bool = True) -> None:
+        self._project_fields = project_fields
+        self._previous_memory: tuple[str, ...] = ()
+        self._previous_stack: list[str] = []
+
+    def __call__(self, obj: dict) -> dict:
+        if not is_struct_log(obj):
+            return obj
+        if self._project_fields:
+            obj = project_struct_log_fields(obj)
+
+        if "memory" in obj:
+            obj["memory"] = share_unchanged_words(self._previous_memory, obj["memory"])
+            self._previous_memory = obj["memory"]
+        if "stack" in obj:
+            obj["stack"] = share_unchanged_prefix(self._previous_stack, obj["stack"])
+            self._previous_stack = obj["stack"]
+
+        return obj
+
+
+def share_unchanged_words(
+    previous: tuple[str, ...], current: list[str]
+) -> tuple[str, ...]:
+    """Return previous if both are equal, else current with each unchanged word replaced by the previous one
+
+    The memory is returned as a tuple, as it may be shared by several steps and must
+    not be changed in place.
+    """
+    words = tuple(current)
+    if words == previous:
+        return previous
+    return (
+        *(old if new == old else new for new, old in zip(words, previous)),
+        *words[len(previous) :],
+    )
+
+
+def share_unchanged_prefix(previous: list[str], current: list[str]) -> list[str]:
+    """Replace the items of current with the previous ones, until the first change"""
+    for i in range(min(len(previous), len(current))):
+        if current[i] != previous[i]:
+            break
+        current[i] = previous[i]
+    return current
+
+
+EAGER_STRUCT_LOG_FIELDS = frozenset(("pc", "op", "depth", "stack"))
+"""Fields that are decoded immediately by iter_lazy_struct_logs"""
+
+_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_WHITESPACE = re.compile(r"\s*")
+_KEY = re.compile(r"\s*(" + _STRING + r")\s*:\s*")
+_PLAIN_KEY = re.compile(r'\s*"([^"\\]*)"\s*:\s*')
+_SEPARATOR = re.compile(r"\s*([,}\]])")
+_SCALAR = re.compile(r"[^\s,\]}\[{\"]+")
+_CLOSING_BRACKETS = {"[": "]", "{": "}"}
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_decoder = json.JSONDecoder()
+
+
+class LazyStructLog(Mapping[str, Any]):
+    """A structLog step that only decodes its memory when it is accessed"""
+
+    __slots__ = ("_fields", "_source", "_memory_span")
+
+    def __init__(
+        self,
+        fields: dict[str, Any],
+        source: str,
+        memory_span: tuple[int, int] | None,
+    ) -> None:
+        self._fields = fields
+        self._source = source
+        self._memory_span = memory_span
+
+    @property
+    def eager_fields(self) -> dict[str, Any]:
+        """The decoded fields, without the memory unless it was already accessed"""
+        return self._fields
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "memory" and self._memory_span is not None:
+            start, end = self._memory_span
+            self._fields["memory"] = json.loads(self._source[start:end])
+            self._memory_span = None
+        return self._fields[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._fields or (
+            key == "memory" and self._memory_span is not None
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._fields
+        if self._memory_span is not None:
+            yield "memory"
+
+    def __len__(self) -> int:
+        return len(self._fields) + (self._memory_span is not None)
+
+
+def iter_lazy_struct_logs(vm_trace: str) -> Iterator[LazyStructLog]:
+    """Lazily yield the structLog steps of a vm trace JSON string
+
+    Only the EAGER_STRUCT_LOG_FIELDS are decoded for each step, the memory is kept as
+    a span of the raw JSON and all other fields (eg the storage map) are skipped.
+    """
+    for step, _, _ in _iter_steps(vm_trace):
+        yield step
+
+
+def read_object_members(source: str) -> dict[str, str]:
+    """The JSON text of each member of a JSON object, without decoding the values
+
+    Eg a JSON-RPC response, whose result is passed on to the vm trace parser.
+    """
+    members: dict[str, str] = {}
+    pos = _skip_whitespace(source, _expect(source, _skip_whitespace(source, 0), "{"))
+    if source.startswith("}", pos):
+        return members
+    while True:
+        key, start = _read_key(source, pos)
+        end = _skip_nested_value(source, start)
+        members[key] = source[start:end]
+        separator, pos = _read_separator(source, end)
+        if separator == "}":
+            return members
+        if separator != ",":
+            raise ValueError(f"Unexpected '{separator}' in object at {end}")
+
+
+def _iter_steps(source: str) -> Iterator[tuple[LazyStructLog, int, int]]:
+    pos = _find_struct_logs(source)
+    pos = _skip_whitespace(source, _expect(source, pos, "["))
+    if source.startswith("]", pos):
+        return
+
+    while True:
+        start = pos
+        step, pos = _read_step(source, pos)
+        yield step, start, pos
+        separator, pos = _read_separator(source, pos)
+        if separator == "]":
+            return
+        pos = _skip_whitespace(source, pos)
+
+
+def _find_struct_logs(source: str) -> int:
+    pos = _expect(source, _skip_whitespace(source, 0), "{")
+    while True:
+        key, pos = _read_key(source, pos)
+        if key == "structLogs":
+            return pos
+        separator, pos = _read_separator(source, _skip_value(source, pos))
+        if separator != ",":
+            raise KeyError("structLogs")
+
+
+def _read_step(source: str, pos: int) -> tuple[LazyStructLog, int]:
+    pos = _skip_whitespace(source, _expect(source, pos, "{"))
+    if source.startswith("}", pos):
+        return LazyStructLog({}, source, None), pos + 1
+
+    fields: dict[str, Any] = {}
+    memory_span: tuple[int, int] | None = None
+    while True:
+        key, pos = _read_key(source, pos)
+        if key in EAGER_STRUCT_LOG_FIELDS:
+            fields[key], pos = _decoder.raw_decode(source, pos)
+        else:
+            end = _skip_value(source, pos)
+            if key == "memory":
+                memory_span = (pos, end)
+            pos = end
+
+        separator, pos = _read_separator(source, pos)
+        if separator == "}":
+            return LazyStructLog(fields, source, memory_span), pos
+        if separator != ",":
+            raise ValueError(f"Unexpected '{separator}' in structLog at {pos}")
+
+
+def _expect(source: str, pos: int, char: str) -> int:
+    if not source.startswith(char, pos):
+        raise ValueError(f"Expected '{char}' at position {pos}")
+    return pos + 1
+
+
+def _skip_whitespace(source: str, pos: int) -> int:
+    match = _WHITESPACE.match(source, pos)
+    return match.end() if match else pos
+
+
+def _read_key(source: str, pos: int) -> tuple[str, int]:
+    match = _PLAIN_KEY.match(source, pos)
+    if match:
+        return match.group(1), match.end()
+    match = _KEY.match(source, pos)
+    if not match:
+        raise ValueError(f"Expected an object key at position {pos}")
+    return json.loads(match.group(1)), match.end()
+
+
+def _read_separator(source: str, pos: int) -> tuple[str, int]:
+    match = _SEPARATOR.match(source, pos)
+    if not match:
+        raise ValueError(f"Expected a separator at position {pos}")
+    return match.group(1), match.end()
+
+
+def _skip_value(source: str, pos: int) -> int:
+    opening = source[pos : pos + 1]
+    if opening in _CLOSING_BRACKETS:
+        end = source.find(_CLOSING_BRACKETS[opening], pos)
+        if end != -1 and _is_flat(source, pos + 1, end):
+            return end + 1
+    elif opening == '"':
+        end = source.find('"', pos + 1)
+        if end != -1 and source.find("\\", pos + 1, end) == -1:
+            return end + 1
+    else:
+        match = _SCALAR.match(source, pos)
+        if match:
+            return match.end()
+
+    # nested values and escaped strings are rare, fall back to decoding them
+    _, end = _decoder.raw_decode(source, pos)
+    return end
+
+
+def _is_flat(source: str, start: int, end: int) -> bool:
+    """Check that source[start:end] has no nested values and ends outside of a string"""
+    return (
+        source.count('"', start, end) % 2 == 0
+        and source.find("\\", start, end) == -1
+        and source.find("[", start, end) == -1
+        and source.find("{", start, end) == -1
+    )
+
+
+def _skip_nested_value(source: str, pos: int) -> int:
+    """Skip a value, tracking only the brackets of nested arrays and objects
+
+    Unlike _skip_value, a deeply nested value such as a vm trace is not decoded.
+    """
+    if source[pos : pos + 1] not in _CLOSING_BRACKETS:
+        return _skip_value(source, pos)
+    depth = 0
+    while True:
+        match = _STRUCTURE.search(source, pos)
+        if match is None:
+            raise ValueError(f"Unterminated JSON value at position {pos}")
+        char, pos = match.group(), match.end()
+        if char == '"':
+            pos = _skip_value(source, match.start())
+            continue
+        if char in _CLOSING_BRACKETS:
+            end = source.find(_CLOSING_BRACKETS[char], pos)
+            if end == -1 or not _closes(source, char, pos, end):
+                depth += 1
+                continue
+            # a value without nested values of the same kind, eg a step
+            pos = end + 1
+        else:
+            depth -= 1
+        if depth == 0:
+            return pos
+
+
+def _closes(source: str, opening: str, start: int, end: int) -> bool:
+    """Check that source[end] closes the value opened with `opening` before start
+
+    This holds if source[start:end] has no nested value of the same kind and ends
+    outside of a string, as the closing character can not appear outside of strings
+    in values of the other kind.
+    """
+    return (
+        source.count('"', start, end) % 2 == 0
+        and source.find("\\", start, end) == -1
+        and source.find(opening, start, end) == -1
+    )
@@ -0,0 +1,148 @@
+"""Record spans of the analysis in the Chrome trace event format
+
+The JSON file can be opened in chrome://tracing, https://ui.perfetto.dev or other
+trace viewers. Spans are recorded with `span(...)`, which does nothing unless a
+SpanTracer is installed with `set_tracer`.
+"""
+
+from contextlib import contextmanager, nullcontext
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import ContextManager, Iterable, TextIO
+
+
+class SpanTracer:
+    """Write complete ('X') trace events to a JSON array, one event per line
+
+    The timestamps are microseconds since the epoch, measured with a monotonic clock,
+    so the files of multiple processes can be merged with `merge_span_files`.
+    Spans of the main thread are tagged with the current `bundle`.
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        self.bundle: str | None = None
+        self._stream = stream
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._named_threads: set[int] = set()
+        self._epoch_us = time.time_ns() / 1000 - time.perf_counter_ns() / 1000
+        self._separator = "[\n"
+
+    @contextmanager
+    def span(self, name: str, **args):
+        start = self._now()
+        try:
+            yield
+        finally:
+            self.complete(name, start, self._now() - start, **args)
+
+    def complete(self, name: str, start: float, duration: float, **args):
+        thread = threading.current_thread()
+        if self.bundle is not None and thread is threading.main_thread():
+            args.setdefault("bundle", self.bundle)
+        event = {
+            "name": name,
+            "cat": "traces_analyzer",
+            "ph": "X",
+            "ts": start,
+            "dur": duration,
+            "pid": self._pid,
+            "tid": thread.ident,
+            "args": args,
+        }
+        with self._lock:
+            if thread.ident not in self._named_threads:
+                self._named_threads.add(thread.ident)  # type: ignore
+                self._write(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": self._pid,
+                        "tid": thread.ident,
+                        "args": {"name": thread.name},
+                    }
+                )
+            self._write(event)
+
+    def close(self):
+        with self._lock:
+            # the viewers also accept a missing "]", eg if the process was killed
+            self._stream.write("[]\n" if self._separator == "[\n" else "\n]\n")
+            self._stream.close()
+
+    def _write(self, event: dict):
+        self._stream.write(self._separator + json.dumps(event))
+        self._separator = ",\n"
+
+    def _now(self) -> float:
+        return self._epoch_us + time.perf_counter_ns() / 1000
+
+
+_tracer: SpanTracer | None = None
+
+
+def set_tracer(tracer: SpanTracer | None):
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> SpanTracer | None:
+    return _tracer
+
+
+def span(name: str, **args) -> ContextManager:
+    """Record a span with the installed tracer, or do nothing"""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.span(name, **args)
+
+
+def set_span_bundle(bundle: str | None):
+    if _tracer is not None:
+        _tracer.bundle = bundle
+
+
+def merge_span_files(paths: Iterable[Path], out: Path):
+    """Merge the span files of multiple processes into one trace, which may be one of them
+
+    Truncated events, eg of a killed process, are dropped.
+    """
+    events = []
+    for path in paths:
+        for line in path.read_text().splitlines():
+            line = line.strip("[],\n ")
+            if line and _is_complete(line):
+                events.append(line)
+    with open(out, "w") as out_file:
+        out_file.write("[\n" + ",\n".join(events) + "\n]\n" if events else "[]\n")
+
+
+@contextmanager
+def worker_span_tracer(path: Path):
+    """Record the spans of a worker process in its own file, see `merge_worker_span_files`"""
+    tracer = SpanTracer(open(path.with_name(f"{path.name}.worker-{os.getpid()}"), "w"))
+    set_tracer(tracer)
+    try:
+        yield
+    finally:
+        set_tracer(None)
+        tracer.close()
+
+
+def merge_worker_span_files(path: Path):
+    """Merge the span files of the workers into the span file at path and remove them"""
+    worker_paths = sorted(path.parent.glob(f"{path.name}.worker-*"))
+    merge_span_files([path, *worker_paths], path)
+    for worker_path in worker_paths:
+        worker_path.unlink()
+
+
+def _is_complete(event: str) -> bool:
+    try:
+        json.loads(event)
+        return True
+    except ValueError:
+        return False
@@ -0,0 +1,97 @@
+"""Analyze bundles in this process, in worker processes or in a pipeline, see BundleExecutor"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+import time
+from typing import Callable, Generic, Iterable, Iterator, TypeVar
+from typing_extensions import override
+
+from traces_analyzer.loader.loader import TraceLoader
+from traces_analyzer.loader.manifest import ManifestEntry
+from traces_analyzer.workers.limits import trace_bytes
+from traces_analyzer.workers.pipeline import Pipeline, format_pipeline_stats
+
+T = TypeVar("T")
+
+
+@dataclass
+class BundleResult:
+    bundle: str
+    # "ok", "skipped" if a limit was exceeded, "killed" by the pool or "failed"
+    status: str
+    reason: str | None = None
+    detail: str | None = None
+    seconds: float = 0
+    trace_bytes: int = 0
+    # the increase of the worker's peak RSS, if the peak can be reset
+    peak_rss_delta: int | None = None
+
+
+class BundleExecutor(ABC, Generic[T]):
+    """Analyze bundles and yield a BundleResult for each one once it is done
+
+    The executors that analyze the bundles in other processes take the ManifestEntry
+    of each bundle, which can be sent to them. The InProcessExecutor takes
+    TraceLoaders, so it also analyzes bundles that are fetched or streamed.
+    """
+
+    @abstractmethod
+    def run(self, bundles: Iterable[T]) -> Iterator[BundleResult]:
+        pass
+
+    def summary(self) -> str | None:
+        """Printed after all bundles are analyzed, eg where the time went"""
+        return None
+
+
+class InProcessExecutor(BundleExecutor[TraceLoader]):
+    """Analyze the bundles one after the other in this process
+
+    `analyze` returns the id of the bundle. As there is no process to contain a
+    failing bundle, its error stops the run, eg to debug it.
+    """
+
+    def __init__(self, analyze: Callable[[TraceLoader], str]) -> None:
+        self.analyze = analyze
+
+    @override
+    def run(self, bundles: Iterable[TraceLoader]) -> Iterator[BundleResult]:
+        for loader in bundles:
+            start = time.perf_counter()
+            bundle_id = self.analyze(loader)
+            yield BundleResult(bundle_id, "ok", seconds=time.perf_counter() - start)
+
+
+class PipelineExecutor(BundleExecutor[ManifestEntry]):
+    """Analyze the bundles in the stages of a Pipeline
+
+    A bundle for which a stage raises is reported as failed and skips the remaining
+    stages, while the other bundles continue. The seconds of a bundle are the time
+    the stages spent on it.
+    """
+
+    def __init__(self, pipeline: Pipeline) -> None:
+        self.pipeline = pipeline
+        self._seconds = 0.0
+
+    @override
+    def run(self, bundles: Iterable[ManifestEntry]) -> Iterator[BundleResult]:
+        start = time.perf_counter()
+        for outcome in self.pipeline.run_isolated(bundles):
+            entry: ManifestEntry = outcome.item
+            result = BundleResult(
+                entry["metadata"]["id"],
+                "ok",
+                seconds=outcome.seconds,
+                trace_bytes=trace_bytes(entry),
+            )
+            if outcome.error is not None:
+                result.status = "failed"
+                result.reason = type(outcome.error).__name__
+                result.detail = f"in the {outcome.stage} stage: {outcome.error}"
+            yield result
+        self._seconds = time.perf_counter() - start
+
+    @override
+    def summary(self) -> str | None:
+        return format_pipeline_stats(self.pipeline.stats, self._seconds)
@@ -0,0 +1,51 @@
+"""Resource limits of the bundles analyzed by worker processes"""
+
+from dataclasses import dataclass
+from typing import Iterable, Iterator, TypeVar
+
+from traces_analyzer.loader.manifest import ManifestEntry
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class BundleLimits:
+    max_trace_bytes: int | None = None
+    max_steps: int | None = None
+    timeout: float | None = None
+    max_rss: int | None = None
+
+
+class LimitExceeded(Exception):
+    """A bundle exceeds one of its BundleLimits"""
+
+    def __init__(self, reason: str, detail: str) -> None:
+        super().__init__(f"{reason}: {detail}")
+        self.reason = reason
+        self.detail = detail
+
+
+class StepLimit:
+    """Count the steps of all traces of a bundle and stop it at the limit"""
+
+    def __init__(self, max_steps: int) -> None:
+        self.max_steps = max_steps
+        self.steps = 0
+
+    def limit(self, events: Iterable[T]) -> Iterator[T]:
+        for event in events:
+            self.steps += 1
+            if self.steps > self.max_steps:
+                raise LimitExceeded(
+                    "max_steps", f"the traces have more than {self.max_steps} steps"
+                )
+            yield event
+
+
+def trace_bytes(entry: ManifestEntry) -> int:
+    """The total size of the trace files of a bundle"""
+    return sum(
+        trace["size"]
+        for scenarios in entry["traces"].values()
+        for trace in scenarios.values()
+    )
@@ -0,0 +1,341 @@
+"""Run the stages of the analysis concurrently, connected by bounded queues"""
+
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field
+from itertools import count
+import multiprocessing
+from queue import Empty, Full, Queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+from traces_analyzer.loader.prefetching_loader import OrderedMemoryBudget
+from traces_analyzer.utils.tracing import span
+
+_DONE = object()
+_STOPPED = object()
+
+
+@dataclass
+class Stage:
+    """A step of the pipeline, applied to each item by `workers` threads or processes
+
+    Threads suit stages that wait for I/O, and processes stages that need the CPU.
+    The function of a process stage, its items and results must be picklable.
+
+    With `size`, the results of the stage count against the memory budget of the
+    pipeline: before the function is called, size(item) bytes are acquired for its
+    result, eg the size of the files it reads, and they are released once the next
+    stage is done with the result. It can not be set for the last stage.
+    """
+
+    name: str
+    function: Callable[[Any], Any]
+    workers: int = 1
+    processes: bool = False
+    size: Callable[[Any], int] | None = None
+
+
+@dataclass
+class StageStats:
+    """The items that the workers of a stage processed, and where their time went
+
+    The times are summed over the workers. Waiting for the memory budget counts as
+    waiting for space in the next queue, as both wait for the next stage.
+    """
+
+    items: int = 0
+    # time spent in the function, waiting for an item and for space in the next queue
+    busy: float = 0
+    starved: float = 0
+    blocked: float = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, busy: float, starved: float, blocked: float):
+        with self._lock:
+            self.items += 1
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+
+
+@dataclass
+class ItemOutcome:
+    """The result of an item, or the error of the stage that failed for it"""
+
+    item: Any
+    result: Any = None
+    error: Exception | None = None
+    stage: str | None = None
+    # time spent in the functions of the stages
+    seconds: float = 0
+
+
+class _Failure:
+    """An error that stops the pipeline"""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class _Item:
+    """The value of an item in a stage, which holds `size` bytes of the memory budget"""
+
+    def __init__(self, outcome: ItemOutcome, value, size: int = 0) -> None:
+        self.outcome = outcome
+        self.value = value
+        self.size = size
+
+
+class Pipeline:
+    """Pass items through stages that run concurrently
+
+    Each stage takes the items from a queue and puts its results into the queue of the
+    next stage. The queues hold at most `queue_size` items, so a slow stage holds up
+    the stages before it instead of letting the items pile up in memory. The results
+    of the last stage are yielded in the order they are done. If a stage raises, the
+    pipeline stops and the error is raised by `run`, while `run_isolated` passes the
+    failed item on to the end and continues with the other items.
+
+    As the items may differ a lot in size, eg bundles with huge traces, the results of
+    stages with a `size` also share a memory budget of `memory_budget` bytes. It is
+    granted in the order in which the items are taken from the queue.
+    """
+
+    def __init__(
+        self, stages: list[Stage], queue_size: int = 4, memory_budget: int = 1024**3
+    ) -> None:
+        if stages and stages[-1].size is not None:
+            raise ValueError("The results of the last stage can not hold memory")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.memory_budget = memory_budget
+        self.stats = {stage.name: StageStats() for stage in stages}
+        self._stopped = threading.Event()
+        # replaced for each run, as it is closed when the run stops
+        self._budget = OrderedMemoryBudget(memory_budget)
+
+    def run(self, items: Iterable) -> Iterator:
+        """Yield the results of the items, raising the first error of a stage"""
+        # closes the stages as soon as the results are closed
+        with closing(self._run(items, isolate_failures=False)) as outcomes:
+            for outcome in outcomes:
+                yield outcome.result
+
+    def run_isolated(self, items: Iterable) -> Iterator[ItemOutcome]:
+        """Yield the outcome of each item, skipping the remaining stages of an item once one raises an Exception"""
+        return self._run(items, isolate_failures=True)
+
+    def _run(self, items: Iterable, isolate_failures: bool) -> Iterator[ItemOutcome]:
+        queues: list[Queue] = [Queue(self.queue_size) for _ in self.stages]
+        results: Queue = Queue(self.queue_size)
+        outputs = [*queues[1:], results]
+        self._budget = OrderedMemoryBudget(self.memory_budget)
+        executors: list[ProcessPoolExecutor] = []
+        threads = [
+            threading.Thread(
+                target=self._feed, args=(items, queues[0]), name="pipeline-source"
+            )
+        ]
+        for stage, input, output in zip(self.stages, queues, outputs):
+            function = stage.function
+            if stage.processes:
+                # forking would copy the locks held by the threads of the other stages
+                executor = ProcessPoolExecutor(
+                    stage.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                executors.append(executor)
+                function = _in_process(executor, function)
+            remaining = _Countdown(stage.workers)
+            tickets = _Tickets()
+            threads.extend(
+                threading.Thread(
+                    target=self._work,
+                    args=(
+                        stage,
+                        function,
+                        input,
+                        output,
+                        remaining,
+                        tickets,
+                        isolate_failures,
+                    ),
+                    name=f"pipeline-{stage.name}-{i}",
+                    daemon=True,
+                )
+                for i in range(stage.workers)
+            )
+
+        self._stopped.clear()
+        for thread in threads:
+            thread.start()
+        try:
+            while (result := self._get(results)) is not _DONE:
+                if isinstance(result, _Failure):
+                    raise result.error
+                result.outcome.result = result.value
+                yield result.outcome
+        finally:
+            self._stopped.set()
+            # wake up the workers that wait for memory
+            self._budget.close()
+            for thread in threads:
+                thread.join()
+            for executor in executors:
+                executor.shutdown(cancel_futures=True)
+
+    def _feed(self, items: Iterable, output: Queue):
+        try:
+            for item in items:
+                if not self._put(output, _Item(ItemOutcome(item), item)):
+                    return
+        except BaseException as e:
+            self._put(output, _Failure(e))
+        self._put(output, _DONE)
+
+    def _work(
+        self,
+        stage: Stage,
+        function: Callable[[Any], Any],
+        input: Queue,
+        output: Queue,
+        remaining: "_Countdown",
+        tickets: "_Tickets",
+        isolate_failures: bool,
+    ):
+        stats = self.stats[stage.name]
+        while True:
+            start = time.perf_counter()
+            item, ticket = tickets.take(lambda: self._get(input))
+            if item is _DONE or item is _STOPPED:
+                break
+            got = time.perf_counter()
+            released = item.size if isinstance(item, _Item) else 0
+            result = item
+            held = 0
+            if stage.size is not None:
+                try:
+                    held = self._acquire(stage.size, item, ticket)
+                except CancelledError:
+                    return
+                except BaseException as e:
+                    result = _fail(item, stage, e, isolate_failures)
+            acquired = time.perf_counter()
+            if result is item and _pending(item):
+                try:
+                    with span(stage.name):
+                        result = _Item(item.outcome, function(item.value))
+                except BaseException as e:
+                    result = _fail(item, stage, e, isolate_failures)
+            done = time.perf_counter()
+            if isinstance(item, _Item):
+                item.outcome.seconds += done - acquired
+            self._budget.release(released)
+            if _pending(result) and stage.size is not None:
+                result.size = held
+            else:
+                self._budget.release(held)
+            if not self._put(output, result):
+                return
+            stats.add(
+                done - acquired,
+                got - start,
+                acquired - got + time.perf_counter() - done,
+            )
+
+        if item is _DONE:
+            # let the other workers of the stage see the end as well
+            self._put(input, _DONE)
+            if remaining.done():
+                self._put(output, _DONE)
+
+    def _acquire(self, size_of: Callable[[Any], int], item, ticket: int) -> int:
+        """Acquire the bytes for the result of the item, taking the turn of its ticket even if sizing fails"""
+        size = 0
+        try:
+            if _pending(item):
+                size = size_of(item.value)
+        finally:
+            self._budget.acquire(ticket, size)
+        return size
+
+    def _get(self, queue: Queue):
+        """The next item, or _STOPPED once the pipeline is stopped"""
+        while not self._stopped.is_set():
+            try:
+                return queue.get(timeout=0.1)
+            except Empty:
+                pass
+        return _STOPPED
+
+    def _put(self, queue: Queue, item) -> bool:
+        """Put the item into the queue, or return False once the pipeline is stopped"""
+        while not self._stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+
+class _Countdown:
+    def __init__(self, count: int) -> None:
+        self._count = count
+        self._lock = threading.Lock()
+
+    def done(self) -> bool:
+        """Count down, returning True for the last one"""
+        with self._lock:
+            self._count -= 1
+            return self._count == 0
+
+
+class _Tickets:
+    """Number the items in the order in which the workers of a stage take them"""
+
+    def __init__(self) -> None:
+        self._numbers = count()
+        self._lock = threading.Lock()
+
+    def take(self, get: Callable[[], Any]) -> tuple[Any, int]:
+        """Get the next item and its ticket"""
+        with self._lock:
+            item = get()
+            if item is _DONE or item is _STOPPED:
+                return item, -1
+            return item, next(self._numbers)
+
+
+def _pending(item) -> bool:
+    """Whether the item still passes through the stages, ie none failed for it"""
+    return isinstance(item, _Item) and item.outcome.error is None
+
+
+def _fail(item, stage: Stage, error: BaseException, isolate_failures: bool):
+    """The failed item, which skips the remaining stages, or a _Failure that stops the pipeline"""
+    if isolate_failures and isinstance(error, Exception) and isinstance(item, _Item):
+        item.outcome.error = error
+        item.outcome.stage = stage.name
+        return _Item(item.outcome, None)
+    return _Failure(error)
+
+
+def _in_process(
+    executor: ProcessPoolExecutor, function: Callable[[Any], Any]
+) -> Callable[[Any], Any]:
+    def call(item):
+        return executor.submit(function, item).result()
+
+    return call
+
+
+def format_pipeline_stats(stats: dict[str, StageStats], seconds: float) -> str:
+    lines = [f"Pipeline stages over {seconds:.1f} s (seconds summed over the workers):"]
+    for name, stage in stats.items():
+        lines.append(
+            f"  {name:<10} {stage.items:6} items  busy {stage.busy:9.2f}  "
+            f"waiting for input {stage.starved:9.2f}  for output {stage.blocked:9.2f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,238 @@
+"""Analyze bundles in worker processes that are replaced when a bundle exceeds its limits"""
+
+from contextlib import nullcontext
+import multiprocessing
+from multiprocessing.connection import Connection, wait
+import time
+from typing import Callable, ContextManager, Iterable, Iterator
+from typing_extensions import override
+
+from traces_analyzer.benchmark.memory import (
+    current_rss_bytes,
+    peak_rss_since_reset,
+    reset_peak_rss,
+)
+from traces_analyzer.loader.manifest import ManifestEntry
+from traces_analyzer.workers.executor import BundleExecutor, BundleResult
+from traces_analyzer.workers.limits import BundleLimits, LimitExceeded, trace_bytes
+from traces_analyzer.workers.scheduler import BundleScheduler
+
+BundleHandler = Callable[[ManifestEntry], None]
+
+# forking would copy the locks held by other threads, eg of the bundle discovery
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class WorkerPool(BundleExecutor[ManifestEntry]):
+    """Analyze bundles in worker processes while enforcing their BundleLimits
+
+    Bundles with larger traces than allowed are skipped before they are dispatched.
+    The steps are limited by the handler, which raises LimitExceeded. A worker whose
+    bundle runs longer than the timeout or whose RSS exceeds the ceiling is killed
+    and replaced, as is a worker that crashes. Each worker is replaced after
+    `recycle_after` bundles, to return the memory fragmented by large bundles.
+
+    The handler and worker_context are called in the workers and must be picklable.
+    worker_context is entered for the lifetime of each worker, eg to record spans.
+    """
+
+    def __init__(
+        self,
+        handler: BundleHandler,
+        workers: int,
+        limits: BundleLimits = BundleLimits(),
+        recycle_after: int | None = None,
+        worker_context: Callable[[], ContextManager] | None = None,
+        poll_interval: float = 0.1,
+    ) -> None:
+        self.handler = handler
+        self.workers = workers
+        self.limits = limits
+        self.recycle_after = recycle_after
+        self.worker_context = worker_context
+        self.poll_interval = poll_interval
+
+    @override
+    def run(
+        self, entries: Iterable[ManifestEntry] | BundleScheduler
+    ) -> Iterator[BundleResult]:
+        """Yield the result of each bundle once it is done, in the order they finish
+
+        The bundles are dispatched in their order, or in the order of a BundleScheduler.
+        """
+        if isinstance(entries, BundleScheduler):
+            scheduler = entries
+        else:
+            scheduler = BundleScheduler(entries)
+        idle: list[_Worker] = []
+        busy: dict[Connection, _Worker] = {}
+        try:
+            idle = [self._start_worker() for _ in range(self.workers)]
+            while True:
+                # the scheduler dispatches a bundle whenever none is running
+                while idle and (entry := scheduler.pop()) is not None:
+                    if result := self._check_trace_bytes(entry):
+                        scheduler.release(entry)
+                        yield result
+                    else:
+                        worker = idle.pop()
+                        worker.submit(entry)
+                        busy[worker.conn] = worker
+                if not busy:
+                    return
+
+                for conn in wait(list(busy), self.poll_interval):
+                    worker = busy.pop(conn)  # type: ignore
+                    scheduler.release(worker.entry)  # type: ignore
+                    yield self._receive(worker)
+                    idle.append(self._recycle(worker))
+
+                for worker in list(busy.values()):
+                    if violation := self._check_running(worker):
+                        reason, detail = violation
+                        del busy[worker.conn]
+                        worker.kill()
+                        scheduler.release(worker.entry)  # type: ignore
+                        yield worker.result("killed", reason, detail)
+                        idle.append(self._start_worker())
+        finally:
+            for worker in busy.values():
+                worker.kill()
+            for worker in idle:
+                worker.stop()
+
+    def _start_worker(self) -> "_Worker":
+        return _Worker(self.handler, self.worker_context)
+
+    def _check_trace_bytes(self, entry: ManifestEntry) -> BundleResult | None:
+        max_bytes = self.limits.max_trace_bytes
+        if max_bytes is not None and (size := trace_bytes(entry)) > max_bytes:
+            return BundleResult(
+                entry["metadata"]["id"],
+                "skipped",
+                "max_trace_bytes",
+                f"the traces have {size} bytes, more than {max_bytes}",
+                trace_bytes=size,
+            )
+        return None
+
+    def _check_running(self, worker: "_Worker") -> tuple[str, str] | None:
+        timeout = self.limits.timeout
+        if timeout is not None and time.perf_counter() - worker.started > timeout:
+            return "timeout", f"running for more than {timeout} seconds"
+        max_rss = self.limits.max_rss
+        if max_rss is not None and (rss := current_rss_bytes(worker.pid)) > max_rss:
+            return (
+                "max_rss",
+                f"the worker has an RSS of {rss} bytes, more than {max_rss}",
+            )
+        return None
+
+    def _receive(self, worker: "_Worker") -> BundleResult:
+        try:
+            status, reason, detail, peak_rss_delta = worker.conn.recv()
+        except EOFError:
+            worker.kill()
+            return worker.result(
+                "failed", "crashed", f"worker exited with code {worker.exitcode}"
+            )
+        worker.bundles += 1
+        return worker.result(status, reason, detail, peak_rss_delta)
+
+    def _recycle(self, worker: "_Worker") -> "_Worker":
+        if not worker.alive:
+            return self._start_worker()
+        if self.recycle_after is not None and worker.bundles >= self.recycle_after:
+            worker.stop()
+            return self._start_worker()
+        return worker
+
+
+class _Worker:
+    def __init__(
+        self,
+        handler: BundleHandler,
+        worker_context: Callable[[], ContextManager] | None,
+    ) -> None:
+        self.conn, child_conn = _CONTEXT.Pipe()
+        self._process = _CONTEXT.Process(
+            target=_worker_main,
+            args=(child_conn, handler, worker_context),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self.bundles = 0
+        self.entry: ManifestEntry | None = None
+        self.started = 0.0
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid  # type: ignore
+
+    @property
+    def alive(self) -> bool:
+        return not self.conn.closed
+
+    @property
+    def exitcode(self) -> int | None:
+        return self._process.exitcode
+
+    def submit(self, entry: ManifestEntry):
+        self.entry = entry
+        self.started = time.perf_counter()
+        self.conn.send(entry)
+
+    def result(
+        self,
+        status: str,
+        reason: str | None = None,
+        detail: str | None = None,
+        peak_rss_delta: int | None = None,
+    ) -> BundleResult:
+        return BundleResult(
+            self.entry["metadata"]["id"],  # type: ignore
+            status,
+            reason,
+            detail,
+            time.perf_counter() - self.started,
+            trace_bytes(self.entry),  # type: ignore
+            peak_rss_delta,
+        )
+
+    def stop(self):
+        """Let the worker finish, eg to flush its span file"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self._process.join()
+        self.conn.close()
+
+    def kill(self):
+        self._process.kill()
+        self._process.join()
+        self.conn.close()
+
+
+def _worker_main(
+    conn: Connection,
+    handler: BundleHandler,
+    worker_context: Callable[[], ContextManager] | None,
+):
+    with worker_context() if worker_context else nullcontext():
+        while (entry := conn.recv()) is not None:
+            peak_reset = reset_peak_rss()
+            rss_before = current_rss_bytes()
+            try:
+                handler(entry)
+                result = ("ok", None, None)
+            except LimitExceeded as e:
+                result = ("skipped", e.reason, e.detail)
+            except Exception as e:
+                result = ("failed", type(e).__name__, str(e))
+            peak_rss_delta = None
+            if peak_reset:
+                peak_rss_delta = max(peak_rss_since_reset() - rss_before, 0)
+            conn.send((*result, peak_rss_delta))
+    conn.close()
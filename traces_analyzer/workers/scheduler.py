@@ -0,0 +1,201 @@
+"""Order the bundles of the worker processes by their estimated cost"""
+
+from collections import deque
+import json
+from operator import itemgetter
+from pathlib import Path
+import time
+from typing import Callable, Iterable, Iterator
+
+from traces_analyzer.loader.manifest import ManifestEntry
+from traces_analyzer.workers.limits import trace_bytes
+
+# used until a previous run measured them, see CostModel. The memory starts from the
+# decoded trace events, which measured 1.8 to 2.6 times the size of their JSON text
+# (see DECODED_BYTES_PER_TEXT_BYTE), with headroom for the parsed instructions. An
+# estimate that is too high only runs fewer bundles in parallel until the
+# peak_rss_delta in bundle_results.jsonl replaces it.
+DEFAULT_SECONDS_PER_TRACE_BYTE = 1e-7
+DEFAULT_MEMORY_PER_TRACE_BYTE = 4.0
+
+
+def read_bundle_results(path: Path) -> Iterator[dict]:
+    """Read the bundle_results.jsonl of a previous run"""
+    with open(path) as results_file:
+        for line in results_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class CostModel:
+    """Estimate the analysis time and peak memory of bundles from the size of their traces
+
+    With the results of a previous run, the bundles analyzed there are estimated with
+    their measured time and memory, and the others with the time and memory per trace
+    byte measured over all of them.
+    """
+
+    def __init__(self, history: Iterable[dict] = ()) -> None:
+        # a killed bundle took at least this long
+        self._history = {
+            result["bundle"]: result
+            for result in history
+            if result["status"] in ("ok", "killed")
+        }
+        measured = [
+            result
+            for result in self._history.values()
+            if result["status"] == "ok" and result.get("trace_bytes")
+        ]
+        self.seconds_per_byte = _rate(
+            measured, "seconds", DEFAULT_SECONDS_PER_TRACE_BYTE
+        )
+        self.memory_per_byte = _rate(
+            [result for result in measured if result.get("peak_rss_delta")],
+            "peak_rss_delta",
+            DEFAULT_MEMORY_PER_TRACE_BYTE,
+        )
+
+    def seconds(self, entry: ManifestEntry) -> float:
+        result = self._history.get(entry["metadata"]["id"])
+        if result:
+            return result["seconds"]
+        return trace_bytes(entry) * self.seconds_per_byte
+
+    def memory(self, entry: ManifestEntry) -> float:
+        result = self._history.get(entry["metadata"]["id"])
+        if result and result.get("peak_rss_delta"):
+            return result["peak_rss_delta"]
+        return trace_bytes(entry) * self.memory_per_byte
+
+
+def _rate(results: list[dict], key: str, default: float) -> float:
+    total_bytes = sum(result["trace_bytes"] for result in results)
+    if not total_bytes:
+        return default
+    return sum(result[key] for result in results) / total_bytes
+
+
+class BundleScheduler:
+    """Decide which bundle an idle worker analyzes next
+
+    With `largest_first`, the bundles are dispatched by their estimated analysis time,
+    so a large bundle does not start last and hold up the end of the run. This reads
+    all entries upfront. With a `memory_budget`, a bundle is only dispatched while the
+    estimated memory of the running bundles stays within the budget. A bundle is
+    always dispatched when no other one is running.
+
+    With `largest_first` and a `memory_budget`, the bundle that waits for memory gets
+    a reservation: the estimated time when enough running bundles finished to leave
+    memory for it. Meanwhile smaller bundles are backfilled if they fit and are
+    estimated to finish before the reservation, so they do not delay it. Once the
+    reservation has passed, nothing is backfilled anymore. The pending bundles are
+    kept in buckets of similar estimated memory, so a dispatch only looks at the
+    longest bundle of each bucket.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[ManifestEntry],
+        costs: CostModel | None = None,
+        largest_first: bool = False,
+        memory_budget: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.costs = costs or CostModel()
+        self.largest_first = largest_first
+        self.memory_budget = memory_budget
+        self._clock = clock
+        self._entries = iter(entries)
+        self._pending: deque[ManifestEntry] = deque()
+        # with largest_first, the (seconds, memory, entry) of the pending bundles by
+        # the bit length of their memory, each bucket ordered by the seconds
+        self._buckets: dict[int, deque[tuple[float, float, ManifestEntry]]] = {}
+        if largest_first:
+            estimates = [
+                (self.costs.seconds(entry), self.costs.memory(entry), entry)
+                for entry in self._entries
+            ]
+            estimates.sort(key=itemgetter(0), reverse=True)
+            for estimate in estimates:
+                self._buckets.setdefault(_bucket(estimate[1]), deque()).append(estimate)
+        # the estimated memory and end time of the running bundles, by the id() of their entry
+        self._running: dict[int, tuple[float, float]] = {}
+
+    @property
+    def exhausted(self) -> bool:
+        return not self._pending and not self._buckets and not self._fill()
+
+    def pop(self) -> ManifestEntry | None:
+        """The next bundle to dispatch, or None if none fits into the memory budget now"""
+        if self.exhausted:
+            return None
+        if not self.largest_first:
+            entry = self._pending[0]
+            memory = self.costs.memory(entry)
+            if not self._fits(memory):
+                return None
+            self._pending.popleft()
+            return self._dispatch(entry, self.costs.seconds(entry), memory)
+
+        head = max(self._buckets, key=lambda bucket: self._buckets[bucket][0][0])
+        if self._fits(self._buckets[head][0][1]):
+            return self._dispatch_bucket(head)
+
+        reservation = self._reservation(self._buckets[head][0][1])
+        now = self._clock()
+        backfill = [
+            bucket
+            for bucket, estimates in self._buckets.items()
+            if self._fits(estimates[0][1]) and now + estimates[0][0] <= reservation
+        ]
+        if not backfill:
+            return None
+        return self._dispatch_bucket(
+            max(backfill, key=lambda bucket: self._buckets[bucket][0][0])
+        )
+
+    def release(self, entry: ManifestEntry):
+        """Mark a dispatched bundle as done"""
+        self._running.pop(id(entry), None)
+
+    def _dispatch_bucket(self, bucket: int) -> ManifestEntry:
+        estimates = self._buckets[bucket]
+        seconds, memory, entry = estimates.popleft()
+        if not estimates:
+            del self._buckets[bucket]
+        return self._dispatch(entry, seconds, memory)
+
+    def _dispatch(
+        self, entry: ManifestEntry, seconds: float, memory: float
+    ) -> ManifestEntry:
+        self._running[id(entry)] = (memory, self._clock() + seconds)
+        return entry
+
+    def _fits(self, memory: float) -> bool:
+        if self.memory_budget is None or not self._running:
+            return True
+        used = sum(running_memory for running_memory, _ in self._running.values())
+        return used + memory <= self.memory_budget
+
+    def _reservation(self, memory: float) -> float:
+        """The estimated time when the running bundles leave enough of the budget for memory"""
+        assert self.memory_budget is not None
+        used = sum(running_memory for running_memory, _ in self._running.values())
+        end = self._clock()
+        for running_memory, end in sorted(self._running.values(), key=itemgetter(1)):
+            used -= running_memory
+            if used + memory <= self.memory_budget:
+                break
+        return end
+
+    def _fill(self) -> bool:
+        entry = next(self._entries, None)
+        if entry is None:
+            return False
+        self._pending.append(entry)
+        return True
+
+
+def _bucket(memory: float) -> int:
+    return int(memory).bit_length()
@@ -0,0 +1,194 @@
+"""Split the bundles of a run across nodes and merge the outputs of the shards"""
+
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+from pathlib import Path
+import re
+import shutil
+from typing import Iterable
+
+from traces_analyzer.benchmark.timings import TimingsSummary
+
+SHARD_FILENAME = "shard.json"
+# the outputs of a bundle are <bundle id>.json and a <bundle id>_<tx hash>.json per tx
+TX_REPORT_PATTERN = re.compile(r"^(?P<bundle>.+)_(0x)?[0-9a-fA-F]{64}\.json$")
+RUN_FILES = {SHARD_FILENAME, "timings_summary.json", "merge.json"}
+# JSONL files with one record per bundle, identified by its "bundle" key
+JSONL_FILES = ("bundle_results.jsonl", "timings.jsonl")
+
+
+@dataclass(frozen=True)
+class Shard:
+    """The index-th of count disjoint parts of the bundles, partitioned by a stable hash of the bundle id"""
+
+    index: int
+    count: int
+
+    def __post_init__(self):
+        if not 1 <= self.index <= self.count:
+            raise ValueError(
+                f"Expected a shard I/N with 1 <= I <= N, got {self.index}/{self.count}"
+            )
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    @staticmethod
+    def parse(value: str) -> "Shard":
+        index, count = value.split("/")
+        return Shard(int(index), int(count))
+
+    def contains(self, bundle_id: str) -> bool:
+        digest = hashlib.blake2b(bundle_id.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.count == self.index - 1
+
+
+def write_shard_info(out: Path, shard: Shard, bundles: int):
+    """Mark the output directory as a complete run of the shard"""
+    info = {"shard": str(shard), "bundles": bundles}
+    (out / SHARD_FILENAME).write_text(json.dumps(info, indent=2))
+
+
+@dataclass
+class MergeReport:
+    bundles: int = 0
+    # bundle id -> the shard output directories that contain it
+    duplicates: dict[str, list[str]] = field(default_factory=dict)
+    # expected bundles that are neither analyzed nor recorded in a bundle_results.jsonl
+    missing_bundles: list[str] = field(default_factory=list)
+    missing_shards: list[str] = field(default_factory=list)
+    duplicate_shards: list[str] = field(default_factory=list)
+    # output directories without a shard.json, whose run did not complete
+    incomplete: list[str] = field(default_factory=list)
+
+
+def merge_shards(
+    shard_dirs: Iterable[Path], out: Path, expected: Iterable[str] | None = None
+) -> MergeReport:
+    """Merge the output directories of shards into out
+
+    A bundle that is contained in several directories is taken from the first one.
+    The bundle reports are copied, the JSONL files concatenated and the timings summary
+    is computed again from the merged timings.jsonl.
+    """
+    shard_dirs = list(shard_dirs)
+    report = MergeReport()
+    out.mkdir(parents=True, exist_ok=True)
+
+    _check_shards(shard_dirs, report)
+
+    merged_from: dict[str, Path] = {}
+    for dir in shard_dirs:
+        for bundle_id, paths in _bundle_reports(dir).items():
+            if bundle_id in merged_from:
+                report.duplicates.setdefault(bundle_id, [str(merged_from[bundle_id])])
+                report.duplicates[bundle_id].append(str(dir))
+                continue
+            merged_from[bundle_id] = dir
+            for path in paths:
+                shutil.copyfile(path, out / path.name)
+    report.bundles = len(merged_from)
+
+    recorded: set[str] = set()
+    for filename in JSONL_FILES:
+        records = _merge_jsonl(shard_dirs, filename, merged_from, report)
+        if not records:
+            continue
+        with open(out / filename, "w") as jsonl_file:
+            jsonl_file.writelines(json.dumps(record) + "\n" for record in records)
+        if filename == "timings.jsonl":
+            _write_timings_summary(records, out)
+        else:
+            recorded.update(record["bundle"] for record in records)
+
+    if expected is not None:
+        report.missing_bundles = [
+            bundle_id
+            for bundle_id in expected
+            if bundle_id not in merged_from and bundle_id not in recorded
+        ]
+
+    (out / "merge.json").write_text(json.dumps(asdict(report), indent=2))
+    return report
+
+
+def _check_shards(shard_dirs: list[Path], report: MergeReport):
+    shards: list[Shard] = []
+    for dir in shard_dirs:
+        shard_path = dir / SHARD_FILENAME
+        if not shard_path.exists():
+            report.incomplete.append(str(dir))
+            continue
+        shard = Shard.parse(json.loads(shard_path.read_text())["shard"])
+        if shard in shards:
+            report.duplicate_shards.append(str(shard))
+        shards.append(shard)
+
+    counts = {shard.count for shard in shards}
+    if len(counts) > 1:
+        raise ValueError(f"The shards split the bundles differently: {counts}")
+    if counts:
+        (count,) = counts
+        report.missing_shards = [
+            f"{index}/{count}"
+            for index in range(1, count + 1)
+            if Shard(index, count) not in shards
+        ]
+
+
+def _bundle_reports(dir: Path) -> dict[str, list[Path]]:
+    """The report files of the bundles whose reports were saved completely"""
+    bundle_files: dict[str, Path] = {}
+    tx_files: dict[str, list[Path]] = {}
+    for path in dir.glob("*.json"):
+        if path.name in RUN_FILES:
+            continue
+        if match := TX_REPORT_PATTERN.match(path.name):
+            tx_files.setdefault(match["bundle"], []).append(path)
+        else:
+            bundle_files[path.stem] = path
+    # the bundle report is saved after the reports of its transactions
+    return {
+        bundle_id: [*tx_files.get(bundle_id, []), path]
+        for bundle_id, path in bundle_files.items()
+    }
+
+
+def _merge_jsonl(
+    shard_dirs: list[Path],
+    filename: str,
+    merged_from: dict[str, Path],
+    report: MergeReport,
+) -> list[dict]:
+    """Concatenate the records, keeping the record of a bundle from the directory its reports were taken from"""
+    records: dict[str, dict] = {}
+    record_dirs: dict[str, Path] = {}
+    for dir in shard_dirs:
+        if not (dir / filename).exists():
+            continue
+        with open(dir / filename) as jsonl_file:
+            for line in jsonl_file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                bundle_id = record["bundle"]
+                source = merged_from.get(bundle_id)
+                if source is None and bundle_id in record_dirs:
+                    # eg a bundle that failed in several shards
+                    duplicate_dirs = report.duplicates.setdefault(
+                        bundle_id, [str(record_dirs[bundle_id])]
+                    )
+                    if str(dir) not in duplicate_dirs:
+                        duplicate_dirs.append(str(dir))
+                elif source is None or source == dir:
+                    records[bundle_id] = record
+                    record_dirs[bundle_id] = dir
+    return list(records.values())
+
+
+def _write_timings_summary(records: list[dict], out: Path):
+    summary = TimingsSummary()
+    for record in records:
+        summary.add(record["bundle"], record)
+    (out / "timings_summary.json").write_text(json.dumps(summary.report(), indent=2))